@@ -0,0 +1,331 @@
+"""
+Daily (IST) rollups for admin analytics
+
+One document per metric per IST day in `analytics_daily_rollups`:
+    {_id: "revenue:2026-01-15", metric: "revenue", day: "2026-01-15", ...}
+
+Metrics:
+    revenue   - captured payment total (paise) and count
+    signups   - new users_profile documents
+    commands  - command counts and per-user totals from `history` logs
+
+A background compactor recomputes today's and yesterday's buckets on an
+interval (late writes near midnight land in yesterday). Until it has
+completed once, it also backfills the chart window, newest day first,
+skipping days that already have every bucket, so a restart resumes where
+it stopped (a marker on the lease document records completion). Other
+ranges are queued with enqueue_backfill() and worked off by the same
+compactor, one day at a time. Only the worker holding the compactor lease
+runs it. Chart endpoints read only N bucket docs.
+
+history documents keep a top-level `log_days` array of their logs.* keys
+(maintained by quota_manager.log_activity) so a day's command logs are
+found through an index instead of a scan.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone, date
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+ROLLUP_METRICS = ("revenue", "signups", "commands")
+COMPACTOR_INTERVAL = int(os.getenv("ROLLUP_COMPACTOR_INTERVAL", "300"))  # seconds
+INITIAL_BACKFILL_DAYS = int(os.getenv("ROLLUP_INITIAL_BACKFILL_DAYS", "365"))  # longest chart range
+LEASE_SECONDS = max(2 * COMPACTOR_INTERVAL, 600)
+
+# Identifies this worker as the lease holder
+WORKER_ID = uuid.uuid4().hex
+
+
+# ============================================================================
+# Day helpers
+# ============================================================================
+
+def ist_today() -> date:
+    return datetime.now(IST).date()
+
+
+def ist_day_bounds_utc(day: date) -> tuple:
+    """[start, end) of an IST calendar day as naive UTC datetimes (how we store dates)"""
+    start_ist = datetime(day.year, day.month, day.day, tzinfo=IST)
+    start_utc = start_ist.astimezone(timezone.utc).replace(tzinfo=None)
+    return start_utc, start_utc + timedelta(days=1)
+
+
+def _rollup_id(metric: str, day: date) -> str:
+    return f"{metric}:{day.isoformat()}"
+
+
+# ============================================================================
+# Per-day computation from raw collections
+# ============================================================================
+
+async def _compute_revenue(db: AsyncIOMotorDatabase, start: datetime, end: datetime) -> dict:
+    rows = await db.payments.aggregate([
+        {"$match": {"status": "captured", "created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": None,
+            "revenue": {"$sum": {"$ifNull": ["$amount", 0]}},
+            "count": {"$sum": 1}
+        }}
+    ]).to_list(length=1)
+    row = rows[0] if rows else {}
+    return {"revenue_paise": row.get("revenue", 0), "payment_count": row.get("count", 0)}
+
+
+async def _compute_signups(db: AsyncIOMotorDatabase, start: datetime, end: datetime) -> dict:
+    count = await db.users_profile.count_documents({"created_at": {"$gte": start, "$lt": end}})
+    return {"new_users": count}
+
+
+async def _compute_commands(db: AsyncIOMotorDatabase, start: datetime, end: datetime) -> dict:
+    """
+    history stores logs under UTC date keys (logs.YYYY-MM-DD), so an IST day
+    spans two keys; entries are filtered by timestamp into the IST window.
+    """
+    utc_keys = sorted({start.strftime("%Y-%m-%d"), (end - timedelta(microseconds=1)).strftime("%Y-%m-%d")})
+    log_fields = [f"$logs.{key}" for key in utc_keys]
+
+    rows = await db.history.aggregate([
+        {"$match": {"log_days": {"$in": utc_keys}}},
+        {"$project": {
+            "_id": 0,
+            "sidhi_id": 1,
+            "entries": {"$concatArrays": [{"$ifNull": [field, []]} for field in log_fields]}
+        }},
+        {"$unwind": "$entries"},
+        {"$match": {"entries.timestamp": {"$gte": start, "$lt": end}}},
+        {"$facet": {
+            "commands": [
+                {"$group": {"_id": "$entries.command", "count": {"$sum": 1}}}
+            ],
+            "users": [
+                {"$group": {"_id": "$sidhi_id", "count": {"$sum": 1}}}
+            ]
+        }}
+    ]).to_list(length=1)
+    row = rows[0] if rows else {"commands": [], "users": []}
+
+    # Arrays, not maps: command names and sidhi_ids may contain dots
+    return {
+        "commands": [{"command": r["_id"], "count": r["count"]} for r in row["commands"]],
+        "users": [{"sidhi_id": r["_id"], "count": r["count"]} for r in row["users"]]
+    }
+
+
+_COMPUTERS = {
+    "revenue": _compute_revenue,
+    "signups": _compute_signups,
+    "commands": _compute_commands,
+}
+
+
+async def compact_day(db: AsyncIOMotorDatabase, day: date, metrics=ROLLUP_METRICS):
+    """Recompute and upsert the rollup buckets for one IST day (idempotent)"""
+    start, end = ist_day_bounds_utc(day)
+    values = await asyncio.gather(*(_COMPUTERS[m](db, start, end) for m in metrics))
+
+    now = datetime.utcnow()
+    for metric, value in zip(metrics, values):
+        await db.analytics_daily_rollups.replace_one(
+            {"_id": _rollup_id(metric, day)},
+            {"metric": metric, "day": day.isoformat(), **value, "computed_at": now},
+            upsert=True
+        )
+
+
+async def backfill_rollups(db: AsyncIOMotorDatabase, start_day: date, end_day: date, metrics=ROLLUP_METRICS) -> int:
+    """Recompute every day in [start_day, end_day]; returns days processed"""
+    days = 0
+    day = start_day
+    while day <= end_day:
+        await compact_day(db, day, metrics)
+        day += timedelta(days=1)
+        days += 1
+    return days
+
+
+async def acquire_compactor_lease(db: AsyncIOMotorDatabase) -> bool:
+    """Take or renew the compactor lease; False while another worker holds it"""
+    now = datetime.utcnow()
+    try:
+        await db.analytics_leases.update_one(
+            {"_id": "rollup_compactor", "$or": [{"holder": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": WORKER_ID, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def _index_history_days(db: AsyncIOMotorDatabase):
+    """
+    One-off: derive log_days for history written before it existed.
+    A union with what is there, so it is safe alongside new writes.
+    """
+    await db.history.update_many({}, [{"$set": {"log_days": {"$setUnion": [
+        {"$ifNull": ["$log_days", []]},
+        {"$map": {"input": {"$objectToArray": {"$ifNull": ["$logs", {}]}}, "in": "$$this.k"}}
+    ]}}}])
+    await db.analytics_leases.update_one(
+        {"_id": "rollup_compactor"},
+        {"$set": {"history_days_indexed_at": datetime.utcnow()}}
+    )
+
+
+async def _completed_days(db: AsyncIOMotorDatabase, days: List[date]) -> set:
+    """Days that already have a bucket for every metric"""
+    counts: Dict[str, int] = {}
+    cursor = db.analytics_daily_rollups.find(
+        {"_id": {"$in": [_rollup_id(m, day) for day in days for m in ROLLUP_METRICS]}},
+        {"day": 1}
+    )
+    async for doc in cursor:
+        counts[doc["day"]] = counts.get(doc["day"], 0) + 1
+    return {day for day, n in counts.items() if n == len(ROLLUP_METRICS)}
+
+
+async def _initial_backfill(db: AsyncIOMotorDatabase):
+    """Fill the chart window once, newest day first, renewing the lease per day"""
+    today = ist_today()
+    window = [today - timedelta(days=offset) for offset in range(2, INITIAL_BACKFILL_DAYS + 1)]
+    done = await _completed_days(db, window)
+    pending = [day for day in window if day.isoformat() not in done]
+    print(f"📊 Backfilling {len(pending)} of {len(window)} days of analytics rollups")
+    for day in pending:
+        if not await acquire_compactor_lease(db):
+            return
+        await compact_day(db, day)
+
+    await db.analytics_leases.update_one(
+        {"_id": "rollup_compactor"},
+        {"$set": {"backfilled_at": datetime.utcnow()}}
+    )
+
+
+# ============================================================================
+# Backfill jobs
+# ============================================================================
+
+async def enqueue_backfill(db: AsyncIOMotorDatabase, start_day: date, end_day: date, requested_by: str) -> Dict:
+    """Queue a recompute of [start_day, end_day] for the compactor"""
+    now = datetime.utcnow()
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "start_day": start_day.isoformat(),
+        "end_day": end_day.isoformat(),
+        "next_day": start_day.isoformat(),  # Checkpoint: days before it are done
+        "days_processed": 0,
+        "status": "queued",
+        "requested_by": requested_by,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None
+    }
+    await db.analytics_backfill_jobs.insert_one(job)
+    job.pop("_id", None)
+    return job
+
+
+async def get_backfill_job(db: AsyncIOMotorDatabase, job_id: str) -> Optional[Dict]:
+    return await db.analytics_backfill_jobs.find_one({"job_id": job_id}, {"_id": 0})
+
+
+async def _run_backfill_jobs(db: AsyncIOMotorDatabase):
+    """Work off queued backfills oldest first, checkpointing after every day"""
+    while True:
+        job = await db.analytics_backfill_jobs.find_one(
+            {"status": {"$in": ["queued", "running"]}},
+            sort=[("created_at", 1)]
+        )
+        if not job:
+            return
+
+        day = date.fromisoformat(job["next_day"])
+        end_day = date.fromisoformat(job["end_day"])
+        while day <= end_day:
+            if not await acquire_compactor_lease(db):
+                return
+            await compact_day(db, day)
+            day += timedelta(days=1)
+            await db.analytics_backfill_jobs.update_one(
+                {"job_id": job["job_id"]},
+                {"$set": {"status": "running", "next_day": day.isoformat(), "updated_at": datetime.utcnow()},
+                 "$inc": {"days_processed": 1}}
+            )
+
+        await db.analytics_backfill_jobs.update_one(
+            {"job_id": job["job_id"]},
+            {"$set": {"status": "completed", "completed_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+        )
+
+        from app.admin.hardened_analytics import cache
+        await cache.clear()
+
+
+# ============================================================================
+# Compactor
+# ============================================================================
+
+async def run_rollup_compactor(db: AsyncIOMotorDatabase):
+    """
+    Background worker: keep today's and yesterday's buckets fresh,
+    backfill the chart window until that has completed once, then run
+    queued backfill jobs. Older days only change through backfill.
+    """
+    while True:
+        try:
+            if await acquire_compactor_lease(db):
+                today = ist_today()
+                await backfill_rollups(db, today - timedelta(days=1), today)
+                lease = await db.analytics_leases.find_one({"_id": "rollup_compactor"}) or {}
+                if not lease.get("history_days_indexed_at"):
+                    await _index_history_days(db)
+                if not lease.get("backfilled_at"):
+                    await _initial_backfill(db)
+                await _run_backfill_jobs(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Rollup compaction failed: {e}")
+
+        await asyncio.sleep(COMPACTOR_INTERVAL)
+
+
+async def create_rollup_indexes(db: AsyncIOMotorDatabase):
+    await db.analytics_daily_rollups.create_index([("metric", 1), ("day", 1)])
+    await db.payments.create_index([("status", 1), ("created_at", 1)])
+    await db.history.create_index("log_days")
+    await db.analytics_backfill_jobs.create_index("job_id", unique=True)
+    await db.analytics_backfill_jobs.create_index([("status", 1), ("created_at", 1)])
+
+
+# ============================================================================
+# Reads - N bucket documents per chart
+# ============================================================================
+
+async def read_rollups(db: AsyncIOMotorDatabase, metric: str, days: int) -> List[Dict]:
+    """
+    Buckets for the last `days` days plus today, oldest first.
+    Missing buckets (before backfill) are simply absent.
+    """
+    today = ist_today()
+    ids = [_rollup_id(metric, today - timedelta(days=offset)) for offset in range(days, -1, -1)]
+    docs = await db.analytics_daily_rollups.find({"_id": {"$in": ids}}).to_list(length=len(ids))
+    return sorted(docs, key=lambda d: d["day"])
+
+
+def merge_counts(buckets: List[Dict], field: str, key: str) -> Dict[str, int]:
+    """Sum [{key, count}] arrays across buckets"""
+    totals: Dict[str, int] = {}
+    for bucket in buckets:
+        for item in bucket.get(field, []):
+            totals[item[key]] = totals.get(item[key], 0) + item["count"]
+    return totals
@@ -116,50 +116,14 @@ class PricingConfig:
 
 
 # ============================================================================
-# utils/cache.py - Simple In-Memory Cache
+# utils/cache.py - Shared Cache
 # ============================================================================
 
-from datetime import datetime, timedelta
-from typing import Any, Optional
-import asyncio
+# Backed by the shared two-tier cache (see app/system/cache.py) so every
+# worker serves the same numbers and concurrent misses run one aggregation
+from app.system.cache import get_cache
 
-class CacheManager:
-    """Simple in-memory cache with TTL (use Redis in production)"""
-    
-    def __init__(self):
-        self._cache: Dict[str, tuple[Any, datetime]] = {}
-        self._lock = asyncio.Lock()
-    
-    async def get(self, key: str) -> Optional[Any]:
-        """Get cached value if not expired"""
-        async with self._lock:
-            if key in self._cache:
-                value, expiry = self._cache[key]
-                if datetime.utcnow() < expiry:
-                    return value
-                else:
-                    del self._cache[key]
-        return None
-    
-    async def set(self, key: str, value: Any, ttl_seconds: int):
-        """Set cached value with TTL"""
-        async with self._lock:
-            expiry = datetime.utcnow() + timedelta(seconds=ttl_seconds)
-            self._cache[key] = (value, expiry)
-    
-    async def delete(self, key: str):
-        """Delete cached value"""
-        async with self._lock:
-            self._cache.pop(key, None)
-    
-    async def clear(self):
-        """Clear all cache"""
-        async with self._lock:
-            self._cache.clear()
-
-
-# Global cache instance
-cache = CacheManager()
+cache = get_cache("admin_analytics")
 
 
 # ============================================================================
@@ -169,6 +133,7 @@ cache = CacheManager()
 from datetime import datetime, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Dict, List
+from app.admin.analytics_rollups import read_rollups, merge_counts
 
 # Cache TTLs
 DASHBOARD_STATS_TTL = 300  # 5 minutes
@@ -184,343 +149,226 @@ async def get_dashboard_stats(db: AsyncIOMotorDatabase) -> Dict:
     Get overview stats for admin dashboard (cached)
     """
     cache_key = "dashboard:stats"
-    cached = await cache.get(cache_key)
-    if cached:
-        return cached
-    
-    # Total users
-    total_users = await db.users_profile.count_documents({})
     
-    # Active users (used service in last 7 days)
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    active_users = await db.quotas.count_documents({
-        "last_used_at": {"$gte": seven_days_ago}
-    })
-    
-    # Tier distribution (normalized)
-    tier_counts = await db.quotas.aggregate([
-        {
-            "$group": {
-                "_id": {
-                    "$ifNull": [
-                        {
-                            "$cond": [
-                                {"$in": ["$tier", list(PricingConfig.VALID_TIERS)]},
-                                "$tier",
-                                PricingConfig.DEFAULT_TIER
-                            ]
-                        },
-                        PricingConfig.DEFAULT_TIER
-                    ]
-                },
-                "count": {"$sum": 1}
+    async def load():
+        # Total users
+        total_users = await db.users_profile.count_documents({})
+        
+        # Active users (used service in last 7 days)
+        seven_days_ago = datetime.utcnow() - timedelta(days=7)
+        active_users = await db.quotas.count_documents({
+            "last_used_at": {"$gte": seven_days_ago}
+        })
+        
+        # Tier distribution (normalized)
+        tier_counts = await db.quotas.aggregate([
+            {
+                "$group": {
+                    "_id": {
+                        "$ifNull": [
+                            {
+                                "$cond": [
+                                    {"$in": ["$tier", list(PricingConfig.VALID_TIERS)]},
+                                    "$tier",
+                                    PricingConfig.DEFAULT_TIER
+                                ]
+                            },
+                            PricingConfig.DEFAULT_TIER
+                        ]
+                    },
+                    "count": {"$sum": 1}
+                }
             }
-        }
-    ]).to_list(length=None)
-    
-    tier_distribution = {item["_id"]: item["count"] for item in tier_counts}
-    
-    # Total payments
-    total_payments = await db.payments.count_documents({"status": "captured"})
-    
-    # Total revenue (in rupees)
-    revenue_pipeline = await db.payments.aggregate([
-        {"$match": {"status": "captured"}},
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": {"$ifNull": ["$amount", 0]}}
+        ]).to_list(length=None)
+        
+        tier_distribution = {item["_id"]: item["count"] for item in tier_counts}
+        
+        # Total payments
+        total_payments = await db.payments.count_documents({"status": "captured"})
+        
+        # Total revenue (in rupees)
+        revenue_pipeline = await db.payments.aggregate([
+            {"$match": {"status": "captured"}},
+            {
+                "$group": {
+                    "_id": None,
+                    "total": {"$sum": {"$ifNull": ["$amount", 0]}}
+                }
             }
-        }
-    ]).to_list(length=1)
-    
-    total_revenue = revenue_pipeline[0]["total"] / 100 if revenue_pipeline else 0
-    
-    # Pending tickets
-    pending_tickets = await db.help_tickets.count_documents({"status": "pending"})
-    
-    # Today's revenue (IST timezone)
-    now_ist = datetime.now(IST)
-    today_start_ist = now_ist.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_start_utc = today_start_ist.astimezone(timezone.utc).replace(tzinfo=None)
-    
-    today_revenue_pipeline = await db.payments.aggregate([
-        {
-            "$match": {
-                "status": "captured",
-                "created_at": {"$gte": today_start_utc}
+        ]).to_list(length=1)
+        
+        total_revenue = revenue_pipeline[0]["total"] / 100 if revenue_pipeline else 0
+        
+        # Pending tickets
+        pending_tickets = await db.help_tickets.count_documents({"status": "pending"})
+        
+        # Today's revenue (IST timezone)
+        now_ist = datetime.now(IST)
+        today_start_ist = now_ist.replace(hour=0, minute=0, second=0, microsecond=0)
+        today_start_utc = today_start_ist.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        today_revenue_pipeline = await db.payments.aggregate([
+            {
+                "$match": {
+                    "status": "captured",
+                    "created_at": {"$gte": today_start_utc}
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "total": {"$sum": {"$ifNull": ["$amount", 0]}}
+                }
             }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": {"$ifNull": ["$amount", 0]}}
+        ]).to_list(length=1)
+        
+        today_revenue = today_revenue_pipeline[0]["total"] / 100 if today_revenue_pipeline else 0
+        
+        # Gemini API costs (today)
+        gemini_stats = await db.gemini_key_stats.aggregate([
+            {
+                "$group": {
+                    "_id": None,
+                    "total_requests": {"$sum": {"$ifNull": ["$requests_today", 0]}},
+                    "total_input_tokens": {"$sum": {"$ifNull": ["$tokens_today.input_tokens", 0]}},
+                    "total_output_tokens": {"$sum": {"$ifNull": ["$tokens_today.output_tokens", 0]}}
+                }
             }
-        }
-    ]).to_list(length=1)
-    
-    today_revenue = today_revenue_pipeline[0]["total"] / 100 if today_revenue_pipeline else 0
-    
-    # Gemini API costs (today)
-    gemini_stats = await db.gemini_key_stats.aggregate([
-        {
-            "$group": {
-                "_id": None,
-                "total_requests": {"$sum": {"$ifNull": ["$requests_today", 0]}},
-                "total_input_tokens": {"$sum": {"$ifNull": ["$tokens_today.input_tokens", 0]}},
-                "total_output_tokens": {"$sum": {"$ifNull": ["$tokens_today.output_tokens", 0]}}
+        ]).to_list(length=1)
+        
+        if gemini_stats:
+            stats = gemini_stats[0]
+            gemini_cost_today = PricingConfig.calculate_gemini_cost_inr(
+                input_tokens=stats["total_input_tokens"],
+                output_tokens=stats["total_output_tokens"],
+                model=GeminiModel.FLASH
+            )
+        else:
+            gemini_cost_today = 0
+            stats = {"total_requests": 0, "total_input_tokens": 0, "total_output_tokens": 0}
+        
+        result = {
+            "overview": {
+                "total_users": total_users,
+                "active_users": active_users,
+                "total_payments": total_payments,
+                "total_revenue_inr": round(total_revenue, 2),
+                "today_revenue_inr": round(today_revenue, 2),
+                "pending_tickets": pending_tickets
+            },
+            "tier_distribution": tier_distribution,
+            "gemini_api": {
+                "requests_today": stats["total_requests"],
+                "input_tokens_today": stats["total_input_tokens"],
+                "output_tokens_today": stats["total_output_tokens"],
+                "cost_today_inr": round(gemini_cost_today, 2)
             }
         }
-    ]).to_list(length=1)
-    
-    if gemini_stats:
-        stats = gemini_stats[0]
-        gemini_cost_today = PricingConfig.calculate_gemini_cost_inr(
-            input_tokens=stats["total_input_tokens"],
-            output_tokens=stats["total_output_tokens"],
-            model=GeminiModel.FLASH
-        )
-    else:
-        gemini_cost_today = 0
-        stats = {"total_requests": 0, "total_input_tokens": 0, "total_output_tokens": 0}
-    
-    result = {
-        "overview": {
-            "total_users": total_users,
-            "active_users": active_users,
-            "total_payments": total_payments,
-            "total_revenue_inr": round(total_revenue, 2),
-            "today_revenue_inr": round(today_revenue, 2),
-            "pending_tickets": pending_tickets
-        },
-        "tier_distribution": tier_distribution,
-        "gemini_api": {
-            "requests_today": stats["total_requests"],
-            "input_tokens_today": stats["total_input_tokens"],
-            "output_tokens_today": stats["total_output_tokens"],
-            "cost_today_inr": round(gemini_cost_today, 2)
-        }
-    }
+        
+        return result
     
-    await cache.set(cache_key, result, DASHBOARD_STATS_TTL)
-    return result
+    return await cache.get_or_set(cache_key, load, DASHBOARD_STATS_TTL)
 
 
 async def get_revenue_chart(db: AsyncIOMotorDatabase, days: int = 30) -> List[Dict]:
     """
     Get daily revenue for last N days (cached, IST timezone)
+    Reads N+1 daily rollup buckets instead of scanning payments
     """
     cache_key = f"chart:revenue:{days}"
-    cached = await cache.get(cache_key)
-    if cached:
-        return cached
-    
-    # Calculate start date in IST
-    now_ist = datetime.now(IST)
-    start_date_ist = (now_ist - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
-    start_date_utc = start_date_ist.astimezone(timezone.utc).replace(tzinfo=None)
     
-    pipeline = await db.payments.aggregate([
-        {
-            "$match": {
-                "status": "captured",
-                "created_at": {"$gte": start_date_utc}
+    async def load():
+        buckets = await read_rollups(db, "revenue", days)
+        return [
+            {
+                "date": bucket["day"],
+                "revenue_inr": round(bucket["revenue_paise"] / 100, 2),
+                "payment_count": bucket["payment_count"]
             }
-        },
-        {
-            "$addFields": {
-                # Convert UTC to IST for grouping
-                "ist_date": {
-                    "$dateAdd": {
-                        "startDate": "$created_at",
-                        "unit": "minute",
-                        "amount": 330  # +5:30 hours
-                    }
-                }
-            }
-        },
-        {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$ist_date"}},
-                "revenue": {"$sum": {"$ifNull": ["$amount", 0]}},
-                "count": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]).to_list(length=None)
-    
-    result = [
-        {
-            "date": item["_id"],
-            "revenue_inr": round(item["revenue"] / 100, 2),
-            "payment_count": item["count"]
-        }
-        for item in pipeline
-    ]
+            for bucket in buckets
+            if bucket["payment_count"]
+        ]
     
-    await cache.set(cache_key, result, CHART_DATA_TTL)
-    return result
+    return await cache.get_or_set(cache_key, load, CHART_DATA_TTL)
 
 
 async def get_user_growth_chart(db: AsyncIOMotorDatabase, days: int = 30) -> List[Dict]:
     """
-    Get daily user registrations for last N days (cached, fixed date filter)
+    Get daily user registrations for last N days (cached, IST timezone)
+    Reads N+1 daily rollup buckets instead of scanning users_profile
     """
     cache_key = f"chart:user_growth:{days}"
-    cached = await cache.get(cache_key)
-    if cached:
-        return cached
-    
-    # Calculate start date
-    now_ist = datetime.now(IST)
-    start_date_ist = (now_ist - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
-    start_date_utc = start_date_ist.astimezone(timezone.utc).replace(tzinfo=None)
     
-    pipeline = await db.users_profile.aggregate([
-        {
-            "$match": {
-                "created_at": {
-                    "$exists": True,
-                    "$gte": start_date_utc  # ✅ FIXED: Apply date filter
-                }
-            }
-        },
-        {
-            "$addFields": {
-                "ist_date": {
-                    "$dateAdd": {
-                        "startDate": "$created_at",
-                        "unit": "minute",
-                        "amount": 330
-                    }
-                }
-            }
-        },
-        {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$ist_date"}},
-                "count": {"$sum": 1}
+    async def load():
+        buckets = await read_rollups(db, "signups", days)
+        return [
+            {
+                "date": bucket["day"],
+                "new_users": bucket["new_users"]
             }
-        },
-        {"$sort": {"_id": 1}}
-    ]).to_list(length=None)
-    
-    result = [
-        {
-            "date": item["_id"],
-            "new_users": item["count"]
-        }
-        for item in pipeline
-    ]
+            for bucket in buckets
+            if bucket["new_users"]
+        ]
     
-    await cache.set(cache_key, result, CHART_DATA_TTL)
-    return result
+    return await cache.get_or_set(cache_key, load, CHART_DATA_TTL)
 
 
-async def get_command_usage_stats(db: AsyncIOMotorDatabase) -> List[Dict]:
+async def get_command_usage_stats(db: AsyncIOMotorDatabase, days: int = 30) -> List[Dict]:
     """
-    Get most used commands across all users (cached)
+    Get most used commands over the last N days (cached)
     """
-    cache_key = "stats:command_usage"
-    cached = await cache.get(cache_key)
-    if cached:
-        return cached
-    
-    pipeline = await db.quotas.aggregate([
-        {
-            "$project": {
-                "commands": {
-                    "$ifNull": [
-                        {"$objectToArray": "$used.commands"},
-                        []
-                    ]
-                }
+    cache_key = f"stats:command_usage:{days}"
+    
+    async def load():
+        buckets = await read_rollups(db, "commands", days)
+        totals = merge_counts(buckets, "commands", "command")
+        top = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:20]
+        return [
+            {
+                "command": command,
+                "usage_count": count
             }
-        },
-        {"$unwind": {"path": "$commands", "preserveNullAndEmptyArrays": False}},
-        {
-            "$group": {
-                "_id": "$commands.k",
-                "total_usage": {"$sum": {"$ifNull": ["$commands.v", 0]}}
-            }
-        },
-        {"$sort": {"total_usage": -1}},
-        {"$limit": 20}
-    ]).to_list(length=None)
+            for command, count in top
+        ]
     
-    result = [
-        {
-            "command": item["_id"],
-            "usage_count": item["total_usage"]
-        }
-        for item in pipeline
-    ]
-    
-    await cache.set(cache_key, result, COMMAND_STATS_TTL)
-    return result
+    return await cache.get_or_set(cache_key, load, COMMAND_STATS_TTL)
 
 
-async def get_top_users_by_usage(db: AsyncIOMotorDatabase, limit: int = 10) -> List[Dict]:
+async def get_top_users_by_usage(db: AsyncIOMotorDatabase, limit: int = 10, days: int = 30) -> List[Dict]:
     """
-    Get top users by total command usage (cached)
+    Get top users by total command usage over the last N days (cached)
     """
-    cache_key = f"stats:top_users:{limit}"
-    cached = await cache.get(cache_key)
-    if cached:
-        return cached
+    cache_key = f"stats:top_users:{limit}:{days}"
     
-    pipeline = await db.quotas.aggregate([
-        {
-            "$project": {
-                "sidhi_id": 1,
-                "tier": {
-                    "$ifNull": [
-                        {
-                            "$cond": [
-                                {"$in": ["$tier", list(PricingConfig.VALID_TIERS)]},
-                                "$tier",
-                                PricingConfig.DEFAULT_TIER
-                            ]
-                        },
-                        PricingConfig.DEFAULT_TIER
-                    ]
-                },
-                "total_usage": {
-                    "$sum": {
-                        "$map": {
-                            "input": {
-                                "$ifNull": [
-                                    {"$objectToArray": "$used.commands"},
-                                    []
-                                ]
-                            },
-                            "as": "cmd",
-                            "in": {"$ifNull": ["$$cmd.v", 0]}
-                        }
-                    }
-                }
+    async def load():
+        buckets = await read_rollups(db, "commands", days)
+        totals = merge_counts(buckets, "users", "sidhi_id")
+        top = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        sidhi_ids = [sidhi_id for sidhi_id, _ in top]
+        
+        # Enrich with profile and tier in two $in lookups
+        profiles = await db.users_profile.find(
+            {"sidhi_id": {"$in": sidhi_ids}},
+            {"sidhi_id": 1, "username": 1, "_id": 0}
+        ).to_list(length=None)
+        quotas = await db.quotas.find(
+            {"sidhi_id": {"$in": sidhi_ids}},
+            {"sidhi_id": 1, "tier": 1, "_id": 0}
+        ).to_list(length=None)
+        usernames = {p["sidhi_id"]: p.get("username") for p in profiles}
+        tiers = {q["sidhi_id"]: q.get("tier") for q in quotas}
+        
+        return [
+            {
+                "sidhi_id": sidhi_id,
+                "username": usernames.get(sidhi_id) or "Unknown",
+                "tier": tiers.get(sidhi_id) if tiers.get(sidhi_id) in PricingConfig.VALID_TIERS else PricingConfig.DEFAULT_TIER,
+                "total_usage": count
             }
-        },
-        {"$sort": {"total_usage": -1}},
-        {"$limit": limit}
-    ]).to_list(length=limit)
-    
-    # Enrich with user profile data
-    result = []
-    for item in pipeline:
-        profile = await db.users_profile.find_one(
-            {"sidhi_id": item["sidhi_id"]},
-            {"username": 1, "_id": 0}
-        )
-        result.append({
-            "sidhi_id": item["sidhi_id"],
-            "username": profile.get("username") if profile else "Unknown",
-            "tier": item["tier"],
-            "total_usage": item["total_usage"]
-        })
+            for sidhi_id, count in top
+        ]
     
-    await cache.set(cache_key, result, COMMAND_STATS_TTL)
-    return result
+    return await cache.get_or_set(cache_key, load, COMMAND_STATS_TTL)
 
 
 # ============================================================================
@@ -5,10 +5,12 @@ Verifies username/password and issues admin JWT tokens with hardened security
 
 import os
 import jwt
+import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, Header
+from motor.motor_asyncio import AsyncIOMotorClient
 
 # Configuration validation
 class Config:
@@ -38,9 +40,23 @@ class Config:
 # Global config instance
 config: Optional[Config] = None
 
-# Session blacklist (in production, use Redis/MongoDB)
-# Format: {jti: expiration_timestamp}
+# Session blacklist. Never kept in the shared LRU cache: an evicted entry
+# would make a logged-out token valid again.
+#   revoked_sessions           - this worker's copy, {jti: exp timestamp}
+#   admin_revoked_sessions     - Mongo, {_id: jti, exp, expires_at}, TTL index,
+#                                so a logout holds on every worker
 revoked_sessions: dict[str, float] = {}
+_revoked_collection = None
+
+
+async def _revocations():
+    """Mongo collection of revoked sessions (created on first use)"""
+    global _revoked_collection
+    if _revoked_collection is None:
+        collection = AsyncIOMotorClient(os.getenv("MONGO_URL")).lumetrics_db.admin_revoked_sessions
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        _revoked_collection = collection
+    return _revoked_collection
 
 
 def init_auth() -> None:
@@ -130,7 +146,8 @@ def create_admin_jwt(email: str) -> str:
 
 def verify_admin_jwt(token: str) -> dict:
     """
-    Verify admin JWT token and check revocation status
+    Verify admin JWT signature, claims and role
+    Revocation is checked by get_current_admin (shared blacklist lookup)
     
     Args:
         token: JWT token
@@ -139,7 +156,7 @@ def verify_admin_jwt(token: str) -> dict:
         dict: Decoded token payload
         
     Raises:
-        HTTPException: If token invalid, expired, or revoked
+        HTTPException: If token invalid or expired
     """
     if config is None:
         raise HTTPException(status_code=500, detail="Authentication system not initialized")
@@ -157,11 +174,6 @@ def verify_admin_jwt(token: str) -> dict:
         if payload.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Check if session revoked
-        jti = payload.get("jti")
-        if jti and _is_session_revoked(jti):
-            raise HTTPException(status_code=401, detail="Session revoked")
-        
         # In production: Verify session exists in Redis/MongoDB
         # if not redis.exists(f"admin_session:{jti}"):
         #     raise HTTPException(status_code=401, detail="Session expired")
@@ -178,7 +190,7 @@ def verify_admin_jwt(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Authentication failed")
 
 
-def revoke_admin_session(token: str) -> None:
+async def revoke_admin_session(token: str) -> None:
     """
     Revoke admin session (logout)
     
@@ -198,39 +210,48 @@ def revoke_admin_session(token: str) -> None:
         exp = payload.get("exp")
         
         if jti and exp:
-            # Add to blacklist until token expiration
+            # Blacklist until token expiration - the entry expires with the token
             revoked_sessions[jti] = exp
-            
-            # In production: Add to Redis with TTL
-            # redis.setex(f"revoked:{jti}", exp - time.time(), "1")
-            # redis.delete(f"admin_session:{jti}")
-            
-            # Cleanup expired entries
             _cleanup_revoked_sessions()
             
-    except Exception:
-        # Silent fail on revocation - token will expire naturally
-        pass
+            collection = await _revocations()
+            await collection.update_one(
+                {"_id": jti},
+                {"$set": {"exp": exp, "expires_at": datetime.utcfromtimestamp(exp)}},
+                upsert=True
+            )
+            
+    except Exception as e:
+        # Still revoked on this worker; others accept it until expiry
+        print(f"⚠️ Admin session revocation not shared: {e}")
 
 
-def _is_session_revoked(jti: str) -> bool:
-    """Check if session is revoked"""
-    if jti in revoked_sessions:
-        # Check if revocation still valid
-        if revoked_sessions[jti] > datetime.utcnow().timestamp():
-            return True
-        else:
-            # Cleanup expired revocation
-            del revoked_sessions[jti]
-    return False
+def _cleanup_revoked_sessions() -> None:
+    """Drop local entries whose token has expired anyway"""
+    now = time.time()
+    for jti in [j for j, exp in revoked_sessions.items() if exp <= now]:
+        revoked_sessions.pop(jti, None)
 
 
-def _cleanup_revoked_sessions() -> None:
-    """Remove expired revocations from memory"""
-    now = datetime.utcnow().timestamp()
-    expired = [jti for jti, exp in revoked_sessions.items() if exp <= now]
-    for jti in expired:
-        del revoked_sessions[jti]
+async def _is_session_revoked(jti: str) -> bool:
+    """
+    Check if session is revoked (locally, then on the shared collection)
+    Fails closed: if the shared collection cannot be read, the request is refused.
+    """
+    if jti in revoked_sessions:
+        return True
+    
+    try:
+        collection = await _revocations()
+        doc = await collection.find_one({"_id": jti})
+    except Exception as e:
+        print(f"⚠️ Admin revocation lookup failed, refusing session: {e}")
+        raise HTTPException(status_code=503, detail="Session check unavailable, try again")
+    
+    if doc:
+        revoked_sessions[jti] = doc["exp"]
+        return True
+    return False
 
 
 async def get_current_admin(authorization: str = Header(None)) -> dict:
@@ -266,6 +287,11 @@ async def get_current_admin(authorization: str = Header(None)) -> dict:
     # Verify JWT - returns same payload structure as before
     admin = verify_admin_jwt(token)
     
+    # Check if session revoked
+    jti = admin.get("jti")
+    if jti and await _is_session_revoked(jti):
+        raise HTTPException(status_code=401, detail="Session revoked")
+    
     return admin
 
 
@@ -305,7 +331,7 @@ async def logout(admin: dict = Depends(get_current_admin), authorization: str =
     Logout - revokes current JWT token
     '''
     token = authorization.split(" ")[1]
-    revoke_admin_session(token)
+    await revoke_admin_session(token)
     return {"message": "Logged out successfully"}
 
 @app.get("/admin/dashboard")
@@ -10,6 +10,9 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+import base64
+import json
+import re
 
 # Import our modules
 from app.admin.hardened_firebase_auth import get_current_admin
@@ -21,11 +24,21 @@ from app.admin.hardened_analytics import (
     get_top_users_by_usage
 
 )
+from app.admin.analytics_rollups import enqueue_backfill, get_backfill_job, ist_today
+from app.system.notifications import create_notification, read_counts as notification_read_counts
+from app.system.identity import (
+    backfill_profile_search_fields,
+    invalidate_profile_by_sidhi,
+    profile_search_fields
+)
 from app.admin.safe_bulk_operations import (
     bulk_upgrade_users,
     bulk_reset_quotas,
     bulk_ban_users,
     bulk_unban_users,
+    get_bulk_job_status,
+    resume_bulk_job,
+    create_bulk_job_indexes,
     export_users_csv,
     export_payments_csv,
     export_tickets_csv
@@ -240,13 +253,14 @@ async def user_growth_analytics(
 
 @router.get("/analytics/commands")
 async def command_usage_analytics(
+    days: int = Query(30, ge=1, le=365),
     admin: dict = Depends(get_current_admin),
     db_instance: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
-    Get command usage statistics
+    Get command usage statistics for the last N days
     """
-    data = await get_command_usage_stats(db_instance)
+    data = await get_command_usage_stats(db_instance, days)
     return {
         "status": "success",
         "commands": data
@@ -256,23 +270,101 @@ async def command_usage_analytics(
 @router.get("/analytics/top-users")
 async def top_users_analytics(
     limit: int = Query(10, ge=1, le=100),
+    days: int = Query(30, ge=1, le=365),
     admin: dict = Depends(get_current_admin),
     db_instance: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
-    Get top users by usage
+    Get top users by usage over the last N days
     """
-    data = await get_top_users_by_usage(db_instance, limit)
+    data = await get_top_users_by_usage(db_instance, limit, days)
     return {
         "status": "success",
         "top_users": data
     }
 
 
+@router.post("/analytics/rollups/backfill")
+async def backfill_analytics_rollups(
+    start_date: str = Query(..., description="First IST day, YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Last IST day, YYYY-MM-DD (default: today)"),
+    admin: dict = Depends(get_current_admin),
+    db_instance: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Queue a recompute of daily analytics rollups for a historical range
+    
+    Runs in the background on the compactor worker, checkpointed per day;
+    progress at /analytics/rollups/backfill/{job_id}
+    """
+    try:
+        start_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end_day = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else ist_today()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    
+    if end_day < start_day:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_day - start_day).days > 3660:
+        raise HTTPException(status_code=400, detail="Backfill at most 10 years per call")
+    
+    job = await enqueue_backfill(db_instance, start_day, end_day, admin.get("email"))
+    
+    return {
+        "status": "queued",
+        "job": job
+    }
+
+
+@router.get("/analytics/rollups/backfill/{job_id}")
+async def analytics_backfill_status(
+    job_id: str,
+    admin: dict = Depends(get_current_admin),
+    db_instance: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Progress of a queued rollup backfill (next_day, days_processed, status)
+    """
+    job = await get_backfill_job(db_instance, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return {"status": "success", "job": job}
+
+
 # ============================================================================
 # USER MANAGEMENT
 # ============================================================================
 
+def _encode_user_cursor(user: dict) -> str:
+    """Opaque keyset cursor from the last user on a page"""
+    created_at = user.get("created_at")
+    payload = {
+        "c": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "s": user["sidhi_id"]
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_user_cursor(cursor: str) -> dict:
+    """Mongo filter selecting users strictly after the cursor in (created_at, sidhi_id) desc order"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        sidhi_id = payload["s"]
+        created_at = datetime.fromisoformat(payload["c"]) if payload.get("c") else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if created_at is None:
+        # Users without created_at sort last - only ties on sidhi_id remain
+        return {"created_at": None, "sidhi_id": {"$lt": sidhi_id}}
+    
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "sidhi_id": {"$lt": sidhi_id}},
+        {"created_at": None}
+    ]}
+
+
 @router.get("/users")
 async def list_all_users(
     page: int = Query(1, ge=1),
@@ -280,6 +372,7 @@ async def list_all_users(
     search: Optional[str] = None,
     tier: Optional[str] = None,
     is_banned: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (preferred over page)"),
     admin: dict = Depends(get_current_admin),
     db_instance: AsyncIOMotorDatabase = Depends(get_db)
 ):
@@ -287,45 +380,62 @@ async def list_all_users(
     List all users with pagination and filters
     
     Filters:
-    - search: Search by username, email, sidhi_id
-    - tier: Filter by tier (free, hero, dominator)
+    - search: Prefix search on sidhi_id, and case-insensitive prefix
+      search on username and email
+    - tier: Filter by tier (free, hero, dominator, none)
     - is_banned: Filter banned users
+    
+    Pagination: pass `cursor` (keyset on created_at) for constant-cost
+    paging; `page` still works for old clients but skips linearly.
     """
     query = {}
     
-    # Search filter
+    # Search filter - anchored, case-sensitive prefixes so every branch
+    # is an index range scan; username/email match their lowercased copies
     if search:
+        term = search.strip()
+        lowered = "^" + re.escape(term.lower())
         query["$or"] = [
-            {"username": {"$regex": search, "$options": "i"}},
-            {"email_id": {"$regex": search, "$options": "i"}},
-            {"sidhi_id": {"$regex": search, "$options": "i"}}
+            {"sidhi_id": {"$regex": "^" + re.escape(term)}},
+            {"email_lower": {"$regex": lowered}},
+            {"username_lower": {"$regex": lowered}}
         ]
     
     # Ban filter
     if is_banned is not None:
         query["is_banned"] = is_banned
     
-    # Get users
-    skip = (page - 1) * limit
-    users_cursor = db_instance.users_profile.find(query, {"_id": 0}) \
-        .skip(skip) \
-        .limit(limit) \
-        .sort("created_at", -1)
-    
-    users = await users_cursor.to_list(length=limit)
-    
-    # Enrich with quota info
-    for user in users:
-        quota = await db_instance.quotas.find_one(
-            {"sidhi_id": user["sidhi_id"]},
-            {"tier": 1, "_id": 0}
-        )
-        user["tier"] = quota.get("tier") if quota else "none"
-    
-    # Apply tier filter after enrichment
-    if tier:
-        users = [u for u in users if u.get("tier") == tier]
-    
+    # Tier filter - resolved from quotas first so the users query stays a
+    # plain indexed match that paginates and counts without a join
+    if tier == "none":
+        query["sidhi_id"] = {"$nin": await db_instance.quotas.distinct("sidhi_id")}
+    elif tier:
+        query["sidhi_id"] = {"$in": await db_instance.quotas.distinct("sidhi_id", {"tier": tier})}
+    
+    page_query = dict(query)
+    if cursor:
+        page_query = {"$and": [query, _decode_user_cursor(cursor)]} if query else _decode_user_cursor(cursor)
+    
+    pipeline = [
+        {"$match": page_query},
+        {"$sort": {"created_at": -1, "sidhi_id": -1}},
+    ]
+    if not cursor:
+        pipeline.append({"$skip": (page - 1) * limit})
+    pipeline += [
+        {"$limit": limit},
+        # Tier for display, joined on the page only
+        {"$lookup": {
+            "from": "quotas",
+            "localField": "sidhi_id",
+            "foreignField": "sidhi_id",
+            "as": "quota"
+        }},
+        {"$addFields": {"tier": {"$ifNull": [{"$arrayElemAt": ["$quota.tier", 0]}, "none"]}}},
+        {"$project": {"_id": 0, "quota": 0, "username_lower": 0, "email_lower": 0}}
+    ]
+    
+    users = await db_instance.users_profile.aggregate(pipeline).to_list(length=limit)
     total_count = await db_instance.users_profile.count_documents(query)
     
     return {
@@ -335,11 +445,30 @@ async def list_all_users(
             "page": page,
             "limit": limit,
             "total": total_count,
-            "total_pages": (total_count + limit - 1) // limit
+            "total_pages": (total_count + limit - 1) // limit,
+            "next_cursor": _encode_user_cursor(users[-1]) if len(users) == limit else None
         }
     }
 
 
+async def create_admin_indexes():
+    """Indexes backing the admin user listing and bulk jobs"""
+    try:
+        await db.users_profile.create_index([("created_at", -1), ("sidhi_id", -1)])
+        await db.users_profile.create_index([("is_banned", 1), ("created_at", -1)])
+        await db.users_profile.create_index("sidhi_id")
+        await db.users_profile.create_index("email_id")
+        await db.users_profile.create_index("username")
+        await db.users_profile.create_index("username_lower")
+        await db.users_profile.create_index("email_lower")
+        await db.quotas.create_index([("tier", 1), ("sidhi_id", 1)])
+        await backfill_profile_search_fields(db)
+        await create_bulk_job_indexes(db)
+        print("✅ Admin indexes created successfully")
+    except Exception as e:
+        print(f"⚠️  Admin index warning: {e}")
+
+
 @router.get("/users/{sidhi_id}")
 async def get_user_details(
     sidhi_id: str,
@@ -429,11 +558,12 @@ async def update_user(
     
     result = await db_instance.users_profile.update_one(
         {"sidhi_id": sidhi_id},
-        {"$set": update_fields}
+        {"$set": {**update_fields, **profile_search_fields(update_fields)}}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_profile_by_sidhi(db_instance, sidhi_id)
     
     return {
         "status": "success",
@@ -460,6 +590,7 @@ async def delete_user(
     - help_bot_history
     """
     # Delete from all collections
+    await invalidate_profile_by_sidhi(db_instance, sidhi_id)
     await db_instance.users_profile.delete_one({"sidhi_id": sidhi_id})
     await db_instance.users.delete_one({"sid_id": sidhi_id})
     await db_instance.quotas.delete_one({"sidhi_id": sidhi_id})
@@ -647,9 +778,9 @@ async def bulk_upgrade(
     """
     Bulk upgrade multiple users to a tier
     
-    Max 1000 users at once
+    Max 10000 users at once, applied in chunks; progress at /bulk/jobs/{job_id}
     """
-    result = await bulk_upgrade_users(data.sidhi_ids, data.tier)
+    result = await bulk_upgrade_users(data.sidhi_ids, data.tier, admin.get("email"))
     return result
 
 
@@ -662,7 +793,7 @@ async def bulk_reset(
     """
     Bulk reset quotas for multiple users
     """
-    result = await bulk_reset_quotas(data.sidhi_ids, data.reset_type)
+    result = await bulk_reset_quotas(data.sidhi_ids, data.reset_type, admin.get("email"))
     return result
 
 
@@ -675,7 +806,7 @@ async def bulk_ban(
     """
     Bulk ban multiple users
     """
-    result = await bulk_ban_users(data.sidhi_ids, data.reason)
+    result = await bulk_ban_users(data.sidhi_ids, data.reason, admin.get("email"))
     return result
 
 
@@ -688,10 +819,32 @@ async def bulk_unban(
     """
     Bulk unban multiple users
     """
-    result = await bulk_unban_users(sidhi_ids)
+    result = await bulk_unban_users(sidhi_ids, admin.get("email"))
     return result
 
 
+@router.get("/bulk/jobs/{job_id}")
+async def bulk_job_status(
+    job_id: str,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Progress of a bulk operation (processed / total, counts, errors)
+    """
+    return await get_bulk_job_status(job_id)
+
+
+@router.post("/bulk/jobs/{job_id}/resume")
+async def bulk_job_resume(
+    job_id: str,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Resume a failed or stalled bulk operation from its last committed chunk
+    """
+    return await resume_bulk_job(job_id)
+
+
 # ============================================================================
 # PAYMENT MANAGEMENT
 # ============================================================================
@@ -954,30 +1107,23 @@ async def send_notification(
     if data.target_type == "specific" and not data.target_users:
         raise HTTPException(status_code=400, detail="target_users required for specific notifications")
     
-    expires_at = None
-    if data.expires_hours:
-        expires_at = datetime.utcnow() + timedelta(hours=data.expires_hours)
-    
-    notification = {
-        "title": data.title,
-        "message": data.message,
-        "type": data.type,
-        "priority": data.priority,
-        "target_type": data.target_type,
-        "target_users": data.target_users or [],
-        "action_url": data.action_url,
-        "expires_at": expires_at,
-        "created_at": datetime.utcnow(),
-        "created_by": admin.get("email"),
-        "read_by": []
-    }
-    
-    result = await db_instance.notifications.insert_one(notification)
+    notification_id = await create_notification(
+        db_instance,
+        title=data.title,
+        message=data.message,
+        type=data.type,
+        priority=data.priority,
+        target_type=data.target_type,
+        target_users=data.target_users,
+        created_by=admin.get("email"),
+        expires_hours=data.expires_hours,
+        action_url=data.action_url
+    )
     
     return {
         "status": "success",
         "message": "Notification sent",
-        "notification_id": str(result.inserted_id),
+        "notification_id": notification_id,
         "target_count": len(data.target_users) if data.target_type == "specific" else "all"
     }
 
@@ -1001,9 +1147,12 @@ async def notification_history(
         .sort("created_at", -1) \
         .to_list(length=limit)
     
+    counts = await notification_read_counts(db_instance, notifications)
     for notif in notifications:
         notif["_id"] = str(notif["_id"])
-        notif["read_count"] = len(notif.get("read_by", []))
+        notif["read_count"] = counts[notif["_id"]]
+        notif.pop("read_by", None)
+        notif.pop("audience", None)
     
     total_count = await db_instance.notifications.count_documents({})
     
@@ -25,6 +25,13 @@ class BulkActionType(str, Enum):
     DOWNGRADE_USERS = "bulk_downgrade"
 
 
+class BulkJobStatus(str, Enum):
+    """Lifecycle of a chunked bulk job"""
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class QuotaResetType(str, Enum):
     """Types of quota resets"""
     FULL = "full"
@@ -267,9 +274,13 @@ class AuditService:
 # services/bulk_service.py - Safe Bulk Operations
 # ============================================================================
 
-from typing import List, Dict
+import os
+import uuid
+from typing import List, Dict, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from fastapi import HTTPException
+from pymongo import UpdateOne, ReturnDocument
+from app.system.identity import invalidate_all_profiles
 
 class BulkOperationResult:
     """Result of bulk operation"""
@@ -291,9 +302,19 @@ class BulkOperationResult:
 
 
 class BulkService:
-    """Safe bulk operations with transactions and dry-run"""
+    """
+    Safe bulk operations with dry-run and chunked transactions
     
-    MAX_BULK_SIZE = 1000  # Safety limit
+    Each operation is recorded as a job in `admin_bulk_jobs`. Targets are
+    processed in chunks of CHUNK_SIZE; every chunk is one bulk_write inside
+    its own transaction together with the job's progress checkpoint, so a
+    failure rolls back only that chunk and the job can resume from it.
+    """
+    
+    MAX_BULK_SIZE = 10_000  # Safety limit
+    CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+    MAX_JOB_ERRORS = 100  # Per-user errors kept on the job document
+    STALE_JOB_SECONDS = 600  # A running job not checkpointed for this long can be resumed
     
     @staticmethod
     def validate_bulk_size(sidhi_ids: List[str]):
@@ -315,7 +336,7 @@ class BulkService:
         dry_run: bool = False
     ) -> Dict:
         """
-        Upgrade multiple users to a specific tier (with transaction)
+        Upgrade multiple users to a specific tier (chunked transactions)
         
         Args:
             db: Database instance
@@ -333,68 +354,16 @@ class BulkService:
         if dry_run:
             return await BulkService._dry_run_upgrade(db, sidhi_ids, tier)
         
-        # Execute with transaction
-        result = BulkOperationResult()
-        
-        async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                try:
-                    # Snapshot before state
-                    before_snapshot = await db.quotas.find(
-                        {"sidhi_id": {"$in": sidhi_ids[:10]}}  # Sample
-                    ).to_list(length=10)
-                    
-                    for sidhi_id in sidhi_ids:
-                        try:
-                            # Create new quota document
-                            quota_doc = QuotaService.create_quota_document(sidhi_id, tier)
-                            
-                            # Update in database
-                            await db.quotas.update_one(
-                                {"sidhi_id": sidhi_id},
-                                {"$set": quota_doc},
-                                upsert=True,
-                                session=session
-                            )
-                            
-                            result.success_count += 1
-                            
-                        except Exception as e:
-                            result.error_count += 1
-                            result.errors.append({
-                                "sidhi_id": sidhi_id,
-                                "error": str(e)
-                            })
-                    
-                    # Snapshot after state
-                    after_snapshot = await db.quotas.find(
-                        {"sidhi_id": {"$in": sidhi_ids[:10]}}
-                    ).to_list(length=10)
-                    
-                    # Log audit trail
-                    await AuditService.log_bulk_action(
-                        db=db,
-                        admin_email=admin_email,
-                        action_type=BulkActionType.UPGRADE_USERS,
-                        target_ids=sidhi_ids,
-                        parameters={"tier": tier.value},
-                        before_snapshot=before_snapshot,
-                        after_snapshot=after_snapshot,
-                        result=result.to_dict(),
-                        session=session
-                    )
-                    
-                    # Commit transaction
-                    await session.commit_transaction()
-                    
-                except Exception as e:
-                    await session.abort_transaction()
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Bulk upgrade failed, transaction rolled back: {str(e)}"
-                    )
+        # Snapshot before state
+        before_snapshot = await db.quotas.find(
+            {"sidhi_id": {"$in": sidhi_ids[:10]}}  # Sample
+        ).to_list(length=10)
         
-        return result.to_dict()
+        job = await BulkService._create_job(
+            db, admin_email, BulkActionType.UPGRADE_USERS, sidhi_ids,
+            {"tier": tier.value}, before_snapshot
+        )
+        return await BulkService._run_job(db, job)
     
     @staticmethod
     async def _dry_run_upgrade(
@@ -437,7 +406,7 @@ class BulkService:
         dry_run: bool = False
     ) -> Dict:
         """
-        Reset quotas for multiple users (with transaction)
+        Reset quotas for multiple users (chunked transactions)
         """
         BulkService.validate_bulk_size(sidhi_ids)
         
@@ -450,66 +419,11 @@ class BulkService:
                 "message": "This is a preview. No changes were made."
             }
         
-        result = BulkOperationResult()
-        
-        async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                try:
-                    for sidhi_id in sidhi_ids:
-                        try:
-                            quota = await db.quotas.find_one(
-                                {"sidhi_id": sidhi_id},
-                                session=session
-                            )
-                            
-                            if not quota:
-                                result.error_count += 1
-                                result.errors.append({
-                                    "sidhi_id": sidhi_id,
-                                    "error": "Quota not found"
-                                })
-                                continue
-                            
-                            # Get reset fields
-                            update_fields = QuotaService.reset_quota_usage(quota, reset_type)
-                            
-                            # Apply update
-                            await db.quotas.update_one(
-                                {"sidhi_id": sidhi_id},
-                                {"$set": update_fields},
-                                session=session
-                            )
-                            
-                            result.success_count += 1
-                            
-                        except Exception as e:
-                            result.error_count += 1
-                            result.errors.append({
-                                "sidhi_id": sidhi_id,
-                                "error": str(e)
-                            })
-                    
-                    # Log audit
-                    await AuditService.log_bulk_action(
-                        db=db,
-                        admin_email=admin_email,
-                        action_type=BulkActionType.RESET_QUOTAS,
-                        target_ids=sidhi_ids,
-                        parameters={"reset_type": reset_type.value},
-                        result=result.to_dict(),
-                        session=session
-                    )
-                    
-                    await session.commit_transaction()
-                    
-                except Exception as e:
-                    await session.abort_transaction()
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Bulk reset failed: {str(e)}"
-                    )
-        
-        return result.to_dict()
+        job = await BulkService._create_job(
+            db, admin_email, BulkActionType.RESET_QUOTAS, sidhi_ids,
+            {"reset_type": reset_type.value}
+        )
+        return await BulkService._run_job(db, job)
     
     @staticmethod
     async def bulk_ban_users(
@@ -520,7 +434,7 @@ class BulkService:
         dry_run: bool = False
     ) -> Dict:
         """
-        Ban multiple users (with transaction)
+        Ban multiple users (chunked transactions)
         """
         BulkService.validate_bulk_size(sidhi_ids)
         
@@ -535,58 +449,11 @@ class BulkService:
                 "message": "This is a preview. No changes were made."
             }
         
-        async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                try:
-                    # Ban users
-                    ban_result = await db.users_profile.update_many(
-                        {"sidhi_id": {"$in": sidhi_ids}},
-                        {"$set": {
-                            "is_banned": True,
-                            "ban_reason": reason,
-                            "banned_at": datetime.utcnow(),
-                            "banned_by": admin_email
-                        }},
-                        session=session
-                    )
-                    
-                    # Invalidate their quotas
-                    await db.quotas.update_many(
-                        {"sidhi_id": {"$in": sidhi_ids}},
-                        {"$set": {
-                            "meta.is_banned": True,
-                            "meta.banned_at": datetime.utcnow()
-                        }},
-                        session=session
-                    )
-                    
-                    # Log audit
-                    await AuditService.log_bulk_action(
-                        db=db,
-                        admin_email=admin_email,
-                        action_type=BulkActionType.BAN_USERS,
-                        target_ids=sidhi_ids,
-                        parameters={"reason": reason},
-                        result={
-                            "banned_count": ban_result.modified_count
-                        },
-                        session=session
-                    )
-                    
-                    await session.commit_transaction()
-                    
-                    return {
-                        "status": "success",
-                        "banned_count": ban_result.modified_count,
-                        "total_requested": len(sidhi_ids)
-                    }
-                    
-                except Exception as e:
-                    await session.abort_transaction()
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Bulk ban failed: {str(e)}"
-                    )
+        job = await BulkService._create_job(
+            db, admin_email, BulkActionType.BAN_USERS, sidhi_ids,
+            {"reason": reason}
+        )
+        return await BulkService._run_job(db, job)
     
     @staticmethod
     async def bulk_unban_users(
@@ -608,48 +475,342 @@ class BulkService:
                 "message": "This is a preview. No changes were made."
             }
         
-        async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                try:
-                    unban_result = await db.users_profile.update_many(
-                        {"sidhi_id": {"$in": sidhi_ids}},
-                        {"$set": {
-                            "is_banned": False,
-                            "ban_reason": None,
-                            "unbanned_at": datetime.utcnow(),
-                            "unbanned_by": admin_email
-                        }},
-                        session=session
-                    )
-                    
-                    await db.quotas.update_many(
-                        {"sidhi_id": {"$in": sidhi_ids}},
-                        {"$set": {
-                            "meta.is_banned": False
-                        }},
-                        session=session
-                    )
-                    
-                    await AuditService.log_bulk_action(
-                        db=db,
-                        admin_email=admin_email,
-                        action_type=BulkActionType.UNBAN_USERS,
-                        target_ids=sidhi_ids,
-                        parameters={},
-                        result={"unbanned_count": unban_result.modified_count},
-                        session=session
+        job = await BulkService._create_job(
+            db, admin_email, BulkActionType.UNBAN_USERS, sidhi_ids, {}
+        )
+        return await BulkService._run_job(db, job)
+    
+    # ------------------------------------------------------------------
+    # Chunk handlers: apply one chunk inside the caller's transaction.
+    # Return (success_count, modified_count, errors).
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    async def _upgrade_chunk(db, admin_email: str, chunk: List[str], parameters: Dict, session) -> Tuple[int, int, List[Dict]]:
+        tier = UserTier(parameters["tier"])
+        ops = [
+            UpdateOne(
+                {"sidhi_id": sidhi_id},
+                {"$set": QuotaService.create_quota_document(sidhi_id, tier)},
+                upsert=True
+            )
+            for sidhi_id in chunk
+        ]
+        result = await db.quotas.bulk_write(ops, ordered=False, session=session)
+        return len(chunk), result.modified_count + result.upserted_count, []
+    
+    @staticmethod
+    async def _reset_chunk(db, admin_email: str, chunk: List[str], parameters: Dict, session) -> Tuple[int, int, List[Dict]]:
+        reset_type = QuotaResetType(parameters["reset_type"])
+        quotas = await db.quotas.find(
+            {"sidhi_id": {"$in": chunk}},
+            session=session
+        ).to_list(length=None)
+        found = {quota["sidhi_id"]: quota for quota in quotas}
+        
+        ops = []
+        errors = []
+        for sidhi_id in chunk:
+            quota = found.get(sidhi_id)
+            if not quota:
+                errors.append({"sidhi_id": sidhi_id, "error": "Quota not found"})
+                continue
+            try:
+                update_fields = QuotaService.reset_quota_usage(quota, reset_type)
+            except Exception as e:
+                errors.append({"sidhi_id": sidhi_id, "error": str(e)})
+                continue
+            ops.append(UpdateOne({"sidhi_id": sidhi_id}, {"$set": update_fields}))
+        
+        modified = 0
+        if ops:
+            result = await db.quotas.bulk_write(ops, ordered=False, session=session)
+            modified = result.modified_count
+        return len(ops), modified, errors
+    
+    @staticmethod
+    async def _ban_chunk(db, admin_email: str, chunk: List[str], parameters: Dict, session) -> Tuple[int, int, List[Dict]]:
+        now = datetime.utcnow()
+        ban_result = await db.users_profile.update_many(
+            {"sidhi_id": {"$in": chunk}},
+            {"$set": {
+                "is_banned": True,
+                "ban_reason": parameters["reason"],
+                "banned_at": now,
+                "banned_by": admin_email
+            }},
+            session=session
+        )
+        
+        # Invalidate their quotas
+        await db.quotas.update_many(
+            {"sidhi_id": {"$in": chunk}},
+            {"$set": {
+                "meta.is_banned": True,
+                "meta.banned_at": now
+            }},
+            session=session
+        )
+        return len(chunk), ban_result.modified_count, []
+    
+    @staticmethod
+    async def _unban_chunk(db, admin_email: str, chunk: List[str], parameters: Dict, session) -> Tuple[int, int, List[Dict]]:
+        unban_result = await db.users_profile.update_many(
+            {"sidhi_id": {"$in": chunk}},
+            {"$set": {
+                "is_banned": False,
+                "ban_reason": None,
+                "unbanned_at": datetime.utcnow(),
+                "unbanned_by": admin_email
+            }},
+            session=session
+        )
+        
+        await db.quotas.update_many(
+            {"sidhi_id": {"$in": chunk}},
+            {"$set": {
+                "meta.is_banned": False
+            }},
+            session=session
+        )
+        return len(chunk), unban_result.modified_count, []
+    
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    async def _create_job(
+        db: AsyncIOMotorDatabase,
+        admin_email: str,
+        action_type: BulkActionType,
+        sidhi_ids: List[str],
+        parameters: Dict,
+        before_snapshot: Optional[List[Dict]] = None
+    ) -> Dict:
+        now = datetime.utcnow()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "action": action_type.value,
+            "admin_email": admin_email,
+            "sidhi_ids": sidhi_ids,
+            "parameters": parameters,
+            "status": BulkJobStatus.RUNNING.value,
+            "total": len(sidhi_ids),
+            "processed": 0,  # Checkpoint: sidhi_ids[:processed] are committed
+            "success_count": 0,
+            "error_count": 0,
+            "modified_count": 0,
+            "errors": [],
+            "last_error": None,
+            "before_snapshot": before_snapshot,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None
+        }
+        await db.admin_bulk_jobs.insert_one(job)
+        return job
+    
+    @staticmethod
+    async def _run_job(db: AsyncIOMotorDatabase, job: Dict) -> Dict:
+        """
+        Process a job from its checkpoint to the end, one transaction per chunk
+        """
+        action_type = BulkActionType(job["action"])
+        handler = BulkService._CHUNK_HANDLERS[action_type]
+        sidhi_ids = job["sidhi_ids"]
+        processed = job["processed"]
+        
+        while processed < len(sidhi_ids):
+            chunk = sidhi_ids[processed:processed + BulkService.CHUNK_SIZE]
+            checkpoint = processed + len(chunk)
+            
+            try:
+                async with await db.client.start_session() as session:
+                    async with session.start_transaction():
+                        success, modified, errors = await handler(
+                            db, job["admin_email"], chunk, job["parameters"], session
+                        )
+                        
+                        # Progress is committed atomically with the chunk's writes
+                        await db.admin_bulk_jobs.update_one(
+                            {"job_id": job["job_id"]},
+                            {
+                                "$set": {"processed": checkpoint, "updated_at": datetime.utcnow()},
+                                "$inc": {
+                                    "success_count": success,
+                                    "error_count": len(errors),
+                                    "modified_count": modified
+                                },
+                                "$push": {"errors": {
+                                    "$each": errors,
+                                    "$slice": BulkService.MAX_JOB_ERRORS
+                                }}
+                            },
+                            session=session
+                        )
+                        
+                        await session.commit_transaction()
+                        
+            except Exception as e:
+                # The failing chunk was rolled back; earlier chunks stay committed
+                failed = await db.admin_bulk_jobs.find_one_and_update(
+                    {"job_id": job["job_id"]},
+                    {"$set": {
+                        "status": BulkJobStatus.FAILED.value,
+                        "last_error": str(e),
+                        "updated_at": datetime.utcnow()
+                    }},
+                    return_document=ReturnDocument.AFTER
+                )
+                await BulkService._audit_job(db, failed)
+                raise HTTPException(
+                    status_code=500,
+                    detail=(
+                        f"Bulk {action_type.value} failed at {processed}/{len(sidhi_ids)} users "
+                        f"(chunk rolled back, job {job['job_id']} can be resumed): {str(e)}"
                     )
-                    
-                    await session.commit_transaction()
-                    
-                    return {
-                        "status": "success",
-                        "unbanned_count": unban_result.modified_count
-                    }
-                    
-                except Exception as e:
-                    await session.abort_transaction()
-                    raise HTTPException(status_code=500, detail=f"Bulk unban failed: {str(e)}")
+                )
+            
+            processed = checkpoint
+            
+            # Ban state is read through the cached auth profiles
+            if action_type in (BulkActionType.BAN_USERS, BulkActionType.UNBAN_USERS):
+                await invalidate_all_profiles()
+        
+        after_snapshot = None
+        if action_type == BulkActionType.UPGRADE_USERS:
+            after_snapshot = await db.quotas.find(
+                {"sidhi_id": {"$in": sidhi_ids[:10]}}
+            ).to_list(length=10)
+        
+        completed = await db.admin_bulk_jobs.find_one_and_update(
+            {"job_id": job["job_id"]},
+            {"$set": {
+                "status": BulkJobStatus.COMPLETED.value,
+                "after_snapshot": after_snapshot,
+                "last_error": None,
+                "updated_at": datetime.utcnow(),
+                "completed_at": datetime.utcnow()
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        # Log audit trail
+        await BulkService._audit_job(db, completed)
+        
+        return BulkService._job_result(completed)
+    
+    @staticmethod
+    def _job_result(job: Dict) -> Dict:
+        """Shape a finished job like the original per-action responses"""
+        action_type = BulkActionType(job["action"])
+        
+        if action_type == BulkActionType.BAN_USERS:
+            result = {
+                "status": "success",
+                "banned_count": job["modified_count"],
+                "total_requested": job["total"]
+            }
+        elif action_type == BulkActionType.UNBAN_USERS:
+            result = {
+                "status": "success",
+                "unbanned_count": job["modified_count"]
+            }
+        else:
+            result = {
+                "status": "completed",
+                "success_count": job["success_count"],
+                "error_count": job["error_count"],
+                "total_requested": job["success_count"] + job["error_count"],
+                "errors": job["errors"],
+                "warnings": []
+            }
+        
+        result["job_id"] = job["job_id"]
+        return result
+    
+    @staticmethod
+    async def _audit_job(db: AsyncIOMotorDatabase, job: Dict):
+        """One audit entry per job run (completed or failed)"""
+        await AuditService.log_bulk_action(
+            db=db,
+            admin_email=job["admin_email"],
+            action_type=BulkActionType(job["action"]),
+            target_ids=job["sidhi_ids"],
+            parameters=job["parameters"],
+            before_snapshot=job.get("before_snapshot"),
+            after_snapshot=job.get("after_snapshot"),
+            result={
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "processed": job["processed"],
+                "success_count": job["success_count"],
+                "error_count": job["error_count"],
+                "modified_count": job["modified_count"],
+                "last_error": job.get("last_error")
+            }
+        )
+    
+    @staticmethod
+    async def get_job_status(db: AsyncIOMotorDatabase, job_id: str) -> Dict:
+        """Progress of a bulk job (target list omitted)"""
+        job = await db.admin_bulk_jobs.find_one(
+            {"job_id": job_id},
+            {"_id": 0, "sidhi_ids": 0, "before_snapshot": 0, "after_snapshot": 0}
+        )
+        if not job:
+            raise HTTPException(status_code=404, detail="Bulk job not found")
+        
+        job["progress_percent"] = round(job["processed"] / job["total"] * 100, 1) if job["total"] else 100.0
+        return job
+    
+    @staticmethod
+    async def resume_job(db: AsyncIOMotorDatabase, job_id: str) -> Dict:
+        """
+        Continue a failed (or stalled) job from its last committed chunk
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=BulkService.STALE_JOB_SECONDS)
+        
+        # Atomic claim so two admins can't resume the same job concurrently
+        job = await db.admin_bulk_jobs.find_one_and_update(
+            {
+                "job_id": job_id,
+                "$or": [
+                    {"status": BulkJobStatus.FAILED.value},
+                    {"status": BulkJobStatus.RUNNING.value, "updated_at": {"$lt": stale_before}}
+                ]
+            },
+            {"$set": {
+                "status": BulkJobStatus.RUNNING.value,
+                "updated_at": datetime.utcnow()
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if not job:
+            existing = await db.admin_bulk_jobs.find_one({"job_id": job_id}, {"status": 1})
+            if not existing:
+                raise HTTPException(status_code=404, detail="Bulk job not found")
+            raise HTTPException(
+                status_code=409,
+                detail=f"Bulk job is {existing['status']} and cannot be resumed"
+            )
+        
+        return await BulkService._run_job(db, job)
+
+
+BulkService._CHUNK_HANDLERS = {
+    BulkActionType.UPGRADE_USERS: BulkService._upgrade_chunk,
+    BulkActionType.RESET_QUOTAS: BulkService._reset_chunk,
+    BulkActionType.BAN_USERS: BulkService._ban_chunk,
+    BulkActionType.UNBAN_USERS: BulkService._unban_chunk,
+}
+
+
+async def create_bulk_job_indexes(db: AsyncIOMotorDatabase):
+    await db.admin_bulk_jobs.create_index("job_id", unique=True)
+    await db.admin_bulk_jobs.create_index([("status", 1), ("updated_at", 1)])
 
 
 # ============================================================================
@@ -839,7 +1000,8 @@ _db = _client.lumetrics_db
 
 async def bulk_upgrade_users(
     sidhi_ids: List[str],
-    tier: str
+    tier: str,
+    admin_email: str = "system-admin"
 ) -> dict:
     """
     Wrapper for BulkService.bulk_upgrade_users
@@ -849,7 +1011,7 @@ async def bulk_upgrade_users(
 
     return await BulkService.bulk_upgrade_users(
         db=_db,
-        admin_email="system-admin",  # router already authenticated admin
+        admin_email=admin_email,  # router already authenticated admin
         sidhi_ids=sidhi_ids,
         tier=UserTier(tier),
         dry_run=False
@@ -858,13 +1020,14 @@ async def bulk_upgrade_users(
 
 async def bulk_reset_quotas(
     sidhi_ids: List[str],
-    reset_type: str
+    reset_type: str,
+    admin_email: str = "system-admin"
 ) -> dict:
     from app.admin.safe_bulk_operations import BulkService, QuotaResetType
 
     return await BulkService.bulk_reset_quotas(
         db=_db,
-        admin_email="system-admin",
+        admin_email=admin_email,
         sidhi_ids=sidhi_ids,
         reset_type=QuotaResetType(reset_type),
         dry_run=False
@@ -873,13 +1036,14 @@ async def bulk_reset_quotas(
 
 async def bulk_ban_users(
     sidhi_ids: List[str],
-    reason: str
+    reason: str,
+    admin_email: str = "system-admin"
 ) -> dict:
     from app.admin.safe_bulk_operations import BulkService
 
     return await BulkService.bulk_ban_users(
         db=_db,
-        admin_email="system-admin",
+        admin_email=admin_email,
         sidhi_ids=sidhi_ids,
         reason=reason,
         dry_run=False
@@ -887,18 +1051,31 @@ async def bulk_ban_users(
 
 
 async def bulk_unban_users(
-    sidhi_ids: List[str]
+    sidhi_ids: List[str],
+    admin_email: str = "system-admin"
 ) -> dict:
     from app.admin.safe_bulk_operations import BulkService
 
     return await BulkService.bulk_unban_users(
         db=_db,
-        admin_email="system-admin",
+        admin_email=admin_email,
         sidhi_ids=sidhi_ids,
         dry_run=False
     )
 
 
+async def get_bulk_job_status(job_id: str) -> dict:
+    from app.admin.safe_bulk_operations import BulkService
+
+    return await BulkService.get_job_status(_db, job_id)
+
+
+async def resume_bulk_job(job_id: str) -> dict:
+    from app.admin.safe_bulk_operations import BulkService
+
+    return await BulkService.resume_job(_db, job_id)
+
+
 # -------------------------------
 # CSV EXPORT WRAPPERS
 # -------------------------------
@@ -104,6 +104,7 @@ Mount in main.py:
     app.include_router(superadmin_router, prefix="/superadmin")
 """
 
+import asyncio
 import csv
 import io
 import uuid
@@ -118,6 +119,11 @@ from pydantic import BaseModel, validator
 import os
 
 from app.admin.hardened_firebase_auth import get_current_admin
+from app.system.cache import get_cache
+from app.system.notifications import create_notification, read_counts as notification_read_counts
+from app.courses.lab_progress import invalidate_lab_structure
+from app.courses.course_analytics import delete_course_analytics, record_unenrollment
+from app.system.identity import invalidate_profile, invalidate_profile_by_sidhi, profile_search_fields
 
 router = APIRouter(tags=["Superadmin"])
 
@@ -227,91 +233,124 @@ class ClassroomLock(BaseModel):
 # PLATFORM OVERVIEW  — one shot, everything that needs attention
 # ============================================================================
 
-@router.get("/overview")
-async def superadmin_overview(admin: dict = Depends(get_current_admin)):
-    """
-    Master dashboard. One call — all pending counts across every system.
-    Check each 'needs_action' number — anything > 0 requires attention.
-    """
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
-
-    # Enquiries
-    enq_pending   = await db.enquiries.count_documents({"status": "pending"})
-    enq_total     = await db.enquiries.count_documents({})
+OVERVIEW_TTL = 30  # seconds - the reported staleness bound for overview counts
+overview_cache = get_cache("superadmin_overview")
 
-    # Access requests (manual college claims)
-    req_pending   = await db.course_access_requests.count_documents({"status": "pending"})
-    req_total     = await db.course_access_requests.count_documents({})
 
-    # Support tickets
-    tix_pending   = await db.help_tickets.count_documents({"status": "pending"})
-    tix_total     = await db.help_tickets.count_documents({})
+async def _facet_counts(collection, facets: dict) -> dict:
+    """
+    Several filtered counts over one collection in a single $facet pass.
+    Only the fields the filters touch are projected into the facets.
+    """
+    fields = {field for match in facets.values() for field in match}
+    pipeline = [
+        {"$project": {"_id": 0, **{field: 1 for field in fields}}},
+        {"$facet": {
+            name: [{"$match": match}, {"$count": "n"}]
+            for name, match in facets.items()
+        }}
+    ]
+    rows = await collection.aggregate(pipeline).to_list(length=1)
+    row = rows[0] if rows else {}
+    return {name: (row.get(name) or [{"n": 0}])[0]["n"] for name in facets}
 
-    # Courses
-    courses_draft     = await db.courses.count_documents({"status": "DRAFT"})
-    courses_published = await db.courses.count_documents({"status": "PUBLISHED"})
-    courses_total     = await db.courses.count_documents({})
-    labs_total        = await db.courses.count_documents({"course_type": "LAB"})
 
-    # Classrooms & teachers
-    classrooms_total  = await db.classrooms.count_documents({})
-    teachers_total    = await db.users_profile.count_documents({"role": "teacher"})
+async def _overview_counts() -> dict:
+    """
+    Every overview counter, fetched concurrently.
+    Unfiltered totals come from collection metadata (estimated_document_count);
+    status / time-window counts come from one $facet pipeline per collection.
+    """
+    week_ago = datetime.utcnow() - timedelta(days=7)
+
+    (
+        enq_total, req_total, tix_total, courses_total, classrooms_total,
+        users_total, enrollments_total, payments_total,
+        enquiries, access_requests, tickets, courses, users, plagiarism, payments,
+        recent_submissions,
+    ) = await asyncio.gather(
+        db.enquiries.estimated_document_count(),
+        db.course_access_requests.estimated_document_count(),
+        db.help_tickets.estimated_document_count(),
+        db.courses.estimated_document_count(),
+        db.classrooms.estimated_document_count(),
+        db.users_profile.estimated_document_count(),
+        db.course_enrollments.estimated_document_count(),
+        db.payments.estimated_document_count(),
+        db.enquiries.count_documents({"status": "pending"}),
+        db.course_access_requests.count_documents({"status": "pending"}),
+        db.help_tickets.count_documents({"status": "pending"}),
+        _facet_counts(db.courses, {
+            "draft":     {"status": "DRAFT"},
+            "published": {"status": "PUBLISHED"},
+            "labs":      {"course_type": "LAB"},
+        }),
+        _facet_counts(db.users_profile, {
+            "teachers":  {"role": "teacher"},
+            "students":  {"role": "student"},
+            "banned":    {"is_banned": True},
+            "new_week":  {"created_at": {"$gte": week_ago}},
+        }),
+        _facet_counts(db.plagiarism_results, {
+            "red":    {"flag": "red", "reviewed_by_teacher": False},
+            "yellow": {"flag": "yellow", "reviewed_by_teacher": False},
+        }),
+        _facet_counts(db.payments, {
+            "pending":       {"status": "created"},
+            "captured_week": {"status": "captured", "created_at": {"$gte": week_ago}},
+        }),
+        db.course_submissions.count_documents({"submitted_at": {"$gte": week_ago}}),
+    )
 
-    # Students & enrollments
-    students_total    = await db.users_profile.count_documents({"role": "student"})
-    enrollments_total = await db.course_enrollments.count_documents({})
+    return {
+        "computed_at": datetime.utcnow().isoformat(),
+        "enquiries":       {"pending": enquiries, "total": enq_total},
+        "access_requests": {"pending": access_requests, "total": req_total},
+        "tickets":         {"pending": tickets, "total": tix_total},
+        "courses":      {"draft": courses["draft"], "published": courses["published"], "total": courses_total, "labs": courses["labs"]},
+        "classrooms":   {"total": classrooms_total},
+        "teachers":     {"total": users["teachers"]},
+        "students":     {"total": users["students"], "enrollments": enrollments_total},
+        "plagiarism":   {"red_unreviewed": plagiarism["red"], "yellow_unreviewed": plagiarism["yellow"]},
+        "submissions":  {"last_7_days": recent_submissions},
+        "users":        {"total": users_total, "banned": users["banned"], "new_last_7_days": users["new_week"]},
+        "payments":     {"total": payments_total, "pending": payments["pending"], "captured_last_7_days": payments["captured_week"]},
+    }
 
-    # Plagiarism
-    plag_red    = await db.plagiarism_results.count_documents({"flag": "red", "reviewed_by_teacher": False})
-    plag_yellow = await db.plagiarism_results.count_documents({"flag": "yellow", "reviewed_by_teacher": False})
 
-    # Submissions (last 7 days)
-    recent_submissions = await db.course_submissions.count_documents(
-        {"submitted_at": {"$gte": week_ago}}
-    )
+@router.get("/overview")
+async def superadmin_overview(admin: dict = Depends(get_current_admin)):
+    """
+    Master dashboard. One call — all pending counts across every system.
+    Check each 'needs_action' number — anything > 0 requires attention.
+    Counts are at most OVERVIEW_TTL seconds old (see 'staleness').
+    """
+    now = datetime.utcnow()
 
-    # Users (platform accounts)
-    users_total    = await db.users_profile.count_documents({})
-    users_banned   = await db.users_profile.count_documents({"is_banned": True})
-    new_users_week = await db.users_profile.count_documents(
-        {"created_at": {"$gte": week_ago}}
+    counts, recent_enq, recent_req = await asyncio.gather(
+        overview_cache.get_or_set("counts", _overview_counts, OVERVIEW_TTL),
+        # 5 most recent pending previews - always live
+        db.enquiries.find({"status": "pending"}).sort("submitted_at", -1).to_list(5),
+        db.course_access_requests.find({"status": "pending"}).sort("submitted_at", -1).to_list(5),
     )
 
-    # Payments
-    payments_total   = await db.payments.count_documents({})
-    payments_pending = await db.payments.count_documents({"status": "created"})
-    payments_captured_week = await db.payments.count_documents({
-        "status": "captured",
-        "created_at": {"$gte": week_ago}
-    })
-
-    # 5 most recent pending enquiries preview
-    recent_enq = await db.enquiries.find({"status": "pending"}).sort("submitted_at", -1).to_list(5)
-    recent_req = await db.course_access_requests.find({"status": "pending"}).sort("submitted_at", -1).to_list(5)
-
     return {
         "generated_at": now.isoformat(),
         "admin": admin.get("email"),
+        "staleness": {
+            "counts_computed_at": counts["computed_at"],
+            "max_staleness_seconds": OVERVIEW_TTL,
+            "totals_are_estimated": True,
+        },
         "needs_action": {
-            "enquiries_pending":       enq_pending,
-            "access_requests_pending": req_pending,
-            "support_tickets_pending": tix_pending,
-            "plagiarism_red_unreviewed":    plag_red,
-            "plagiarism_yellow_unreviewed": plag_yellow,
-            "payments_pending":        payments_pending,
+            "enquiries_pending":       counts["enquiries"]["pending"],
+            "access_requests_pending": counts["access_requests"]["pending"],
+            "support_tickets_pending": counts["tickets"]["pending"],
+            "plagiarism_red_unreviewed":    counts["plagiarism"]["red_unreviewed"],
+            "plagiarism_yellow_unreviewed": counts["plagiarism"]["yellow_unreviewed"],
+            "payments_pending":        counts["payments"]["pending"],
         },
-        "enquiries":    {"pending": enq_pending, "total": enq_total},
-        "access_requests": {"pending": req_pending, "total": req_total},
-        "tickets":      {"pending": tix_pending, "total": tix_total},
-        "courses":      {"draft": courses_draft, "published": courses_published, "total": courses_total, "labs": labs_total},
-        "classrooms":   {"total": classrooms_total},
-        "teachers":     {"total": teachers_total},
-        "students":     {"total": students_total, "enrollments": enrollments_total},
-        "plagiarism":   {"red_unreviewed": plag_red, "yellow_unreviewed": plag_yellow},
-        "submissions":  {"last_7_days": recent_submissions},
-        "users":        {"total": users_total, "banned": users_banned, "new_last_7_days": new_users_week},
-        "payments":     {"total": payments_total, "pending": payments_pending, "captured_last_7_days": payments_captured_week},
+        **{k: v for k, v in counts.items() if k != "computed_at"},
         "previews": {
             "pending_enquiries":    _clean_many(recent_enq),
             "pending_access_requests": _clean_many(recent_req),
@@ -674,6 +713,8 @@ async def admin_delete_course(course_id: str, admin: dict = Depends(get_current_
     await db.modules.delete_many({"course_id": course_id})
     await db.course_claim_access.delete_many({"course_id": course_id})
     await db.course_access_requests.delete_many({"course_id": course_id})
+    await invalidate_lab_structure(course_id)
+    await delete_course_analytics(db, course_id)
 
     return {"success": True, "course_id": course_id, "message": "Course and all associated data deleted"}
 
@@ -907,6 +948,7 @@ async def ban_teacher(user_id: str, body: BanRequest, admin: dict = Depends(get_
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Teacher not found")
+    await invalidate_profile(user_id)
     return {"success": True, "user_id": user_id, "action": "banned"}
 
 
@@ -918,6 +960,7 @@ async def unban_teacher(user_id: str, admin: dict = Depends(get_current_admin)):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Teacher not found")
+    await invalidate_profile(user_id)
     return {"success": True, "user_id": user_id, "action": "unbanned"}
 
 
@@ -989,6 +1032,7 @@ async def ban_student(user_id: str, body: BanRequest, admin: dict = Depends(get_
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
+    await invalidate_profile(user_id)
     return {"success": True, "user_id": user_id, "action": "banned"}
 
 
@@ -1000,6 +1044,7 @@ async def unban_student(user_id: str, admin: dict = Depends(get_current_admin)):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
+    await invalidate_profile(user_id)
     return {"success": True, "user_id": user_id, "action": "unbanned"}
 
 
@@ -1043,6 +1088,8 @@ async def admin_force_unenroll(enrollment_id: str, admin: dict = Depends(get_cur
         {"course_id": enr["course_id"]},
         {"$inc": {"stats.enrollments": -1}}
     )
+    if enr.get("is_active", True):
+        await record_unenrollment(db, enr["course_id"], enr.get("current_league"))
     return {"success": True, "enrollment_id": enrollment_id, "message": "Student unenrolled"}
 
 
@@ -1301,9 +1348,13 @@ async def update_platform_user(
     if not fields:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = await db.users_profile.update_one({"sidhi_id": sidhi_id}, {"$set": fields})
+    result = await db.users_profile.update_one(
+        {"sidhi_id": sidhi_id},
+        {"$set": {**fields, **profile_search_fields(fields)}}
+    )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_profile_by_sidhi(db, sidhi_id)
     return {"success": True, "updated_fields": list(fields.keys())}
 
 
@@ -1315,6 +1366,7 @@ async def ban_platform_user(sidhi_id: str, body: BanRequest, admin: dict = Depen
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_profile_by_sidhi(db, sidhi_id)
     return {"success": True, "sidhi_id": sidhi_id, "action": "banned"}
 
 
@@ -1326,12 +1378,14 @@ async def unban_platform_user(sidhi_id: str, admin: dict = Depends(get_current_a
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_profile_by_sidhi(db, sidhi_id)
     return {"success": True, "sidhi_id": sidhi_id, "action": "unbanned"}
 
 
 @router.delete("/users/{sidhi_id}")
 async def delete_platform_user(sidhi_id: str, admin: dict = Depends(get_current_admin)):
     """DANGER: Hard delete user from all platform collections."""
+    await invalidate_profile_by_sidhi(db, sidhi_id)
     await db.users_profile.delete_one({"sidhi_id": sidhi_id})
     await db.users.delete_one({"sid_id": sidhi_id})
     await db.quotas.delete_one({"sidhi_id": sidhi_id})
@@ -1397,19 +1451,16 @@ async def send_notification(body: NotificationRequest, admin: dict = Depends(get
     if body.target_type == "specific" and not body.target_users:
         raise HTTPException(status_code=400, detail="target_users required for specific notifications")
 
-    expires_at = datetime.utcnow() + timedelta(hours=body.expires_hours) if body.expires_hours else None
-
-    doc = {
-        "title": body.title, "message": body.message,
-        "type": body.type, "priority": body.priority,
-        "target_type": body.target_type, "target_users": body.target_users or [],
-        "expires_at": expires_at, "created_at": datetime.utcnow(),
-        "created_by": admin.get("email"), "read_by": []
-    }
-    result = await db.notifications.insert_one(doc)
+    notification_id = await create_notification(
+        db,
+        title=body.title, message=body.message,
+        type=body.type, priority=body.priority,
+        target_type=body.target_type, target_users=body.target_users,
+        created_by=admin.get("email"), expires_hours=body.expires_hours
+    )
     return {
         "success": True,
-        "notification_id": str(result.inserted_id),
+        "notification_id": notification_id,
         "target_count": len(body.target_users) if body.target_type == "specific" else "all"
     }
 
@@ -1422,9 +1473,12 @@ async def notification_history(
 ):
     notifs = await db.notifications.find({}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     total  = await db.notifications.count_documents({})
+    counts = await notification_read_counts(db, notifs)
     for n in notifs:
         n["_id"] = str(n["_id"])
-        n["read_count"] = len(n.get("read_by", []))
+        n["read_count"] = counts[n["_id"]]
+        n.pop("read_by", None)
+        n.pop("audience", None)
     return {"notifications": notifs, "count": len(notifs), "total": total}
 
 
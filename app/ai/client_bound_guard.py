@@ -1,12 +1,11 @@
 # app/middleware/client_bound_guard.py
 
 import time
-import hashlib
 from fastapi import Header, HTTPException, Request, Depends
-from nacl.signing import VerifyKey
 from nacl.exceptions import BadSignatureError
 
 from app.ai.auth_utils import verify_lum_token
+from app.system.identity import load_client_key
 
 
 def verify_client_bound_request(
@@ -27,17 +26,14 @@ def verify_client_bound_request(
     if abs(now - ts) > 60:
         raise HTTPException(status_code=401, detail="Stale request")
 
-    # 2️⃣ Decode public key
+    # 2️⃣ Decode public key and derive client_id SERVER-SIDE (CRITICAL)
+    #    Both are memoized per public key (bounded LRU)
     try:
-        public_key_bytes = bytes.fromhex(x_client_public_key)
-        verify_key = VerifyKey(public_key_bytes)
+        verify_key, derived_client_id = load_client_key(x_client_public_key)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid client public key")
 
-    # 3️⃣ Derive client_id SERVER-SIDE (CRITICAL)
-    derived_client_id = hashlib.sha256(public_key_bytes).hexdigest()
-
-    # 4️⃣ Enforce client binding (JWT cid)
+    # 3️⃣ Enforce client binding (JWT cid)
     token_client_id = token_payload.get("cid")
     if not token_client_id:
         raise HTTPException(status_code=401, detail="Token not client-bound")
@@ -45,7 +41,7 @@ def verify_client_bound_request(
     if token_client_id != derived_client_id:
         raise HTTPException(status_code=401, detail="Client mismatch")
 
-    # 5️⃣ Verify signature: <timestamp>:<request_path>
+    # 4️⃣ Verify signature: <timestamp>:<request_path>
     message = f"{x_client_timestamp}:{request.url.path}".encode()
 
     try:
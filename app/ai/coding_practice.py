@@ -5,6 +5,7 @@ from pydantic import BaseModel, validator
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.ai.client_bound_guard import verify_client_bound_request
+from app.system.rate_limit import rate_limit
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import uuid
@@ -189,7 +190,7 @@ async def get_question_detail(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/submit")
+@router.post("/submit", dependencies=[Depends(rate_limit("judge:practice_submit", 10, 60, identity=verify_client_bound_request))])
 async def submit_code(
     submission: SubmissionRequest,
     user: dict = Depends(verify_client_bound_request)
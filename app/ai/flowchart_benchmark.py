@@ -0,0 +1,68 @@
+"""
+Flowchart rendering benchmark
+
+    python -m app.ai.flowchart_benchmark [--count 200] [--threads 4]
+
+Reports flowcharts/sec for each backend/format pair:
+    pipe  - one-off Digraph.pipe() (a `dot` fork per render)
+    pool  - warm `dot` workers (FLOWCHART_DOT_WORKERS)
+and for png vs svg (svg skips rasterization).
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.ai.flowchart_engine_v1 import DOT_POOL, FlowRendererPerfect
+
+SAMPLE_FLOW = {
+    "name": "Benchmark flow",
+    "steps": [
+        {"type": "start"},
+        {"type": "input", "text": "Read n", "var": "n"},
+        {"type": "process", "text": "sum = 0, i = 1"},
+        {"type": "loop", "cond": "i <= n", "body": [
+            {"type": "decision", "cond": "i % 2 == 0",
+             "yes": [{"type": "process", "text": "sum = sum + i"}],
+             "no": [{"type": "process", "text": "skip odd i"}]},
+            {"type": "process", "text": "i = i + 1"}
+        ]},
+        {"type": "output", "text": "Print sum"},
+        {"type": "end"}
+    ]
+}
+
+
+def _run(backend: str, fmt: str, count: int, threads: int) -> float:
+    graph = FlowRendererPerfect(SAMPLE_FLOW, outdir=".").build_graph(fmt)
+
+    if backend == "pipe":
+        render = lambda _: graph.pipe(format=fmt)
+    else:
+        render = lambda _: DOT_POOL.render(graph, fmt)
+        render(None)  # Warm the pool outside the timed section
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for image in executor.map(render, range(count)):
+            assert image, "empty render"
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.count} renders, {args.threads} threads, pool size {DOT_POOL.size}")
+    for backend in ("pipe", "pool"):
+        for fmt in ("png", "svg"):
+            rate = _run(backend, fmt, args.count, args.threads)
+            print(f"  {backend:<5} {fmt:<4} {rate:8.1f} flowcharts/sec")
+
+    DOT_POOL.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,9 @@ Final production-ready hybrid ISO flowchart generator.
 - NO argparse
 - NO __main__ section
 - Fully import-safe for FastAPI servers
-- Exposes one clean API function:
+- Exposes clean API functions:
       generate_flowchart_from_json_and_save(flow_json, out_path)
+      render_flowchart_bytes(flow_json, fmt)   # "png" | "svg", in memory
 
 Features:
  - Smart auto-mode (A <= 8 steps else B)
@@ -15,10 +16,19 @@ Features:
  - Clean ISO shapes
  - Zero empty boxes (invisible join points)
  - Balanced, non-linear layout
+ - Renders through a pool of warm `dot` processes over stdin/stdout
+   (FLOWCHART_DOT_WORKERS, 0 = one-off Digraph.pipe()); no temp files
 """
 
+import atexit
 import json
+import os
+import queue
+import select
+import subprocess
 import textwrap
+import threading
+import time
 from pathlib import Path
 from graphviz import Digraph
 
@@ -234,6 +244,156 @@ class FlowBuilder:
                 self.add_edge(e, stop)
 
 
+# ---------------- Rendering backend ----------------
+
+class DotProcess:
+    """
+    One long-lived `dot -T<fmt>` process. Graphs are written to its stdin and
+    each rendered image is read back from stdout up to the format's trailer,
+    so no fork, DOT file or output file per flowchart. stderr is read
+    alongside, so a graph dot rejects, or a dot that died, fails the render
+    at once instead of after the full timeout.
+    """
+
+    TRAILERS = {
+        "png": b"IEND\xaeB`\x82",
+        "svg": b"</svg>",
+    }
+    POLL_SLICE = 0.25  # How often a silent wait re-checks that dot is alive
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.trailer = self.TRAILERS[fmt]
+        self.renders = 0
+        self.proc = subprocess.Popen(
+            ["dot", f"-T{fmt}"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+
+    def _exited(self) -> RuntimeError:
+        return RuntimeError(f"dot worker exited with code {self.proc.poll()}")
+
+    def render(self, source: str, timeout: float) -> bytes:
+        if self.proc.poll() is not None:
+            raise self._exited()
+        self.proc.stdin.write(source.encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+
+        out_fd = self.proc.stdout.fileno()
+        err_fd = self.proc.stderr.fileno()
+        deadline = time.monotonic() + timeout
+        out = bytearray()
+        errors = bytearray()
+        while not out.rstrip().endswith(self.trailer):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("dot worker timed out")
+            ready = select.select([out_fd, err_fd], [], [], min(remaining, self.POLL_SLICE))[0]
+            if not ready:
+                if self.proc.poll() is not None:
+                    raise self._exited()
+                continue
+
+            if err_fd in ready:
+                # Warnings (e.g. ortho edge labels) are drained and ignored
+                chunk = os.read(err_fd, 65536)
+                if not chunk:
+                    raise self._exited()
+                errors += chunk
+                if b"Error" in errors:
+                    detail = errors.decode("utf-8", "replace").strip()[:300]
+                    raise RuntimeError(f"dot rejected the graph: {detail}")
+            if out_fd in ready:
+                chunk = os.read(out_fd, 65536)
+                if not chunk:
+                    raise self._exited()
+                out += chunk
+
+        self.renders += 1
+        return bytes(out.rstrip() if self.fmt == "svg" else out)
+
+    def close(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=1)
+        except Exception:
+            pass
+
+
+class DotWorkerPool:
+    """
+    Warm `dot` processes per output format, spawned lazily. A worker that
+    errors or times out is discarded and the render falls back to a one-off
+    Digraph.pipe(), so a bad worker never fails a request.
+    """
+
+    PROBE_TIMEOUT = 3.0
+
+    def __init__(self, size: int, timeout: float, max_renders: int):
+        self.size = size
+        self.timeout = timeout
+        self.max_renders = max_renders  # Recycle workers to bound memory growth
+        self._idle = {fmt: queue.LifoQueue() for fmt in DotProcess.TRAILERS}
+        self._slots = {fmt: threading.BoundedSemaphore(size) for fmt in DotProcess.TRAILERS}
+        self._disabled = set()
+
+    def _spawn(self, fmt: str):
+        """New worker, probed with an empty graph; None disables the pool for fmt"""
+        worker = None
+        try:
+            worker = DotProcess(fmt)
+            worker.render("digraph probe {}", self.PROBE_TIMEOUT)
+            return worker
+        except Exception as e:
+            # e.g. dot missing, or a build that buffers stdout until exit
+            print(f"dot worker pool disabled for {fmt}, using pipe():", e)
+            self._disabled.add(fmt)
+            if worker:
+                worker.close()
+            return None
+
+    def render(self, graph: Digraph, fmt: str) -> bytes:
+        if fmt not in DotProcess.TRAILERS or self.size <= 0 or fmt in self._disabled:
+            return graph.pipe(format=fmt)
+
+        with self._slots[fmt]:
+            try:
+                worker = self._idle[fmt].get_nowait()
+            except queue.Empty:
+                worker = self._spawn(fmt)
+                if worker is None:
+                    return graph.pipe(format=fmt)
+
+            try:
+                data = worker.render(graph.source, self.timeout)
+            except Exception as e:
+                print("dot worker failed, falling back to pipe():", e)
+                worker.close()
+                return graph.pipe(format=fmt)
+
+            if worker.renders >= self.max_renders:
+                worker.close()
+            else:
+                self._idle[fmt].put(worker)
+            return data
+
+    def close(self):
+        for idle in self._idle.values():
+            while not idle.empty():
+                idle.get_nowait().close()
+
+
+DOT_POOL = DotWorkerPool(
+    size=int(os.getenv("FLOWCHART_DOT_WORKERS", "4")),  # 0 = always pipe()
+    timeout=float(os.getenv("FLOWCHART_DOT_TIMEOUT", "20")),
+    max_renders=int(os.getenv("FLOWCHART_DOT_MAX_RENDERS", "500"))
+)
+atexit.register(DOT_POOL.close)
+
+
 # ---------------- Renderer ----------------
 
 class FlowRendererPerfect:
@@ -243,7 +403,11 @@ class FlowRendererPerfect:
         self.mode = mode
         self.formats = formats
 
-    def render(self):
+    @property
+    def name(self):
+        return (self.flow.get("name") or "flow").replace(" ", "_")[:80]
+
+    def build_graph(self, fmt="png") -> Digraph:
         cnt = count_meaningful_steps(self.flow)
         mode = self.mode or ("A" if cnt <= 8 else "B")
 
@@ -266,70 +430,75 @@ class FlowRendererPerfect:
             arrow_size = "0.95"
             diamond_hw = {"width": "1.8", "height": "1.1"}
 
-        name = (self.flow.get("name") or "flow").replace(" ", "_")[:80]
-
-        for fmt in self.formats:
-            dot = Digraph(name, format=fmt)
-            dot.attr(rankdir="TB", splines="ortho", nodesep=nodesep, ranksep=ranksep)
-
-            # render nodes
-            for nid, (label, shape, attrs) in fb.nodes.items():
-                attrs = dict(attrs or {})
-
-                # invisible
-                if attrs.get("style") == "invis":
-                    dot.node(nid, "", shape="point", style="invis", width="0", height="0")
-                    continue
-
-                # shape mapping
-                if shape == "oval":
-                    node_shape = "ellipse"
-                elif shape == "diamond":
-                    node_shape = "diamond"
-                    attrs.setdefault("fixedsize", "true")
-                    attrs.setdefault("width", diamond_hw["width"])
-                    attrs.setdefault("height", diamond_hw["height"])
-                elif shape == "parallelogram":
-                    node_shape = "parallelogram"
-                    attrs.setdefault("skew", "0.25" if mode == "B" else "0.15")
-                else:
-                    node_shape = "rectangle"
+        dot = Digraph(self.name, format=fmt)
+        dot.attr(rankdir="TB", splines="ortho", nodesep=nodesep, ranksep=ranksep)
 
-                node_attrs = {
-                    "shape": node_shape,
-                    "style": "filled",
-                    "fillcolor": "white",
-                    "color": "black",
-                    "penwidth": "1.3",
-                    "fontname": "Helvetica",
-                    "fontsize": fontsize,
-                    "margin": "0.08",
-                }
-                node_attrs.update(attrs)
+        # render nodes
+        for nid, (label, shape, attrs) in fb.nodes.items():
+            attrs = dict(attrs or {})
 
-                lab = label if isinstance(label, str) else str(label)
-                dot.node(nid, lab, **node_attrs)
-
-            # render edges
-            for a, b, lbl, opts in fb.edges:
-                attrs = {
-                    "arrowhead": "normal",
-                    "arrowsize": arrow_size,
-                    "fontname": "Helvetica-Bold",
-                    "fontsize": fontsize,
-                }
-
-                for k, v in opts.items():
-                    attrs[k] = v
-
-                if lbl:
-                    attrs["label"] = lbl
-                    attrs["labeldistance"] = label_distance
+            # invisible
+            if attrs.get("style") == "invis":
+                dot.node(nid, "", shape="point", style="invis", width="0", height="0")
+                continue
 
-                dot.edge(a, b, **attrs)
+            # shape mapping
+            if shape == "oval":
+                node_shape = "ellipse"
+            elif shape == "diamond":
+                node_shape = "diamond"
+                attrs.setdefault("fixedsize", "true")
+                attrs.setdefault("width", diamond_hw["width"])
+                attrs.setdefault("height", diamond_hw["height"])
+            elif shape == "parallelogram":
+                node_shape = "parallelogram"
+                attrs.setdefault("skew", "0.25" if mode == "B" else "0.15")
+            else:
+                node_shape = "rectangle"
+
+            node_attrs = {
+                "shape": node_shape,
+                "style": "filled",
+                "fillcolor": "white",
+                "color": "black",
+                "penwidth": "1.3",
+                "fontname": "Helvetica",
+                "fontsize": fontsize,
+                "margin": "0.08",
+            }
+            node_attrs.update(attrs)
+
+            lab = label if isinstance(label, str) else str(label)
+            dot.node(nid, lab, **node_attrs)
+
+        # render edges
+        for a, b, lbl, opts in fb.edges:
+            attrs = {
+                "arrowhead": "normal",
+                "arrowsize": arrow_size,
+                "fontname": "Helvetica-Bold",
+                "fontsize": fontsize,
+            }
+
+            for k, v in opts.items():
+                attrs[k] = v
+
+            if lbl:
+                attrs["label"] = lbl
+                attrs["labeldistance"] = label_distance
+
+            dot.edge(a, b, **attrs)
+
+        return dot
+
+    def render_bytes(self, fmt="png") -> bytes:
+        """Rendered image in memory; svg skips rasterization entirely"""
+        return DOT_POOL.render(self.build_graph(fmt), fmt)
 
-            outpath = self.outdir / f"flow_{name}"
-            dot.render(str(outpath), cleanup=True)
+    def render(self):
+        for fmt in self.formats:
+            outpath = self.outdir / f"flow_{self.name}.{fmt}"
+            outpath.write_bytes(self.render_bytes(fmt))
 
 
 # ---------------- JSON Validation ----------------
@@ -349,39 +518,42 @@ def validate_json(doc):
 # PUBLIC SERVER API FUNCTION
 # ---------------------------------------------------------------------------
 
+def render_flowchart_bytes(flow_json: dict, fmt: str = "png") -> bytes:
+    """
+    Render the first flow to image bytes ("png" or "svg") without touching disk.
+    Raises on invalid JSON or render failure.
+    """
+    validate_json(flow_json)
+
+    renderer = FlowRendererPerfect(
+        flow_obj=flow_json["flows"][0],
+        outdir=Path("."),
+        mode=None,
+        formats=(fmt,)
+    )
+    return renderer.render_bytes(fmt)
+
+
 def generate_flowchart_from_json_and_save(flow_json: dict, out_path: Path) -> bool:
     """
     FastAPI server will call this.
 
     Args:
         flow_json: The JSON containing {"flows":[ {...} ]}
-        out_path:  Full path where qsX.png should be saved.
+        out_path:  Full path where qsX.png (or .svg) should be saved.
 
     Returns:
         True if saved successfully, else False.
     """
     try:
-        validate_json(flow_json)
-
-        flow_obj = flow_json["flows"][0]
-
-        renderer = FlowRendererPerfect(
-            flow_obj=flow_obj,
-            outdir=out_path.parent,
-            mode=None,
-            formats=("png",)
-        )
-
-        renderer.render()
+        fmt = "svg" if out_path.suffix.lower() == ".svg" else "png"
+        data = render_flowchart_bytes(flow_json, fmt)
 
-        name = (flow_obj.get("name") or "flow").replace(" ", "_")
-        generated = out_path.parent / f"flow_{name}.png"
+        if not data:
+            return False
 
-        if generated.exists():
-            generated.replace(out_path)
-            return True
-
-        return False
+        out_path.write_bytes(data)
+        return True
 
     except Exception as e:
         print("Flowchart engine error:", e)
@@ -28,58 +28,8 @@ from fastapi import APIRouter, HTTPException, Request, Depends, BackgroundTasks
 from pydantic import BaseModel
 from motor.motor_asyncio import AsyncIOMotorClient
 import razorpay
-from functools import wraps
-import time
-from collections import defaultdict
-
-# ==================== RATE LIMITING ====================
-
-class RateLimiter:
-    """Simple in-memory rate limiter"""
-    def __init__(self):
-        self.requests = defaultdict(list)
-    
-    def is_allowed(self, key: str, max_requests: int, window_seconds: int) -> bool:
-        """Check if request is allowed under rate limit"""
-        now = time.time()
-        window_start = now - window_seconds
-        
-        # Clean old requests
-        self.requests[key] = [req_time for req_time in self.requests[key] if req_time > window_start]
-        
-        # Check limit
-        if len(self.requests[key]) >= max_requests:
-            return False
-        
-        # Add current request
-        self.requests[key].append(now)
-        return True
-
-rate_limiter = RateLimiter()
-
-def rate_limit(max_requests: int = 10, window_seconds: int = 60):
-    """Rate limiting decorator"""
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            request = kwargs.get('request')
-            if request:
-                # Use IP + user_id as key
-                user = kwargs.get('user', {})
-                user_id = user.get('sub', 'anonymous')
-                client_ip = request.client.host
-                key = f"{client_ip}:{user_id}"
-                
-                if not rate_limiter.is_allowed(key, max_requests, window_seconds):
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Rate limit exceeded. Max {max_requests} requests per {window_seconds} seconds."
-                    )
-            
-            return await func(*args, **kwargs)
-        return wrapper
-    return decorator
-
+from app.ai.razorpay_gateway import RazorpayGateway, BadRequestError, GatewayError
+from app.system.rate_limit import rate_limit
 
 # ==================== ROUTER & CONFIG ====================
 
@@ -159,9 +109,17 @@ MONGO_URL = os.getenv("MONGO_URL")
 client = AsyncIOMotorClient(MONGO_URL)
 db = client.lumetrics_db
 
-# Razorpay Client
+# Razorpay Client (SDK kept for local webhook signature checks only)
 razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
 
+# Async API client for orders/payments (never blocks the event loop)
+razorpay_gateway = RazorpayGateway(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+
+
+async def close_payment_gateway():
+    """Shutdown hook: release pooled Razorpay connections"""
+    await razorpay_gateway.aclose()
+
 
 # ==================== STARTUP: CREATE INDEXES ====================
 
@@ -403,8 +361,7 @@ async def get_tier_pricing():
     }
 
 
-@router.get("/config/course/{course_id}/pricing")
-@rate_limit(max_requests=30, window_seconds=60)
+@router.get("/config/course/{course_id}/pricing", dependencies=[Depends(rate_limit("payment:get_course_pricing", 30, 60))])
 async def get_course_pricing(course_id: str, request: Request):
     """
     Get pricing for a specific course
@@ -458,8 +415,7 @@ async def get_course_pricing(course_id: str, request: Request):
 
 # ==================== TIER PURCHASE ENDPOINTS (AUTHENTICATED) ====================
 
-@router.post("/tier/initiate")
-@rate_limit(max_requests=5, window_seconds=60)
+@router.post("/tier/initiate", dependencies=[Depends(rate_limit("payment:initiate_tier_purchase", 5, 60, identity=verify_client_bound_request))])
 async def initiate_tier_purchase(
     data: TierPurchaseRequest,
     request: Request,
@@ -498,7 +454,15 @@ async def initiate_tier_purchase(
             }
         }
         
-        razorpay_order = razorpay_client.order.create(data=order_data)
+        try:
+            razorpay_order = await razorpay_gateway.create_order(order_data)
+        except BadRequestError as e:
+            raise HTTPException(status_code=400, detail=f"Order creation failed: {str(e)}")
+        except GatewayError:
+            raise HTTPException(
+                status_code=503,
+                detail="Payment gateway unavailable. Please try again."
+            )
         
         # Store order in MongoDB (IDEMPOTENCY PROTECTION)
         payment_doc = {
@@ -540,8 +504,7 @@ async def initiate_tier_purchase(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/tier/verify")
-@rate_limit(max_requests=10, window_seconds=60)
+@router.post("/tier/verify", dependencies=[Depends(rate_limit("payment:verify_tier_payment", 10, 60, identity=verify_client_bound_request))])
 async def verify_tier_payment(
     data: PaymentVerifyRequest,
     request: Request,
@@ -597,7 +560,7 @@ async def verify_tier_payment(
         
         # SECURITY CHECK 4: Fetch payment from Razorpay API
         try:
-            payment_details = razorpay_client.payment.fetch(data.razorpay_payment_id)
+            payment_details = await razorpay_gateway.fetch_payment(data.razorpay_payment_id)
             
             # Validate payment status
             if payment_details["status"] != "captured":
@@ -628,11 +591,16 @@ async def verify_tier_payment(
                     detail=f"Invalid currency: {payment_details.get('currency')}"
                 )
             
-        except razorpay.errors.BadRequestError as e:
+        except BadRequestError as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid payment ID: {str(e)}"
             )
+        except GatewayError:
+            raise HTTPException(
+                status_code=503,
+                detail="Payment gateway unavailable. Please retry verification."
+            )
         except HTTPException:
             raise
         except Exception as e:
@@ -684,8 +652,7 @@ async def verify_tier_payment(
 
 # ==================== COURSE PURCHASE ENDPOINTS (AUTHENTICATED) ====================
 
-@router.post("/course/initiate")
-@rate_limit(max_requests=5, window_seconds=60)
+@router.post("/course/initiate", dependencies=[Depends(rate_limit("payment:initiate_course_purchase", 5, 60, identity=verify_client_bound_request))])
 async def initiate_course_purchase(
     data: CoursePurchaseRequest,
     request: Request,
@@ -757,7 +724,15 @@ async def initiate_course_purchase(
             }
         }
         
-        razorpay_order = razorpay_client.order.create(data=order_data)
+        try:
+            razorpay_order = await razorpay_gateway.create_order(order_data)
+        except BadRequestError as e:
+            raise HTTPException(status_code=400, detail=f"Order creation failed: {str(e)}")
+        except GatewayError:
+            raise HTTPException(
+                status_code=503,
+                detail="Payment gateway unavailable. Please try again."
+            )
         
         # Store order in MongoDB (IDEMPOTENCY PROTECTION)
         purchase_doc = {
@@ -804,8 +779,7 @@ async def initiate_course_purchase(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/course/verify")
-@rate_limit(max_requests=10, window_seconds=60)
+@router.post("/course/verify", dependencies=[Depends(rate_limit("payment:verify_course_payment", 10, 60, identity=verify_client_bound_request))])
 async def verify_course_payment(
     data: PaymentVerifyRequest,
     request: Request,
@@ -861,7 +835,7 @@ async def verify_course_payment(
         
         # SECURITY CHECK 4: Fetch payment from Razorpay API
         try:
-            payment_details = razorpay_client.payment.fetch(data.razorpay_payment_id)
+            payment_details = await razorpay_gateway.fetch_payment(data.razorpay_payment_id)
             
             # Validate payment status
             if payment_details["status"] != "captured":
@@ -892,11 +866,16 @@ async def verify_course_payment(
                     detail=f"Invalid currency: {payment_details.get('currency')}"
                 )
             
-        except razorpay.errors.BadRequestError as e:
+        except BadRequestError as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid payment ID: {str(e)}"
             )
+        except GatewayError:
+            raise HTTPException(
+                status_code=503,
+                detail="Payment gateway unavailable. Please retry verification."
+            )
         except HTTPException:
             raise
         except Exception as e:
@@ -1134,8 +1113,7 @@ async def razorpay_webhook(request: Request, background_tasks: BackgroundTasks):
 
 # ==================== USER PURCHASE HISTORY ====================
 
-@router.get("/my-purchases")
-@rate_limit(max_requests=20, window_seconds=60)
+@router.get("/my-purchases", dependencies=[Depends(rate_limit("payment:get_user_purchases", 20, 60, identity=verify_client_bound_request))])
 async def get_user_purchases(
     request: Request,
     user: dict = Depends(verify_client_bound_request)
@@ -1197,8 +1175,7 @@ async def get_user_purchases(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/course/{course_id}/access-status")
-@rate_limit(max_requests=30, window_seconds=60)
+@router.get("/course/{course_id}/access-status", dependencies=[Depends(rate_limit("payment:check_course_access", 30, 60, identity=verify_client_bound_request))])
 async def check_course_access(
     course_id: str,
     request: Request,
@@ -1264,8 +1241,7 @@ async def check_course_access(
 
 # ==================== ADMIN: SET COURSE PRICING ====================
 
-@router.post("/admin/course/{course_id}/set-pricing")
-@rate_limit(max_requests=10, window_seconds=60)
+@router.post("/admin/course/{course_id}/set-pricing", dependencies=[Depends(rate_limit("payment:set_course_pricing", 10, 60, identity=verify_client_bound_request))])
 async def set_course_pricing(
     course_id: str,
     request: Request,
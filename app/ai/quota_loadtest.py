@@ -0,0 +1,160 @@
+"""
+Concurrency check for quota admission
+
+    python -m app.ai.quota_loadtest [--requests 1000] [--quota 100] [--processes 4]
+
+Needs a MongoDB at MONGO_URL. Works in a throwaway database
+(--database, default lumetrics_quota_loadtest) that is dropped afterwards.
+
+For a command counter (base.commands.* plus an addon) and a feature
+counter (base.*), each process - standing in for a uvicorn worker with its
+own client - fires its share of `--requests` concurrent admit_quota calls
+at one user whose limit is `--quota`. Then the limit is raised by `--quota`
+and the same load runs again in fresh processes, checking that a user who
+was refused is admitted again up to the new limit. Each round starts with
+an empty admission cache (new processes); within a round, calls after a
+process's first admission use its cached counter paths.
+
+Passes when, in every round, exactly as many calls were admitted across
+all processes as the remaining quota allows, the rest got 429 and the
+stored used counter equals the total admitted - no overspend, no lost
+increments.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.ai import quota_manager
+
+SIDHI_ID = "LOADTEST_USER"
+ADDON = 10  # Of the quota, this many come from the addon counter
+
+
+def _quota_document(quota: int) -> dict:
+    return {
+        "sidhi_id": SIDHI_ID,
+        "tier": "loadtest",
+        "base": {"commands": {"explain": quota - ADDON}, "inject": quota},
+        "used": {"commands": {"explain": 0}, "inject": 0},
+        "addons": {"explain": ADDON, "inject": 0},
+        "meta": {"created_at": datetime.utcnow(), "last_updated": datetime.utcnow(), "expires_at": None}
+    }
+
+
+def _worker(mongo_url: str, database: str, command: str, calls: int, start_at: float, results):
+    """One process: `calls` concurrent admissions, reported as (admitted, refused, errors)"""
+    async def run():
+        quota_manager.db = AsyncIOMotorClient(mongo_url)[database]
+        admitted = refused = errors = 0
+
+        async def one():
+            nonlocal admitted, refused, errors
+            try:
+                await quota_manager.admit_quota(SIDHI_ID, command)
+                admitted += 1
+            except HTTPException as e:
+                if e.status_code == 429:
+                    refused += 1
+                else:
+                    errors += 1
+
+        # Warm the connection pool, then start with the other processes
+        await quota_manager.db.quotas.find_one({"sidhi_id": SIDHI_ID}, {"_id": 1})
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        await asyncio.gather(*(one() for _ in range(calls)))
+        return admitted, refused, errors
+
+    results.put(asyncio.run(run()))
+
+
+def _round(mongo_url: str, database: str, command: str, requests: int, processes: int) -> tuple:
+    # spawn, not fork: the parent already holds a Mongo client
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    start_at = time.time() + 3.0
+    share = [requests // processes + (1 if i < requests % processes else 0) for i in range(processes)]
+    procs = [
+        context.Process(target=_worker, args=(mongo_url, database, command, n, start_at, results))
+        for n in share
+    ]
+    for proc in procs:
+        proc.start()
+    totals = [0, 0, 0]
+    for _ in procs:
+        for i, value in enumerate(results.get()):
+            totals[i] += value
+    for proc in procs:
+        proc.join()
+    return tuple(totals)
+
+
+async def _used(db, command: str) -> int:
+    doc = await db.quotas.find_one({"sidhi_id": SIDHI_ID})
+    used = doc["used"]
+    return used["commands"][command] if command in used["commands"] else used[command]
+
+
+async def _raise_limit(db, command: str, amount: int):
+    path = f"base.commands.{command}" if command == "explain" else f"base.{command}"
+    await db.quotas.update_one({"sidhi_id": SIDHI_ID}, {"$inc": {path: amount}})
+
+
+async def run(mongo_url: str, database: str, requests: int, quota: int, processes: int) -> bool:
+    db = AsyncIOMotorClient(mongo_url)[database]
+    ok = True
+
+    try:
+        await db.quotas.delete_many({})
+        await db.quotas.insert_one(_quota_document(quota))
+
+        print(f"{requests} admissions per round over {processes} processes, quota {quota}")
+        for command in ("explain", "inject"):
+            limit, consumed = quota, 0
+            for round_no in range(2):
+                admitted, refused, errors = await asyncio.to_thread(
+                    _round, mongo_url, database, command, requests, processes
+                )
+                used = await _used(db, command)
+
+                expected = min(limit - consumed, requests)
+                consumed += expected
+                passed = admitted == expected and used == consumed and errors == 0 \
+                    and refused == requests - expected
+                ok = ok and passed
+                print(f"  {command:8} round {round_no + 1}: admitted {admitted}, refused {refused}, "
+                      f"errors {errors}, stored used {used}/{limit}  "
+                      f"{'OK' if passed else 'FAIL'}")
+
+                await _raise_limit(db, command, quota)
+                limit += quota
+    finally:
+        await db.client.drop_database(database)
+
+    print("PASS" if ok else "FAIL: quota overspent or increments lost")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--quota", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="lumetrics_quota_loadtest")
+    args = parser.parse_args()
+    if args.quota <= ADDON:
+        parser.error(f"--quota must be larger than {ADDON}")
+    if not asyncio.run(run(args.mongo_url, args.database, args.requests, args.quota, max(1, args.processes))):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,61 +7,111 @@ client = AsyncIOMotorClient(MONGO_URL)
 db = client.lumetrics_db 
 from fastapi import HTTPException
 from datetime import datetime
+from pymongo import ReturnDocument
 
-from fastapi import HTTPException
-from datetime import datetime
-
-async def check_and_use_quota(sidhi_id: str, command: str) -> bool:
-    user = await db.quotas.find_one({"sidhi_id": sidhi_id})
+from app.system.cache import LocalCache
 
-    if not user:
-        raise HTTPException(status_code=404, detail="User quota profile not found")
+# Hot-path shape cache: (sidhi_id, command) -> counter paths in that user's
+# quota document. Limits and usage are never cached; they are compared
+# inside the conditional update, so a stale entry can only cost a retry.
+ADMISSION_CACHE_TTL = 30  # seconds
+_admission_cache = LocalCache(max_entries=20000)
 
-    base = user.get("base", {})
-    used = user.get("used", {})
-    addons = user.get("addons", {})
 
-    # ---------- detect command vs feature ----------
+def _quota_paths(quota: dict, command: str) -> dict:
+    """Locate the base/used/addon counters for a command or feature"""
+    base = quota.get("base", {})
     if command in base.get("commands", {}):
-        base_limit = base["commands"].get(command, 0)
-        used_count = used["commands"].get(command, 0)
-        addon_limit = addons.get(command, 0)
-        used_path = f"used.commands.{command}"
-    elif command in base:
-        base_limit = base.get(command, 0)
-        used_count = used.get(command, 0)
-        addon_limit = addons.get(command, 0)
-        used_path = f"used.{command}"
-    else:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid command/feature: {command}"
-        )
-
-    remaining = (base_limit + addon_limit) - used_count
-
-    if remaining <= 0:
-        raise HTTPException(
-            status_code=429,
-            detail=f"Quota exhausted for '{command}'"
-        )
-
-    # ---------- atomic update ----------
-    result = await db.quotas.update_one(
-        {"sidhi_id": sidhi_id},
-        {
-            "$inc": {used_path: 1},
-            "$set": {"meta.last_updated": datetime.utcnow()}
+        return {
+            "base": f"base.commands.{command}",
+            "used": f"used.commands.{command}",
+            "addon": f"addons.{command}"
         }
+    if command in base:
+        return {
+            "base": f"base.{command}",
+            "used": f"used.{command}",
+            "addon": f"addons.{command}"
+        }
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid command/feature: {command}"
     )
 
-    if result.modified_count == 0:
-        raise HTTPException(
-            status_code=500,
-            detail="Quota update failed"
-        )
 
-    return True
+async def _try_admit(sidhi_id: str, paths: dict):
+    """
+    Expiry check, limit check and increment in one conditional update.
+    Returns the updated document, or None if any condition failed.
+    """
+    now = datetime.utcnow()
+    return await db.quotas.find_one_and_update(
+        {
+            "sidhi_id": sidhi_id,
+            "$and": [
+                {"$or": [
+                    {"meta.expires_at": None},
+                    {"meta.expires_at": {"$gt": now}}
+                ]},
+                {"$expr": {"$lt": [
+                    {"$ifNull": [f"${paths['used']}", 0]},
+                    {"$add": [
+                        {"$ifNull": [f"${paths['base']}", 0]},
+                        {"$ifNull": [f"${paths['addon']}", 0]}
+                    ]}
+                ]}}
+            ]
+        },
+        {
+            "$inc": {paths["used"]: 1},
+            "$set": {"meta.last_updated": now}
+        },
+        projection={"_id": 0, "tier": 1, "meta.expires_at": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def admit_quota(sidhi_id: str, command: str) -> dict:
+    """
+    Admit one use of `command` for the user, or raise.
+    
+    Hot path: one find_one_and_update. On refusal the document is read once
+    to explain why; an expired paid tier is downgraded to free and the
+    admission retried, mirroring the old expiry handling.
+    """
+    cache_key = f"{sidhi_id}:{command}"
+    paths = _admission_cache.get(cache_key)
+    
+    if paths:
+        admitted = await _try_admit(sidhi_id, paths)
+        if admitted:
+            return admitted
+        _admission_cache.delete(cache_key)
+    
+    # Cold path / refusal: read the document to learn its shape or the reason
+    for _ in range(2):
+        quota = await db.quotas.find_one({"sidhi_id": sidhi_id})
+        if not quota:
+            raise HTTPException(status_code=404, detail="User quota profile not found")
+        
+        expires_at = quota.get("meta", {}).get("expires_at")
+        if expires_at and datetime.utcnow() > expires_at:
+            # Auto-downgrade to free tier, then retry against the new document
+            from app.ai.payment_router import activate_tier_idempotent
+            await activate_tier_idempotent(sidhi_id, "free")
+            continue
+        
+        paths = _quota_paths(quota, command)
+        admitted = await _try_admit(sidhi_id, paths)
+        if admitted:
+            _admission_cache.set(cache_key, paths, ADMISSION_CACHE_TTL)
+            return admitted
+        break
+    
+    raise HTTPException(
+        status_code=429,
+        detail=f"Quota exhausted for '{command}'"
+    )
 
 
 
@@ -78,7 +128,7 @@ async def log_activity(sidhi_id: str, command: str, success: bool):
     
     await db.history.update_one(
         {"sidhi_id": sidhi_id},
-        {"$push": {f"logs.{today}": log_entry}},
+        {"$push": {f"logs.{today}": log_entry}, "$addToSet": {"log_days": today}},
         upsert=True
     )
 
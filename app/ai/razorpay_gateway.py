@@ -0,0 +1,162 @@
+"""
+Async Razorpay client
+
+The official SDK is synchronous (requests), so calling it from a handler
+blocks the event loop for a full round-trip. This talks to the REST API
+directly over one pooled httpx.AsyncClient per process.
+
+Retries:
+    fetch_payment - GET, safe to repeat on timeouts, 429 and 5xx
+    create_order  - POST, not safe to blindly repeat. The order's receipt
+                    is its idempotency key: before retrying, the order is
+                    looked up by receipt, so a create that reached Razorpay
+                    but whose response was lost is never duplicated.
+
+    RAZORPAY_API_URL          default https://api.razorpay.com/v1
+                              (point at `python -m app.ai.razorpay_standin`)
+    RAZORPAY_TIMEOUT          seconds per attempt (10)
+    RAZORPAY_MAX_RETRIES      extra attempts after the first (2)
+    RAZORPAY_MAX_CONNECTIONS  pool size (100)
+"""
+
+import asyncio
+import os
+import random
+from typing import Dict, Optional
+
+import httpx
+
+RAZORPAY_API_URL = os.getenv("RAZORPAY_API_URL", "https://api.razorpay.com/v1")
+REQUEST_TIMEOUT = float(os.getenv("RAZORPAY_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("RAZORPAY_MAX_RETRIES", "2"))
+MAX_CONNECTIONS = int(os.getenv("RAZORPAY_MAX_CONNECTIONS", "100"))
+BACKOFF_BASE = 0.2  # seconds, doubled per retry
+
+
+class GatewayError(Exception):
+    """Razorpay unreachable or answered with an error"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BadRequestError(GatewayError):
+    """4xx from Razorpay (bad id, invalid amount, ...); never retried"""
+
+
+class _Retryable(Exception):
+    pass
+
+
+class RazorpayGateway:
+    def __init__(
+        self,
+        key_id: str,
+        key_secret: str,
+        base_url: str = RAZORPAY_API_URL,
+        timeout: float = REQUEST_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        max_connections: int = MAX_CONNECTIONS
+    ):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+        self.stats = {"requests": 0, "retries": 0, "recovered_orders": 0, "failures": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.key_id or "", self.key_secret or ""),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 3.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+
+    async def _send(self, method: str, path: str, **kwargs) -> Dict:
+        """One attempt; _Retryable for transient failures"""
+        self.stats["requests"] += 1
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            raise _Retryable(f"{method} {path}: {type(e).__name__}") from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise _Retryable(f"{method} {path}: HTTP {response.status_code}")
+        if response.status_code >= 400:
+            try:
+                description = response.json().get("error", {}).get("description")
+            except ValueError:
+                description = None
+            raise BadRequestError(description or f"HTTP {response.status_code}", response.status_code)
+        return response.json()
+
+    async def _backoff(self, attempt: int):
+        self.stats["retries"] += 1
+        await asyncio.sleep(BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random()))
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    async def fetch_payment(self, payment_id: str) -> Dict:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await self._backoff(attempt - 1)
+            try:
+                return await self._send("GET", f"/payments/{payment_id}")
+            except _Retryable as e:
+                last_error = e
+        self.stats["failures"] += 1
+        raise GatewayError(f"Razorpay unavailable: {last_error}")
+
+    async def find_order_by_receipt(self, receipt: str) -> Optional[Dict]:
+        result = await self._send("GET", "/orders", params={"receipt": receipt, "count": 1})
+        items = result.get("items") or []
+        return items[0] if items else None
+
+    async def create_order(self, data: Dict) -> Dict:
+        """
+        Create an order; `data["receipt"]` must be unique per checkout
+        attempt since it is used to detect orders created by a lost request
+        """
+        receipt = data.get("receipt")
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await self._backoff(attempt - 1)
+                if receipt:
+                    try:
+                        existing = await self.find_order_by_receipt(receipt)
+                    except _Retryable as e:
+                        last_error = e
+                        continue
+                    if existing:
+                        self.stats["recovered_orders"] += 1
+                        return existing
+            try:
+                return await self._send("POST", "/orders", json=data)
+            except _Retryable as e:
+                last_error = e
+        self.stats["failures"] += 1
+        raise GatewayError(f"Razorpay unavailable: {last_error}")
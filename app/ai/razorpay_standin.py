@@ -0,0 +1,261 @@
+"""
+Local Razorpay stand-in and checkout load test
+
+    python -m app.ai.razorpay_standin serve [--port 9100] [--latency 0.15] [--fail-rate 0] [--lost-rate 0]
+    python -m app.ai.razorpay_standin bench [--checkouts 2000] [--concurrency 200] [--blocking] ...
+
+`serve` runs a fake of the few endpoints the payment router uses
+(POST /v1/orders, GET /v1/orders?receipt=, GET /v1/payments/{id}) with
+artificial latency and injected failures. Point the app at it with
+RAZORPAY_API_URL=http://127.0.0.1:9100/v1.
+
+    --fail-rate  answer 503 without doing anything
+    --lost-rate  create the order, then answer 503 anyway (lost response;
+                 exercises the receipt lookup before a retry)
+
+POST /v1/standin/orders/{id}/pay captures a payment for an order and
+returns it with a valid checkout signature, so a checkout can be driven
+end to end.
+
+`bench` starts the stand-in in-process and runs N checkouts (create
+order, pay, fetch payment) through RazorpayGateway, reporting throughput,
+latency percentiles, retries and whether any receipt ended up with more
+than one order. --blocking runs the same flow with a synchronous client
+inside the event loop, the way the SDK was being called.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import random
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.ai.razorpay_gateway import GatewayError, RazorpayGateway
+
+KEY_ID = "rzp_test_standin"
+KEY_SECRET = "standin_secret"
+
+
+# ============================================================================
+# Stand-in server
+# ============================================================================
+
+def create_standin_app(latency: float = 0.15, fail_rate: float = 0.0, lost_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Razorpay stand-in")
+    orders: Dict[str, dict] = {}
+    orders_by_receipt: Dict[str, List[str]] = {}
+    payments: Dict[str, dict] = {}
+    app.state.orders_by_receipt = orders_by_receipt
+
+    def error(status: int, description: str) -> JSONResponse:
+        code = "BAD_REQUEST_ERROR" if status < 500 else "SERVER_ERROR"
+        return JSONResponse(status_code=status, content={"error": {"code": code, "description": description}})
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        if not request.headers.get("authorization", "").startswith("Basic "):
+            return error(401, "Authentication failed")
+        await asyncio.sleep(latency * (0.5 + random.random()))
+        if request.url.path.startswith("/v1/standin/"):
+            return await call_next(request)
+        if random.random() < fail_rate:
+            return error(503, "Service unavailable")
+        response = await call_next(request)
+        if request.method == "POST" and request.url.path == "/v1/orders" and random.random() < lost_rate:
+            return error(503, "Gateway timeout")
+        return response
+
+    @app.post("/v1/orders")
+    async def create_order(request: Request):
+        data = await request.json()
+        amount = data.get("amount")
+        if not isinstance(amount, int) or amount < 100:
+            return error(400, "The amount must be atleast INR 1.00")
+        order = {
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": amount,
+            "amount_paid": 0,
+            "amount_due": amount,
+            "currency": data.get("currency", "INR"),
+            "receipt": data.get("receipt"),
+            "status": "created",
+            "attempts": 0,
+            "notes": data.get("notes") or {},
+            "created_at": int(time.time()),
+        }
+        orders[order["id"]] = order
+        if order["receipt"]:
+            orders_by_receipt.setdefault(order["receipt"], []).append(order["id"])
+        return order
+
+    @app.get("/v1/orders")
+    async def list_orders(receipt: str = None, count: int = 10):
+        ids = orders_by_receipt.get(receipt, []) if receipt else list(orders)
+        items = [orders[i] for i in ids[:count]]
+        return {"entity": "collection", "count": len(items), "items": items}
+
+    @app.get("/v1/payments/{payment_id}")
+    async def fetch_payment(payment_id: str):
+        payment = payments.get(payment_id)
+        if payment is None:
+            return error(400, "The id provided does not exist")
+        return payment
+
+    @app.post("/v1/standin/orders/{order_id}/pay")
+    async def pay_order(order_id: str):
+        order = orders.get(order_id)
+        if order is None:
+            raise HTTPException(status_code=404, detail="Unknown order")
+        payment = {
+            "id": f"pay_{uuid.uuid4().hex[:14]}",
+            "entity": "payment",
+            "amount": order["amount"],
+            "currency": order["currency"],
+            "status": "captured",
+            "order_id": order_id,
+            "notes": order["notes"],
+            "created_at": int(time.time()),
+        }
+        payments[payment["id"]] = payment
+        order.update(status="paid", amount_paid=order["amount"], amount_due=0)
+        signature = hmac.new(
+            KEY_SECRET.encode(), f"{order_id}|{payment['id']}".encode(), hashlib.sha256
+        ).hexdigest()
+        return {"payment": payment, "razorpay_signature": signature}
+
+    return app
+
+
+# ============================================================================
+# Load test
+# ============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(app: FastAPI, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def _checkout_async(gateway: RazorpayGateway, admin: httpx.AsyncClient, n: int) -> float:
+    started = time.perf_counter()
+    order = await gateway.create_order({
+        "amount": 19900,
+        "currency": "INR",
+        "receipt": f"bench_{n}_{uuid.uuid4().hex[:8]}",
+        "notes": {"purchase_type": "tier_subscription"},
+    })
+    paid = (await admin.post(f"/standin/orders/{order['id']}/pay")).json()
+    payment = await gateway.fetch_payment(paid["payment"]["id"])
+    assert payment["order_id"] == order["id"] and payment["status"] == "captured"
+    return time.perf_counter() - started
+
+
+def _checkout_blocking(client: httpx.Client, n: int) -> float:
+    started = time.perf_counter()
+    order = client.post("/orders", json={
+        "amount": 19900,
+        "currency": "INR",
+        "receipt": f"bench_{n}_{uuid.uuid4().hex[:8]}",
+    })
+    order.raise_for_status()
+    paid = client.post(f"/standin/orders/{order.json()['id']}/pay").json()
+    client.get(f"/payments/{paid['payment']['id']}").raise_for_status()
+    return time.perf_counter() - started
+
+
+async def bench(checkouts: int, concurrency: int, latency: float, fail_rate: float, lost_rate: float, blocking: bool):
+    app = create_standin_app(latency, fail_rate, lost_rate)
+    port = _free_port()
+    server, thread = _start_server(app, port)
+    base_url = f"http://127.0.0.1:{port}/v1"
+
+    gateway = RazorpayGateway(KEY_ID, KEY_SECRET, base_url=base_url, max_connections=concurrency)
+    admin = httpx.AsyncClient(base_url=base_url, auth=(KEY_ID, KEY_SECRET), timeout=30)
+    sync_client = httpx.Client(base_url=base_url, auth=(KEY_ID, KEY_SECRET), timeout=30)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(n: int):
+        nonlocal failures
+        async with semaphore:
+            try:
+                if blocking:
+                    latencies.append(_checkout_blocking(sync_client, n))
+                else:
+                    latencies.append(await _checkout_async(gateway, admin, n))
+            except (GatewayError, httpx.HTTPError):
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(checkouts)))
+    elapsed = time.perf_counter() - started
+
+    duplicated = sum(1 for ids in app.state.orders_by_receipt.values() if len(ids) > 1)
+    mode = "blocking client in the event loop" if blocking else "RazorpayGateway"
+    print(f"{checkouts} checkouts, concurrency {concurrency}, {mode}")
+    print(f"  stand-in      latency ~{latency * 1e3:.0f} ms/call, fail {fail_rate:.0%}, lost {lost_rate:.0%}")
+    print(f"  throughput    {len(latencies) / elapsed:8.1f} checkouts/s ({elapsed:.1f}s)")
+    print(f"  latency       p50 {_percentile(latencies, 0.5) * 1e3:.0f} ms, "
+          f"p95 {_percentile(latencies, 0.95) * 1e3:.0f} ms, p99 {_percentile(latencies, 0.99) * 1e3:.0f} ms")
+    print(f"  failed        {failures}")
+    print(f"  duplicated    {duplicated} receipts with more than one order")
+    if not blocking:
+        print(f"  gateway       {gateway.stats}")
+
+    await gateway.aclose()
+    await admin.aclose()
+    sync_client.close()
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "bench"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--latency", type=float, default=0.15, help="mean seconds per call")
+        cmd.add_argument("--fail-rate", type=float, default=0.0)
+        cmd.add_argument("--lost-rate", type=float, default=0.0)
+    sub.choices["serve"].add_argument("--port", type=int, default=9100)
+    sub.choices["bench"].add_argument("--checkouts", type=int, default=2000)
+    sub.choices["bench"].add_argument("--concurrency", type=int, default=200)
+    sub.choices["bench"].add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        import uvicorn
+        uvicorn.run(create_standin_app(args.latency, args.fail_rate, args.lost_rate), host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(bench(args.checkouts, args.concurrency, args.latency, args.fail_rate, args.lost_rate, args.blocking))
+
+
+if __name__ == "__main__":
+    main()
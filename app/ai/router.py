@@ -1,18 +1,24 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends , BackgroundTasks
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from pathlib import Path
 from app.ai.client_bound_guard import verify_client_bound_request
 from app.ai.injector import process_injection_to_memory
-from app.ai.services import execute_ai
+from app.ai.services import execute_ai_async
 from app.ai.formatter import process_formatting
 from app.ai.auth_utils import verify_lum_token
-from app.ai.quota_manager import check_and_use_quota,log_activity,get_user_quotas
-from app.ai.payment_router import is_quota_expired, activate_tier_idempotent
+from app.ai.quota_manager import admit_quota,log_activity
 from app.ai.cell_logic import process_cells_generation # Import the new logic
+from app.system.rate_limit import rate_limit
 
 router = APIRouter()
 
+# Burst protection on top of the per-tier quotas
+ai_rate_limit = rate_limit("ai", 20, 60, identity=verify_client_bound_request)
+
+FLOWCHART_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
 class InjectRequest(BaseModel):
     text_content: str
 
@@ -24,69 +30,56 @@ class CellsRequest(BaseModel):
     text_content: str
 
 
-async def handle_quota_expiry(sidhi_id: str):
-    """Helper function to check and handle quota expiry"""
-    quota = await get_user_quotas(sidhi_id)
-    
-    if is_quota_expired(quota):
-        # Auto-downgrade to free tier
-        await activate_tier_idempotent(sidhi_id, "free")
-        quota = await get_user_quotas(sidhi_id)
-    
-    return quota
-
-
-@router.post("/cells")
+@router.post("/cells", dependencies=[Depends(ai_rate_limit)])
 async def ai_cells(payload: CellsRequest, user: dict = Depends(verify_client_bound_request)):
     
     try:
         sidhi_id = user.get("sub")
-        quota = await handle_quota_expiry(sidhi_id)
-        await check_and_use_quota(sidhi_id, "cells")
-        data = process_cells_generation(payload.text_content)
+        await admit_quota(sidhi_id, "cells")
+        data = await asyncio.to_thread(process_cells_generation, payload.text_content)
         return {"status": "success", "tasks": data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.post("/format")
+@router.post("/format", dependencies=[Depends(ai_rate_limit)])
 async def ai_format(payload: FormatRequest, user: dict = Depends(verify_client_bound_request)):
     try:
         sidhi_id = user.get("sub")
-        quota = await handle_quota_expiry(sidhi_id)
-        await check_and_use_quota(sidhi_id, "format")
-        formatted_text = process_formatting(payload.text_content)
+        await admit_quota(sidhi_id, "format")
+        formatted_text = await asyncio.to_thread(process_formatting, payload.text_content)
         return {"status": "success", "output": formatted_text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/inject")
+@router.post("/inject", dependencies=[Depends(ai_rate_limit)])
 async def ai_inject(payload: dict, user: dict = Depends(verify_client_bound_request)):
     try:
         sidhi_id = user.get("sub")
-        quota = await handle_quota_expiry(sidhi_id)
-        await check_and_use_quota(sidhi_id, "inject")
+        await admit_quota(sidhi_id, "inject")
 
         text_content = payload.get("text_content")
-        files_dict = process_injection_to_memory(text_content)
+        files_dict = await asyncio.to_thread(process_injection_to_memory, text_content)
         return {"status": "success", "files": files_dict}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/execute")
+@router.post("/execute", dependencies=[Depends(ai_rate_limit)])
 async def ai_execute(payload: dict, user: dict = Depends(verify_client_bound_request), background_tasks: BackgroundTasks = None):
     try:
         sidhi_id = user.get("sub")
-        quota = await handle_quota_expiry(sidhi_id)
-        await check_and_use_quota(sidhi_id, payload["mode"])
+        await admit_quota(sidhi_id, payload["mode"])
         input_primary = payload.get("input") or payload.get("input1")
-        result = execute_ai(
+        # Flowcharts only: "svg" skips rasterization
+        image_format = "svg" if payload.get("image_format") == "svg" else "png"
+        result = await execute_ai_async(
             mode=payload["mode"],
             version=payload.get("version", "standard"),
             language=payload.get("language", "english"),
-            input_text=input_primary
+            input_text=input_primary,
+            image_format=image_format
         )
         if isinstance(result, Path) and result.exists():
-            return FileResponse(result, media_type="image/png")
+            return FileResponse(result, media_type=FLOWCHART_MEDIA_TYPES[image_format])
         background_tasks.add_task(log_activity, sidhi_id, payload["mode"], True)
         return {"output": result}
     except Exception as e:
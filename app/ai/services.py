@@ -1,15 +1,37 @@
 from app.ai.prompts import PROMPTS
 from app.ai.gemini_core import run_gemini
+from app.system.cache import get_cache
+import asyncio
+import hashlib
 import json
+import os
+import threading
+import time
+import uuid
 from pathlib import Path
 import re
+from typing import Optional
 # Assuming you place the flowchart script in the same directory
-from app.ai.flowchart_engine_v1 import generate_flowchart_from_json_and_save
+from app.ai.flowchart_engine_v1 import render_flowchart_bytes
+
+# LLM outputs keyed by (mode, version, language, input hash)
+AI_OUTPUT_CACHE_TTL = int(os.getenv("AI_OUTPUT_CACHE_TTL", "86400"))  # seconds
+ai_output_cache = get_cache("ai_outputs")
+
+# Rendered flowcharts, content-addressed by the normalized flow JSON hash.
+# Files unused for FLOWCHART_CACHE_MAX_AGE are pruned, and the least
+# recently used go first once the directory exceeds FLOWCHART_CACHE_MAX_MB.
+FLOWCHART_CACHE_DIR = Path(os.getenv("FLOWCHART_CACHE_DIR", "/tmp/lum_flowcharts"))
+FLOWCHART_CACHE_MAX_AGE = int(os.getenv("FLOWCHART_CACHE_MAX_AGE", str(7 * 86400)))  # seconds
+FLOWCHART_CACHE_MAX_MB = int(os.getenv("FLOWCHART_CACHE_MAX_MB", "512"))
+FLOWCHART_PRUNE_INTERVAL = 600  # seconds between pruning passes
+_prune_lock = threading.Lock()
+_last_prune = 0.0
 
 def normalize_language(lang: str) -> str:
     return "Tanglish (Tamil + English mix)" if lang == "tanglish" else "English"
 
-def execute_ai(mode: str, version: str, language: str, input_text: str,input2: str = ""):
+def build_prompt(mode: str, version: str, language: str, input_text: str, input2: str = "") -> str:
     if mode not in PROMPTS:
         raise ValueError("Unsupported mode")
     if version not in PROMPTS[mode]:
@@ -18,40 +40,121 @@ def execute_ai(mode: str, version: str, language: str, input_text: str,input2: s
     prompt_template = PROMPTS[mode][version]
     if mode == "diff":
         # Ensure we have both inputs for diff, otherwise it will crash
-        prompt = prompt_template.format(
+        return prompt_template.format(
             language=normalize_language(language),
             input1=input_text,
             input2=input2 if input2 else ""
         )
-    else:
-        prompt = prompt_template.format(
-            language=normalize_language(language),
-            input=input_text
-        )
+    return prompt_template.format(
+        language=normalize_language(language),
+        input=input_text
+    )
+
+def prune_flowchart_cache():
+    """Delete stale renders, then the least recently used until under the size cap"""
+    now = time.time()
+    files = []
+    for path in FLOWCHART_CACHE_DIR.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if now - stat.st_mtime > FLOWCHART_CACHE_MAX_AGE:
+            path.unlink(missing_ok=True)
+        else:
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    limit = FLOWCHART_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(files, key=lambda f: f[0]):
+        if total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
 
+def _maybe_prune_flowchart_cache():
+    global _last_prune
+    if time.monotonic() - _last_prune < FLOWCHART_PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = time.monotonic()
+        prune_flowchart_cache()
+    except OSError as e:
+        print(f"Flowchart cache pruning error: {e}")
+    finally:
+        _prune_lock.release()
+
+def render_flowchart_output(raw_output: str, fmt: str = "png") -> Optional[Path]:
+    """
+    Turn Gemini's flowchart JSON into an image path (None if there is no JSON).
+    Identical flows (after key-order normalization) reuse the same file;
+    new renders are written under a per-request name and atomically moved
+    into place, so concurrent requests never share an output path.
+    """
+    try:
+        # ROBUST CLEANING: Find the first '{' and the last '}'
+        # This ignores any "Here is your JSON:" text or ```json tags
+        match = re.search(r'\{.*\}', raw_output, re.DOTALL)
+        if not match:
+            print(f"No JSON found in Gemini output: {raw_output}")
+            return None
+
+        flow_data = json.loads(match.group(0))
+        normalized = json.dumps(flow_data, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+        FLOWCHART_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cached_path = FLOWCHART_CACHE_DIR / f"{digest}.{fmt}"
+        if cached_path.exists():
+            try:
+                os.utime(cached_path)  # Recently used - pruned last
+                return cached_path
+            except FileNotFoundError:
+                pass  # Pruned meanwhile: render again
+
+        try:
+            image = render_flowchart_bytes(flow_data, fmt)
+        except Exception as e:
+            print("Flowchart engine error:", e)
+            return raw_output  # Render failed: hand back the JSON text as before
+
+        temp_img_path = FLOWCHART_CACHE_DIR / f"{digest}.{uuid.uuid4().hex}.{fmt}"
+        temp_img_path.write_bytes(image)
+        os.replace(temp_img_path, cached_path)
+        _maybe_prune_flowchart_cache()
+        return cached_path
+    except Exception as e:
+        print(f"Flowchart processing error: {e}")
+        return None
+
+def execute_ai(mode: str, version: str, language: str, input_text: str,input2: str = ""):
+    prompt = build_prompt(mode, version, language, input_text, input2)
     raw_output = run_gemini(prompt)
 
     # SPECIAL CASE: Flowchart Generation
     if mode == "fc":
-        try:
-            # ROBUST CLEANING: Find the first '{' and the last '}'
-            # This ignores any "Here is your JSON:" text or ```json tags
-            match = re.search(r'\{.*\}', raw_output, re.DOTALL)
-            if match:
-                clean_json = match.group(0)
-                flow_data = json.loads(clean_json)
-                
-                temp_img_path = Path("/tmp/flow_output.png")
-                # Call your generator
-                success = generate_flowchart_from_json_and_save(flow_data, temp_img_path)
-                
-                if success:
-                    return temp_img_path
-            else:
-                print(f"No JSON found in Gemini output: {raw_output}")
-                return None
-        except Exception as e:
-            print(f"Flowchart processing error: {e}")
-            return None
+        return render_flowchart_output(raw_output)
+
+    return raw_output
+
+async def execute_ai_async(mode: str, version: str, language: str, input_text: str, input2: str = "", image_format: str = "png"):
+    """
+    execute_ai for async routes: Gemini and Graphviz run in worker threads
+    and repeated prompts are served from the output cache.
+    image_format ("png" | "svg") only applies to flowcharts.
+    """
+    prompt = build_prompt(mode, version, language, input_text, input2)
+
+    input_hash = hashlib.sha256(f"{input_text}\x00{input2}".encode("utf-8")).hexdigest()
+    cache_key = f"{mode}:{version}:{language}:{input_hash}"
+
+    async def load():
+        return await asyncio.to_thread(run_gemini, prompt)
+
+    raw_output = await ai_output_cache.get_or_set(cache_key, load, AI_OUTPUT_CACHE_TTL)
+
+    # SPECIAL CASE: Flowchart Generation
+    if mode == "fc":
+        return await asyncio.to_thread(render_flowchart_output, raw_output, image_format)
 
-    return raw_output
\ No newline at end of file
+    return raw_output
@@ -1,15 +1,53 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+
+from app.system.fanout import Fanout
+from app.system.pubsub import Backplane, BroadcastHub
+
+# A room's password is shared through the backplane and outlives the
+# room's last member by this long (refreshed every TTL/4 while any worker
+# has a member connected)
+CHAT_ROOM_TTL = int(os.getenv("CHAT_ROOM_TTL", "3600"))  # seconds
+
+# Keys the room password HMAC stored in the shared backend; every worker
+# needs the same value
+CHAT_ROOM_SECRET = os.getenv("CHAT_ROOM_SECRET") or os.getenv("JWT_SECRET_KEY")
+if not CHAT_ROOM_SECRET:
+    print("⚠️ CHAT_ROOM_SECRET not set - chat room passwords only match within this process")
+    CHAT_ROOM_SECRET = secrets.token_hex(32)
 
 class ChatManager:
-    def __init__(self):
-        self.rooms: Dict[str, Dict] = {}
+    def __init__(self, backplane: Optional[Backplane] = None):
+        # Every chat message is delivered in order, so a full queue disconnects
+        self.hub = BroadcastHub("chat", Fanout(), backplane)
+        # Rooms with members on this worker: channel_id -> (password hash, refresh task)
+        self.rooms: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    @staticmethod
+    def _password_hash(channel_id: str, password: str) -> str:
+        message = f"{channel_id}\x00{password}".encode("utf-8")
+        return hmac.new(CHAT_ROOM_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+    async def _keep_room(self, channel_id: str, password_hash: str):
+        """Keep the retained password alive while this worker has members, even in a quiet room"""
+        while True:
+            await asyncio.sleep(CHAT_ROOM_TTL / 4)
+            try:
+                await self.hub.retain(channel_id, password_hash, CHAT_ROOM_TTL)
+            except Exception as e:
+                print(f"⚠️ Chat room refresh failed for {channel_id}: {e}")
 
     async def connect(self, websocket: WebSocket, channel_id: str, password: str):
-        if channel_id not in self.rooms:
-            self.rooms[channel_id] = {"pass": password, "users": []}
+        password_hash = self._password_hash(channel_id, password)
+        # Atomic claim: of two first joiners, only one password wins
+        stored = await self.hub.retain_if_absent(channel_id, password_hash, CHAT_ROOM_TTL)
         
-        if self.rooms[channel_id]["pass"] != password:
+        if not hmac.compare_digest(stored, password_hash):
             await websocket.send_json({
                 "type": "error", 
                 "user": "SYSTEM", 
@@ -18,25 +56,25 @@ class ChatManager:
             await websocket.close()
             return False
             
-        self.rooms[channel_id]["users"].append(websocket)
+        await self.hub.join(channel_id, websocket)
+        # After join, so a concurrent last-member disconnect cannot drop the refresh
+        if channel_id not in self.rooms:
+            task = asyncio.create_task(self._keep_room(channel_id, password_hash))
+            self.rooms[channel_id] = (password_hash, task)
         return True
 
     async def disconnect(self, websocket: WebSocket, channel_id: str):
-        if channel_id in self.rooms:
-            if websocket in self.rooms[channel_id]["users"]:
-                self.rooms[channel_id]["users"].remove(websocket)
-            
-            if not self.rooms[channel_id]["users"]:
-                del self.rooms[channel_id]
+        await self.hub.leave(channel_id, websocket)
+        if not self.hub.fanout.subscriber_count(channel_id):
+            room = self.rooms.pop(channel_id, None)
+            if room:
+                room[1].cancel()
 
     async def broadcast(self, channel_id: str, message: dict):
-        if channel_id in self.rooms:
-            active_connections = list(self.rooms[channel_id]["users"])
-            for connection in active_connections:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    if connection in self.rooms[channel_id]["users"]:
-                        self.rooms[channel_id]["users"].remove(connection)
-
-manager = ChatManager()
\ No newline at end of file
+        # Queued per connection; never waits on a slow member
+        await self.hub.publish(channel_id, message)
+
+    def metrics(self) -> dict:
+        return {"rooms": len(self.rooms), **self.hub.fanout.stats()}
+
+manager = ChatManager()
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
 from .manager import manager
 from app.ai.auth_utils import verify_lum_token_ws
+from app.admin.hardened_firebase_auth import get_current_admin
 
 router = APIRouter(prefix="/chat")
 
+@router.get("/metrics")
+async def chat_metrics(admin: dict = Depends(get_current_admin)):
+    """Fan-out counters, including slow-consumer disconnects"""
+    return manager.metrics()
+
 @router.websocket("/{channel_id}/{password}/{username}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -111,7 +111,7 @@ async def admin_logout(
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=400, detail="Missing or malformed Authorization header")
     token = authorization.split(" ")[1]
-    revoke_admin_session(token)
+    await revoke_admin_session(token)
     return {"message": "Logged out."}
 
 
@@ -15,9 +15,12 @@ from pydantic import BaseModel
 from cerebras.cloud.sdk import Cerebras
 
 from app.courses.dependencies import get_db, get_current_user_id
+from app.system.rate_limit import rate_limit
 
 router = APIRouter(tags=["AI Doubt Solver"])
 
+doubt_rate_limit = rate_limit("ai_doubt", 10, 60, identity=get_current_user_id)
+
 # ── Cerebras client ───────────────────────────────────────────────────────────
 # Set CEREBRAS_API_KEY in your .env — client picks it up automatically
 _cerebras = Cerebras(api_key=os.environ.get("CEREBRAS_API_KEY"))
@@ -140,7 +143,7 @@ Be concise and educational."""
 #  ENDPOINTS
 # ══════════════════════════════════════════════════════════════════
 
-@router.post("/ask-doubt/stream")
+@router.post("/ask-doubt/stream", dependencies=[Depends(doubt_rate_limit)])
 async def ask_doubt_stream(
     doubt: DoubtQuery,
     db:      AsyncIOMotorDatabase = Depends(get_db),
@@ -213,7 +216,7 @@ async def ask_doubt_stream(
     )
 
 
-@router.post("/ask-doubt")
+@router.post("/ask-doubt", dependencies=[Depends(doubt_rate_limit)])
 async def ask_doubt(
     doubt: DoubtQuery,
     db:      AsyncIOMotorDatabase = Depends(get_db),
@@ -306,7 +309,7 @@ async def save_doubt_response(
     return {"success": True}
 
 
-@router.post("/get-hint")
+@router.post("/get-hint", dependencies=[Depends(doubt_rate_limit)])
 async def get_hint(
     req:     HintRequest,
     db:      AsyncIOMotorDatabase = Depends(get_db),
@@ -388,7 +391,7 @@ async def get_hint(
     }
 
 
-@router.post("/explain-code")
+@router.post("/explain-code", dependencies=[Depends(doubt_rate_limit)])
 async def explain_code(
     req:     ExplainRequest,
     db:      AsyncIOMotorDatabase = Depends(get_db),
@@ -25,6 +25,8 @@ async def create_claim_indexes(db):
         await db.course_access_requests.create_index([("request_id", 1)], unique=True)
         await db.course_access_requests.create_index([("course_id", 1), ("status", 1)])
         await db.course_access_requests.create_index([("submitted_at", -1)])
+        # Superadmin overview: pending count + newest-pending preview
+        await db.course_access_requests.create_index([("status", 1), ("submitted_at", -1)])
 
         print("✅ Claim system indexes created")
 
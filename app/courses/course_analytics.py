@@ -0,0 +1,276 @@
+"""
+Per-course instructor analytics snapshot
+
+One document per course in `course_analytics`:
+    {
+        _id: course_id,
+        league_distribution: {BRONZE: n, SILVER: n, ...},   # active enrollments
+        questions: {question_id: {attempts, accepted}},
+        daily: {"YYYY-MM-DD": {enrollments, submissions}},  # UTC days
+        totals: {enrollments, questions, submissions},
+        rebuilt_at, updated_at,
+        daily_pruned_on: "YYYY-MM-DD"
+    }
+
+Only the last ACTIVITY_WINDOW_DAYS daily buckets are read; older ones are
+dropped by the first daily write of each UTC day.
+
+The enrollment, submission and question write paths call the record_*
+helpers, which $inc the existing snapshot. They never create one: a course
+without a snapshot is rebuilt from the raw collections on its first
+analytics read, or ahead of time with
+
+    python -m app.courses.course_analytics [--course COURSE_ID]
+
+Counters bumped while a rebuild is running can be lost; the next rebuild
+corrects them.
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+ACTIVITY_WINDOW_DAYS = 7
+TOP_QUESTIONS = 10
+
+
+def _day_key(when: datetime) -> str:
+    return when.strftime("%Y-%m-%d")
+
+
+def _league_key(league) -> str:
+    # LeagueTier members and plain strings both end up as "BRONZE" etc.
+    return str(getattr(league, "value", league) or "BRONZE").upper()
+
+
+# ============================================================================
+# Incremental maintenance (write paths)
+# ============================================================================
+
+async def _prune_daily(db: AsyncIOMotorDatabase, course_id: str, now: datetime):
+    """Drop daily buckets outside the activity window; a no-op after the first call of the day"""
+    today = _day_key(now)
+    cutoff = _day_key(now - timedelta(days=ACTIVITY_WINDOW_DAYS - 1))
+    await db.course_analytics.update_one(
+        {"_id": course_id, "daily_pruned_on": {"$ne": today}},
+        [{"$set": {
+            "daily": {"$arrayToObject": {"$filter": {
+                "input": {"$objectToArray": {"$ifNull": ["$daily", {}]}},
+                "cond": {"$gte": ["$$this.k", cutoff]}
+            }}},
+            "daily_pruned_on": today
+        }}]
+    )
+
+
+async def _apply(db: AsyncIOMotorDatabase, course_id: str, inc: Dict):
+    try:
+        now = datetime.utcnow()
+        await db.course_analytics.update_one(
+            {"_id": course_id},
+            {"$inc": inc, "$set": {"updated_at": now}}
+        )
+        if any(path.startswith("daily.") for path in inc):
+            await _prune_daily(db, course_id, now)
+    except Exception as e:
+        # Analytics must never fail a submission or enrollment
+        print(f"⚠️ Course analytics update failed for {course_id}: {e}")
+
+
+async def record_enrollment(db: AsyncIOMotorDatabase, course_id: str, league="BRONZE"):
+    await _apply(db, course_id, {
+        "totals.enrollments": 1,
+        f"league_distribution.{_league_key(league)}": 1,
+        f"daily.{_day_key(datetime.utcnow())}.enrollments": 1,
+    })
+
+
+async def record_unenrollment(db: AsyncIOMotorDatabase, course_id: str, league="BRONZE"):
+    await _apply(db, course_id, {
+        "totals.enrollments": -1,
+        f"league_distribution.{_league_key(league)}": -1,
+    })
+
+
+async def record_league_change(db: AsyncIOMotorDatabase, course_id: str, old_league, new_league):
+    old_key, new_key = _league_key(old_league), _league_key(new_league)
+    if old_key == new_key:
+        return
+    await _apply(db, course_id, {
+        f"league_distribution.{old_key}": -1,
+        f"league_distribution.{new_key}": 1,
+    })
+
+
+async def record_submission(db: AsyncIOMotorDatabase, course_id: str, question_id: str):
+    await _apply(db, course_id, {
+        "totals.submissions": 1,
+        f"questions.{question_id}.attempts": 1,
+        f"daily.{_day_key(datetime.utcnow())}.submissions": 1,
+    })
+
+
+async def record_verdict_change(db: AsyncIOMotorDatabase, course_id: str, question_id: str, old_verdict, new_verdict):
+    """Keep `accepted` in step when a submission moves into or out of Accepted"""
+    delta = (new_verdict == "Accepted") - (old_verdict == "Accepted")
+    if delta:
+        await _apply(db, course_id, {f"questions.{question_id}.accepted": delta})
+
+
+async def record_question_created(db: AsyncIOMotorDatabase, course_id: str):
+    await _apply(db, course_id, {"totals.questions": 1})
+
+
+# ============================================================================
+# Rebuild (backfill)
+# ============================================================================
+
+async def rebuild_course_analytics(db: AsyncIOMotorDatabase, course_id: str) -> Dict:
+    """Recompute the snapshot for one course from the raw collections"""
+    window_start = datetime.utcnow() - timedelta(days=ACTIVITY_WINDOW_DAYS)
+    by_day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$_when"}}
+
+    enrollment_facets, submission_facets, question_count = await asyncio.gather(
+        db.course_enrollments.aggregate([
+            {"$match": {"course_id": course_id}},
+            {"$facet": {
+                "leagues": [
+                    {"$match": {"is_active": True}},
+                    {"$group": {"_id": "$current_league", "count": {"$sum": 1}}}
+                ],
+                "daily": [
+                    {"$match": {"enrolled_at": {"$gte": window_start}}},
+                    {"$set": {"_when": "$enrolled_at"}},
+                    {"$group": {"_id": by_day, "count": {"$sum": 1}}}
+                ],
+            }}
+        ]).to_list(length=1),
+        db.course_submissions.aggregate([
+            {"$match": {"course_id": course_id}},
+            {"$facet": {
+                "questions": [
+                    {"$group": {
+                        "_id": "$question_id",
+                        "attempts": {"$sum": 1},
+                        "accepted": {"$sum": {"$cond": [{"$eq": ["$verdict", "Accepted"]}, 1, 0]}}
+                    }}
+                ],
+                "daily": [
+                    {"$match": {"submitted_at": {"$gte": window_start}}},
+                    {"$set": {"_when": "$submitted_at"}},
+                    {"$group": {"_id": by_day, "count": {"$sum": 1}}}
+                ],
+            }}
+        ]).to_list(length=1),
+        db.course_questions.count_documents({"course_id": course_id, "is_active": True}),
+    )
+    enrollments = enrollment_facets[0] if enrollment_facets else {"leagues": [], "daily": []}
+    submissions = submission_facets[0] if submission_facets else {"questions": [], "daily": []}
+
+    daily: Dict[str, Dict[str, int]] = {}
+    for row in enrollments["daily"]:
+        daily.setdefault(row["_id"], {"enrollments": 0, "submissions": 0})["enrollments"] = row["count"]
+    for row in submissions["daily"]:
+        daily.setdefault(row["_id"], {"enrollments": 0, "submissions": 0})["submissions"] = row["count"]
+
+    league_distribution: Dict[str, int] = {}
+    for row in enrollments["leagues"]:
+        key = _league_key(row["_id"])
+        league_distribution[key] = league_distribution.get(key, 0) + row["count"]
+
+    now = datetime.utcnow()
+    snapshot = {
+        "league_distribution": league_distribution,
+        "questions": {
+            row["_id"]: {"attempts": row["attempts"], "accepted": row["accepted"]}
+            for row in submissions["questions"] if row["_id"]
+        },
+        "daily": daily,
+        "totals": {
+            "enrollments": sum(league_distribution.values()),
+            "questions": question_count,
+            "submissions": sum(row["attempts"] for row in submissions["questions"]),
+        },
+        "rebuilt_at": now,
+        "updated_at": now,
+    }
+    await db.course_analytics.replace_one({"_id": course_id}, snapshot, upsert=True)
+    return {"_id": course_id, **snapshot}
+
+
+async def rebuild_all_course_analytics(db: AsyncIOMotorDatabase) -> int:
+    """Rebuild every course's snapshot; returns courses processed"""
+    count = 0
+    async for course in db.courses.find({}, {"course_id": 1}):
+        await rebuild_course_analytics(db, course["course_id"])
+        count += 1
+    return count
+
+
+async def delete_course_analytics(db: AsyncIOMotorDatabase, course_id: str):
+    await db.course_analytics.delete_one({"_id": course_id})
+
+
+# ============================================================================
+# Reads
+# ============================================================================
+
+async def get_course_analytics_snapshot(db: AsyncIOMotorDatabase, course_id: str) -> Dict:
+    snapshot = await db.course_analytics.find_one({"_id": course_id})
+    if snapshot is None:
+        snapshot = await rebuild_course_analytics(db, course_id)
+    return snapshot
+
+
+def recent_activity(snapshot: Dict, days: int = ACTIVITY_WINDOW_DAYS) -> Dict[str, int]:
+    """Sum the daily buckets for the last `days` UTC days, today included"""
+    today = datetime.utcnow()
+    keys = {_day_key(today - timedelta(days=offset)) for offset in range(days)}
+    buckets = [v for k, v in (snapshot.get("daily") or {}).items() if k in keys]
+    return {
+        "new_enrollments": sum(b.get("enrollments", 0) for b in buckets),
+        "submissions": sum(b.get("submissions", 0) for b in buckets),
+    }
+
+
+def most_attempted(snapshot: Dict, limit: int = TOP_QUESTIONS) -> list:
+    ranked = sorted(
+        (snapshot.get("questions") or {}).items(),
+        key=lambda item: item[1].get("attempts", 0),
+        reverse=True
+    )[:limit]
+    return [
+        {"_id": qid, "attempt_count": c.get("attempts", 0), "accepted_count": c.get("accepted", 0)}
+        for qid, c in ranked
+    ]
+
+
+# ============================================================================
+# Backfill command
+# ============================================================================
+
+async def _main(course_id: Optional[str]):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL"))
+    db = client.lumetrics_db
+    try:
+        if course_id:
+            await rebuild_course_analytics(db, course_id)
+            print(f"Rebuilt analytics for {course_id}")
+        else:
+            count = await rebuild_all_course_analytics(db)
+            print(f"Rebuilt analytics for {count} courses")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild course analytics snapshots")
+    parser.add_argument("--course", help="Only rebuild this course_id")
+    args = parser.parse_args()
+    asyncio.run(_main(args.course))
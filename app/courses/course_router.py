@@ -6,11 +6,21 @@ from app.courses.database import (
     create_course, get_course, update_course, publish_course, list_courses,
     create_question, get_question, create_lab_course
 )
+import asyncio
 import uuid
 from pydantic import BaseModel
 from datetime import datetime,timedelta
 from typing import Optional
 from app.courses.dependencies import get_db,get_current_user_id
+from app.courses.lab_progress import (
+    get_lab_structure, get_progress_matrix, invalidate_lab_structure,
+    module_schedule, stream_progress_csv
+)
+from app.courses.course_analytics import (
+    get_course_analytics_snapshot, rebuild_course_analytics, recent_activity,
+    most_attempted as course_analytics_most_attempted
+)
+from fastapi.responses import StreamingResponse
 router = APIRouter( tags=["Course Management"])
 
 # ==================== COURSE CRUD ====================
@@ -181,6 +191,7 @@ async def create_module(
     }
 
     await db.modules.insert_one(doc)
+    await invalidate_lab_structure(payload.course_id)
     return {"module_id": module_id}
 
 @router.post("/create")
@@ -322,6 +333,7 @@ async def create_lab_module(
         "created_at": datetime.utcnow(),
     }
     await db.modules.insert_one(doc)
+    await invalidate_lab_structure(course_id)
     return {"success": True, "module_id": module_id}
 
 
@@ -353,6 +365,7 @@ async def update_lab_module(
     updates["updated_at"] = datetime.utcnow()
 
     await db.modules.update_one({"module_id": module_id}, {"$set": updates})
+    await invalidate_lab_structure(course_id)
     return {"success": True}
 
 
@@ -382,6 +395,8 @@ async def list_lab_modules(
     now = datetime.utcnow()
     cursor = db.modules.find({"course_id": course_id}).sort("order", 1)
     modules = await cursor.to_list(None)
+    structure = await get_lab_structure(db, course_id)
+    question_ids = {m["module_id"]: m["question_ids"] for m in structure["modules"]}
 
     # Student's completed modules and solved questions
     completed_modules = enrollment.get("completed_modules", []) if enrollment else []
@@ -396,13 +411,10 @@ async def list_lab_modules(
         is_closed   = (close_at is not None) and (now > close_at)
 
         # All active questions in this module
-        module_questions = await db.course_questions.find(
-            {"module_id": m["module_id"], "is_active": True},
-            {"question_id": 1}
-        ).to_list(length=None)
+        module_questions = question_ids.get(m["module_id"], set())
 
         total_q  = len(module_questions)
-        solved_q = sum(1 for q in module_questions if q["question_id"] in solved_ids)
+        solved_q = len(module_questions & solved_ids)
 
         result.append({
             "module_id":    m["module_id"],
@@ -438,54 +450,23 @@ async def get_lab_students(
     if course.get("creator_id") != user_id:
         raise HTTPException(status_code=403, detail="Only the lab creator can view student data")
 
-    # All enrolled students
-    enrollments = await db.course_enrollments.find(
-        {"course_id": course_id, "is_active": True}
-    ).to_list(length=None)
-
-    # Total questions in lab
-    total_questions = await db.course_questions.count_documents(
-        {"course_id": course_id, "is_active": True}
-    )
+    matrix = await get_progress_matrix(db, course_id)
+    modules = matrix["structure"]["modules"]
+    total_questions = matrix["structure"]["total_questions"]
 
     result = []
-    for enr in enrollments:
-        student_user_id = enr["user_id"]
-        profile = await db.users_profile.find_one({"user_id": student_user_id})
-
-        solved = enr.get("solved_questions", [])
-        solved_count = len(solved)
-        progress = round((solved_count / total_questions * 100) if total_questions > 0 else 0, 2)
-
-        # Per-module solved breakdown
-        modules = await db.modules.find({"course_id": course_id}).sort("order", 1).to_list(None)
-        module_breakdown = []
-        for m in modules:
-            module_questions = await db.course_questions.find(
-                {"course_id": course_id, "module_id": m["module_id"], "is_active": True}
-            ).to_list(length=None)
-            module_q_ids = [q["question_id"] for q in module_questions]
-            solved_in_module = len([qid for qid in solved if qid in module_q_ids])
-            module_breakdown.append({
+    for row in matrix["rows"]:
+        module_solved = row.pop("module_solved")
+        row["module_breakdown"] = [
+            {
                 "module_id": m["module_id"],
                 "title": m["title"],
-                "total_questions": len(module_q_ids),
-                "solved": solved_in_module,
-            })
-
-        result.append({
-            "user_id": student_user_id,
-            "sidhi_id": enr.get("sidhi_id"),
-            "username": profile.get("username") if profile else "Unknown",
-            "email": profile.get("email_id") if profile else None,
-            "enrolled_at": enr.get("enrolled_at"),
-            "solved_count": solved_count,
-            "total_questions": total_questions,
-            "progress_percentage": progress,
-            "league_points": enr.get("league_points", 0),
-            "current_league": enr.get("current_league", "BRONZE"),
-            "module_breakdown": module_breakdown,
-        })
+                "total_questions": len(m["question_ids"]),
+                "solved": solved,
+            }
+            for m, solved in zip(modules, module_solved)
+        ]
+        result.append(row)
 
     return {
         "course_id": course_id,
@@ -495,6 +476,29 @@ async def get_lab_students(
     }
 
 
+@router.get("/labs/{course_id}/students/export")
+async def export_lab_progress(
+    course_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Teacher: stream the student x module progress matrix as CSV.
+    Only the lab creator can access this.
+    """
+    course = await db.courses.find_one({"course_id": course_id})
+    if not course or course.get("course_type") != "LAB":
+        raise HTTPException(status_code=404, detail="Lab course not found")
+    if course.get("creator_id") != user_id:
+        raise HTTPException(status_code=403, detail="Only the lab creator can export student data")
+
+    return StreamingResponse(
+        stream_progress_csv(db, course_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={course_id}_progress.csv"}
+    )
+
+
 @router.post("/labs/{course_id}/enroll")
 async def enroll_in_lab_course(
     course_id: str,
@@ -555,41 +559,32 @@ async def get_lab_teacher_dashboard(
     if course.get("creator_id") != user_id:
         raise HTTPException(status_code=403, detail="Only the lab creator can view this dashboard")
 
-    enrolled_count = await db.course_enrollments.count_documents(
-        {"course_id": course_id, "is_active": True}
-    )
-    total_questions = await db.course_questions.count_documents(
-        {"course_id": course_id, "is_active": True}
-    )
+    structure = await get_lab_structure(db, course_id)
+    total_questions = structure["total_questions"]
+    modules = structure["modules"]
 
-    modules = await db.modules.find({"course_id": course_id}).sort("order", 1).to_list(None)
     now = datetime.utcnow()
-    module_summaries = []
-    for m in modules:
-        q_count = await db.course_questions.count_documents(
-            {"course_id": course_id, "module_id": m["module_id"], "is_active": True}
-        )
-        unlock_at = m.get("unlock_at")
-        close_at = m.get("close_at")
-        module_summaries.append({
+    module_summaries = [
+        {
             "module_id": m["module_id"],
             "title": m["title"],
             "order": m["order"],
-            "question_count": q_count,
-            "resource_count": len(m.get("resources", [])),
-            "is_unlocked": (unlock_at is None) or (now >= unlock_at),
-            "is_closed": (close_at is not None) and (now > close_at),
-            "unlock_at": unlock_at.isoformat() if unlock_at else None,
-            "close_at": close_at.isoformat() if close_at else None,
-        })
+            "question_count": len(m["question_ids"]),
+            "resource_count": m["resource_count"],
+            **module_schedule(m, now),
+        }
+        for m in modules
+    ]
 
     enrollments = await db.course_enrollments.find(
-        {"course_id": course_id, "is_active": True}
+        {"course_id": course_id, "is_active": True},
+        {"_id": 0, "solved_count": {"$size": {"$ifNull": ["$solved_questions", []]}}}
     ).to_list(length=None)
+    enrolled_count = len(enrollments)
 
     if enrollments and total_questions > 0:
         avg_completion = sum(
-            len(e.get("solved_questions", [])) / total_questions
+            e["solved_count"] / total_questions
             for e in enrollments
         ) / len(enrollments) * 100
     else:
@@ -763,40 +758,39 @@ async def get_labs_for_classroom(
         "status":       "PUBLISHED"
     }).sort("created_at", -1).to_list(length=None)
 
+    course_ids = [lc["course_id"] for lc in lab_courses]
+    enrollments = await db.course_enrollments.find({
+        "course_id": {"$in": course_ids},
+        "user_id":   user_id,
+        "is_active": True
+    }, {"_id": 0, "course_id": 1, "solved_questions": 1, "completed_modules": 1}).to_list(length=None)
+    enrollment_by_course = {e["course_id"]: e for e in enrollments}
+    structures = await asyncio.gather(*(get_lab_structure(db, cid) for cid in course_ids))
+
     now = datetime.utcnow()
     result = []
 
-    for lc in lab_courses:
+    for lc, structure in zip(lab_courses, structures):
         cid = lc["course_id"]
+        enrollment = enrollment_by_course.get(cid)
 
-        enrollment = await db.course_enrollments.find_one({
-            "course_id": cid,
-            "user_id":   user_id,
-            "is_active": True
-        })
-
-        total_q  = await db.course_questions.count_documents({"course_id": cid, "is_active": True})
+        total_q  = structure["total_questions"]
         solved_q = len(enrollment.get("solved_questions", [])) if enrollment else 0
         completed_modules = enrollment.get("completed_modules", []) if enrollment else []
 
-        modules = await db.modules.find({"course_id": cid}).sort("order", 1).to_list(length=None)
         module_summaries = []
-        for m in modules:
-            unlock_at = m.get("unlock_at")
-            close_at  = m.get("close_at")
-            mq_count  = await db.course_questions.count_documents(
-                {"course_id": cid, "module_id": m["module_id"], "is_active": True}
-            )
+        for m in structure["modules"]:
+            schedule = module_schedule(m, now)
             module_summaries.append({
                 "module_id":    m["module_id"],
                 "title":        m["title"],
                 "order":        m["order"],
-                "is_unlocked":  (unlock_at is None) or (now >= unlock_at),
-                "is_closed":    (close_at is not None) and (now > close_at),
+                "is_unlocked":  schedule["is_unlocked"],
+                "is_closed":    schedule["is_closed"],
                 "is_completed": m["module_id"] in completed_modules,
-                "question_count": mq_count,
-                "unlock_at":    unlock_at.isoformat() if unlock_at else None,
-                "close_at":     close_at.isoformat()  if close_at  else None,
+                "question_count": len(m["question_ids"]),
+                "unlock_at":    schedule["unlock_at"],
+                "close_at":     schedule["close_at"],
             })
 
         result.append({
@@ -899,6 +893,7 @@ async def update_module(
         {"module_id": module_id},
         {"$set": update_data}
     )
+    await invalidate_lab_structure(module["course_id"])
 
     return {"success": True}
 @router.delete("/modules/{module_id}")
@@ -907,10 +902,11 @@ async def delete_module(
     db: AsyncIOMotorDatabase = Depends(get_db),
     user_id: str = Depends(get_current_user_id)
 ):
-    await verify_module_owner(db, module_id, user_id)
+    module = await verify_module_owner(db, module_id, user_id)
     
     await db.lessons.delete_many({"module_id": module_id})
     await db.modules.delete_one({"module_id": module_id})
+    await invalidate_lab_structure(module["course_id"])
 
     return {"success": True}
 
@@ -1002,6 +998,10 @@ async def reorder_modules(
             {"$set": {"order": idx + 1}}
         )
 
+    course_ids = await db.modules.distinct("course_id", {"module_id": {"$in": payload.order}})
+    for course_id in course_ids:
+        await invalidate_lab_structure(course_id)
+
     return {"success": True}
 @router.post("/lessons")
 async def create_lesson(
@@ -1459,72 +1459,55 @@ async def get_course_analytics(
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    # Get enrollments with league distribution
-    league_distribution = await db.course_enrollments.aggregate([
-        {"$match": {"course_id": course_id, "is_active": True}},
-        {"$group": {
-            "_id": "$current_league",
-            "count": {"$sum": 1}
-        }}
-    ]).to_list(length=None)
-    
-    # Get most attempted questions
-    most_attempted = await db.course_submissions.aggregate([
-        {"$match": {"course_id": course_id}},
-        {"$group": {
-            "_id": "$question_id",
-            "attempt_count": {"$sum": 1},
-            "accepted_count": {
-                "$sum": {"$cond": [{"$eq": ["$verdict", "Accepted"]}, 1, 0]}
-            }
-        }},
-        {"$sort": {"attempt_count": -1}},
-        {"$limit": 10}
-    ]).to_list(length=10)
-    
-    # Enrich with question titles
+    # One snapshot document, kept current by the submission/enrollment write paths
+    snapshot = await get_course_analytics_snapshot(db, course_id)
+
+    # Most attempted questions, enriched with titles in one query
+    most_attempted = course_analytics_most_attempted(snapshot)
+    questions = await db.course_questions.find(
+        {"question_id": {"$in": [item["_id"] for item in most_attempted]}},
+        {"_id": 0, "question_id": 1, "title": 1, "difficulty": 1}
+    ).to_list(length=None)
+    question_by_id = {q["question_id"]: q for q in questions}
     for item in most_attempted:
-        question = await db.course_questions.find_one({"question_id": item["_id"]})
+        question = question_by_id.get(item["_id"])
         item["question_title"] = question.get("title") if question else "Unknown"
         item["difficulty"] = question.get("difficulty") if question else "unknown"
-    
-    # Get recent activity (last 7 days)
-    from datetime import timedelta
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    recent_enrollments = await db.course_enrollments.count_documents({
-        "course_id": course_id,
-        "enrolled_at": {"$gte": seven_days_ago}
-    })
-    
-    recent_submissions = await db.course_submissions.count_documents({
-        "course_id": course_id,
-        "submitted_at": {"$gte": seven_days_ago}
-    })
-    
+
+    activity = recent_activity(snapshot)
+    totals = snapshot.get("totals", {})
+
     return {
         "course_id": course_id,
         "course_title": course["title"],
-        "league_distribution": {item["_id"]: item["count"] for item in league_distribution},
+        "league_distribution": {k: v for k, v in snapshot.get("league_distribution", {}).items() if v > 0},
         "most_attempted_questions": most_attempted,
         "recent_activity": {
-            "new_enrollments_7d": recent_enrollments,
-            "submissions_7d": recent_submissions
+            "new_enrollments_7d": activity["new_enrollments"],
+            "submissions_7d": activity["submissions"]
         },
         "total_stats": {
-            "enrollments": await db.course_enrollments.count_documents({
-                "course_id": course_id,
-                "is_active": True
-            }),
-            "questions": await db.course_questions.count_documents({
-                "course_id": course_id,
-                "is_active": True
-            }),
-            "total_submissions": await db.course_submissions.count_documents({
-                "course_id": course_id
-            })
+            "enrollments": totals.get("enrollments", 0),
+            "questions": totals.get("questions", 0),
+            "total_submissions": totals.get("submissions", 0)
         }
     }
+
+
+@router.post("/course/{course_id}/instructor-analytics/rebuild")
+async def rebuild_course_analytics_endpoint(
+    course_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Recompute the analytics snapshot from raw enrollments and submissions (instructor only)
+    """
+    if not await verify_course_ownership(db, course_id, user_id):
+        raise HTTPException(status_code=403, detail="Not authorized to rebuild analytics")
+
+    snapshot = await rebuild_course_analytics(db, course_id)
+    return {"success": True, "course_id": course_id, "rebuilt_at": snapshot["rebuilt_at"]}
 # ==================== STUDENT COURSE DASHBOARD ====================
 
 @router.get("/course/{course_id}/dashboard")
@@ -1829,6 +1812,7 @@ async def create_question_endpoint(
         raise HTTPException(status_code=400, detail="Cannot add questions to active course")
     
     question_id = await create_question(db, question.dict())
+    await invalidate_lab_structure(question.course_id)
     return {
         "success": True,
         "question_id": question_id,
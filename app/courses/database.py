@@ -3,6 +3,8 @@ from datetime import datetime
 from typing import List, Optional, Dict, Any
 import uuid
 from app.courses.models import CourseType, CourseStatus, LeagueTier
+from app.courses import course_analytics
+from pymongo import ReturnDocument
 
 # ==================== COURSE CRUD ====================
 from bson import ObjectId
@@ -261,6 +263,7 @@ async def enroll_user(db: AsyncIOMotorDatabase, course_id: str, user_id: str, si
 
     await db.course_enrollments.insert_one(enrollment)
     await db.courses.update_one({"course_id": course_id}, {"$inc": {"stats.enrollments": 1}})
+    await course_analytics.record_enrollment(db, course_id, LeagueTier.BRONZE)
     return enrollment_id
 
 
@@ -302,6 +305,7 @@ async def enroll_in_lab(db: AsyncIOMotorDatabase, course_id: str, user_id: str,
 
     await db.course_enrollments.insert_one(enrollment)
     await db.courses.update_one({"course_id": course_id}, {"$inc": {"stats.enrollments": 1}})
+    await course_analytics.record_enrollment(db, course_id, LeagueTier.BRONZE)
     return enrollment_id
 
 
@@ -375,6 +379,7 @@ async def create_question(db: AsyncIOMotorDatabase, question_data: dict) -> str:
         raise ValueError(f"Unsupported language: {language}")
 
     await db.course_questions.insert_one(question)
+    await course_analytics.record_question_created(db, question["course_id"])
     return question_id
 
 
@@ -476,6 +481,7 @@ async def create_submission(db: AsyncIOMotorDatabase, submission_data: dict) ->
     }
     
     await db.course_submissions.insert_one(submission)
+    await course_analytics.record_submission(db, submission["course_id"], submission["question_id"])
     return submission_id
 
 async def update_submission_result(db: AsyncIOMotorDatabase, submission_id: str, result: dict) -> bool:
@@ -495,11 +501,20 @@ async def update_submission_result(db: AsyncIOMotorDatabase, submission_id: str,
     else:
         updates["score"] = 0.0
     
-    res = await db.course_submissions.update_one(
+    # Previous verdict lets the analytics snapshot count each Accepted once
+    before = await db.course_submissions.find_one_and_update(
         {"submission_id": submission_id},
-        {"$set": updates}
+        {"$set": updates},
+        projection={"course_id": 1, "question_id": 1, "verdict": 1},
+        return_document=ReturnDocument.BEFORE
     )
-    return res.modified_count > 0
+    if not before:
+        return False
+
+    await course_analytics.record_verdict_change(
+        db, before["course_id"], before["question_id"], before.get("verdict"), updates["verdict"]
+    )
+    return True
 
 async def get_submission(db: AsyncIOMotorDatabase, submission_id: str) -> Optional[dict]:
     """Get submission by ID"""
@@ -728,6 +743,10 @@ async def update_league_points(
             "avg_efficiency":      new_eff,   # alias for backward compat
         }}
     )
+    if league_up and enrollment.get("is_active", True):
+        await course_analytics.record_league_change(
+            db, enrollment.get("course_id"), old_league, new_league
+        )
 
     # Alumni promotion when LEGEND is reached
     is_legend = new_league == LeagueTier.LEGEND
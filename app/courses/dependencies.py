@@ -1,6 +1,7 @@
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.ai.client_bound_guard import verify_client_bound_request
+from app.system.identity import get_profile
 
 def get_db_instance():
     """Get database from main module"""
@@ -16,30 +17,17 @@ async def get_db() -> AsyncIOMotorDatabase:
 async def get_current_user_id(user: str = Depends(verify_client_bound_request)):
     """
     Extract user_id from authenticated request
-    user is the public_key from verify_client_bound_request
+    user is the token payload from verify_client_bound_request;
+    its subject IS the user identifier, so no lookup is needed
     """
-    # In your system, the public_key IS the user identifier
-    # You can fetch user details from DB if needed
-    db = get_db_instance()
-    user_id = user.get("sub")
-    user_record = await db.user_profiles.find_one({"user_id": user_id})
-    if user_record:
-        return user_record.get("user_id")
-    # Fallback: use public_key as user_id
-    return user_id
+    return user.get("sub")
 
-async def get_sidhi_id(user: str = Depends(verify_client_bound_request)):
+async def get_sidhi_id(request: Request, user: str = Depends(verify_client_bound_request)):
     """Extract sidhi_id from authenticated request"""
-    db = get_db_instance()
-    user_id = user.get("sub")
-    user_record = await db.user_profiles.find_one({"user_id": user_id})
-    if user_record:
-        return user_record.get("sidhi_id")
+    profile = await get_profile(get_db_instance(), user.get("sub"), request)
+    if profile:
+        return profile.get("sidhi_id")
     return None
-# app/courses/dependencies.py
-
-from fastapi import Depends, HTTPException
-from motor.motor_asyncio import AsyncIOMotorDatabase
 
 async def verify_enrollment(
     course_id: str,
@@ -59,4 +47,4 @@ async def verify_enrollment(
             detail="Not enrolled in this course. Please enroll first."
         )
     
-    return enrollment
\ No newline at end of file
+    return enrollment
@@ -0,0 +1,200 @@
+"""
+Lab progress engine (teacher lab views)
+
+A lab's structure - its modules in order and the active question ids in
+each - is loaded with two queries and cached per course in the
+`lab_progress` namespace. Anything that adds, edits or removes a lab
+module or question calls invalidate_lab_structure(course_id).
+
+Student progress is then pure set work: each enrollment's
+`solved_questions` is intersected with every module's question set, so
+a whole student x module matrix costs one enrollments query plus one
+`$in` profiles query, however many modules the lab has.
+
+The CSV export streams the same matrix in enrollment batches.
+"""
+
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncGenerator, Dict, Iterable, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.system.cache import get_cache
+
+LAB_STRUCTURE_TTL = int(os.getenv("LAB_STRUCTURE_TTL", "600"))  # seconds
+EXPORT_BATCH_SIZE = 200
+
+lab_progress_cache = get_cache("lab_progress")
+
+_ENROLLMENT_FIELDS = {
+    "_id": 0, "user_id": 1, "sidhi_id": 1, "enrolled_at": 1,
+    "solved_questions": 1, "completed_modules": 1,
+    "league_points": 1, "current_league": 1,
+}
+
+
+# ============================================================================
+# Course structure (cached)
+# ============================================================================
+
+async def _load_structure(db: AsyncIOMotorDatabase, course_id: str) -> Dict:
+    modules = await db.modules.find(
+        {"course_id": course_id},
+        {"_id": 0, "module_id": 1, "title": 1, "description": 1, "order": 1,
+         "unlock_at": 1, "close_at": 1, "resources": 1}
+    ).sort("order", 1).to_list(length=None)
+
+    questions = await db.course_questions.find(
+        {"course_id": course_id, "is_active": True},
+        {"_id": 0, "question_id": 1, "module_id": 1}
+    ).to_list(length=None)
+
+    by_module: Dict[str, set] = {}
+    for q in questions:
+        by_module.setdefault(q.get("module_id"), set()).add(q["question_id"])
+
+    return {
+        "modules": [
+            {
+                "module_id": m["module_id"],
+                "title": m.get("title"),
+                "description": m.get("description"),
+                "order": m.get("order"),
+                "unlock_at": m.get("unlock_at"),
+                "close_at": m.get("close_at"),
+                "resource_count": len(m.get("resources") or []),
+                "question_ids": by_module.get(m["module_id"], set()),
+            }
+            for m in modules
+        ],
+        # Every active question, including ones not attached to a module
+        "total_questions": len(questions),
+    }
+
+
+async def get_lab_structure(db: AsyncIOMotorDatabase, course_id: str) -> Dict:
+    """Ordered modules with their active question-id sets"""
+    return await lab_progress_cache.get_or_set(
+        course_id,
+        lambda: _load_structure(db, course_id),
+        LAB_STRUCTURE_TTL
+    )
+
+
+async def invalidate_lab_structure(course_id: str):
+    """Call after any module or question change in a course"""
+    await lab_progress_cache.delete(course_id)
+
+
+def module_schedule(module: Dict, now: datetime) -> Dict:
+    unlock_at = module.get("unlock_at")
+    close_at = module.get("close_at")
+    return {
+        "is_unlocked": (unlock_at is None) or (now >= unlock_at),
+        "is_closed": (close_at is not None) and (now > close_at),
+        "unlock_at": unlock_at.isoformat() if unlock_at else None,
+        "close_at": close_at.isoformat() if close_at else None,
+    }
+
+
+def solved_per_module(structure: Dict, solved_ids: Iterable[str]) -> List[int]:
+    """Solved count for each module, in module order"""
+    solved = solved_ids if isinstance(solved_ids, set) else set(solved_ids)
+    return [len(m["question_ids"] & solved) for m in structure["modules"]]
+
+
+# ============================================================================
+# Student x module matrix
+# ============================================================================
+
+async def _profiles_for(db: AsyncIOMotorDatabase, user_ids: List[str]) -> Dict[str, Dict]:
+    if not user_ids:
+        return {}
+    profiles = await db.users_profile.find(
+        {"user_id": {"$in": user_ids}},
+        {"_id": 0, "user_id": 1, "username": 1, "email_id": 1}
+    ).to_list(length=None)
+    return {p["user_id"]: p for p in profiles}
+
+
+def _student_row(enr: Dict, profile: Dict, structure: Dict) -> Dict:
+    solved = enr.get("solved_questions", [])
+    total = structure["total_questions"]
+    return {
+        "user_id": enr["user_id"],
+        "sidhi_id": enr.get("sidhi_id"),
+        "username": profile.get("username") if profile else "Unknown",
+        "email": profile.get("email_id") if profile else None,
+        "enrolled_at": enr.get("enrolled_at"),
+        "solved_count": len(solved),
+        "total_questions": total,
+        "progress_percentage": round((len(solved) / total * 100) if total > 0 else 0, 2),
+        "league_points": enr.get("league_points", 0),
+        "current_league": enr.get("current_league", "BRONZE"),
+        "module_solved": solved_per_module(structure, solved),
+    }
+
+
+async def get_progress_matrix(db: AsyncIOMotorDatabase, course_id: str) -> Dict:
+    """
+    Structure plus one row per active enrollment; each row's
+    `module_solved` lines up with structure["modules"].
+    """
+    structure = await get_lab_structure(db, course_id)
+    enrollments = await db.course_enrollments.find(
+        {"course_id": course_id, "is_active": True}, _ENROLLMENT_FIELDS
+    ).to_list(length=None)
+    profiles = await _profiles_for(db, [e["user_id"] for e in enrollments])
+
+    return {
+        "structure": structure,
+        "rows": [_student_row(e, profiles.get(e["user_id"]), structure) for e in enrollments],
+    }
+
+
+async def stream_progress_csv(db: AsyncIOMotorDatabase, course_id: str) -> AsyncGenerator[str, None]:
+    """
+    Stream the matrix as CSV: one row per student, one solved/total column
+    per module. Profiles are joined per enrollment batch.
+    """
+    structure = await get_lab_structure(db, course_id)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    writer.writerow(
+        ["sidhi_id", "username", "email", "solved", "total", "progress_percentage"]
+        + [f"{m['title']} ({len(m['question_ids'])})" for m in structure["modules"]]
+    )
+    yield flush()
+
+    async def emit(batch: List[Dict]) -> str:
+        profiles = await _profiles_for(db, [e["user_id"] for e in batch])
+        for enr in batch:
+            row = _student_row(enr, profiles.get(enr["user_id"]), structure)
+            writer.writerow(
+                [row["sidhi_id"] or "", row["username"], row["email"] or "",
+                 row["solved_count"], row["total_questions"], row["progress_percentage"]]
+                + row["module_solved"]
+            )
+        return flush()
+
+    batch: List[Dict] = []
+    cursor = db.course_enrollments.find(
+        {"course_id": course_id, "is_active": True}, _ENROLLMENT_FIELDS
+    ).batch_size(EXPORT_BATCH_SIZE)
+    async for enr in cursor:
+        batch.append(enr)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield await emit(batch)
+            batch = []
+    if batch:
+        yield await emit(batch)
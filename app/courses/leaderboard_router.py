@@ -4,8 +4,13 @@ from typing import List, Optional
 from app.courses.models import LeaderboardEntry, LeaderboardResponse
 
 from app.courses.dependencies import get_db,get_current_user_id
+from app.system.cache import get_cache
 router = APIRouter(tags=["Leaderboards"])
 
+# Leaderboards are read far more often than points change
+LEADERBOARD_TTL = 60  # seconds
+leaderboard_cache = get_cache("leaderboards")
+
 # ==================== LEADERBOARD QUERIES ====================
 
 def serialize_mongo(doc: dict) -> dict:
@@ -267,7 +272,11 @@ async def course_leaderboard(
             status_code=400,
             detail="Lab courses have a classroom-scoped leaderboard. Use GET /leaderboard/lab/{course_id}"
         )
-    entries = await get_course_leaderboard(db, course_id, skip, limit)
+    entries = await leaderboard_cache.get_or_set(
+        f"course:{course_id}:{skip}:{limit}",
+        lambda: get_course_leaderboard(db, course_id, skip, limit),
+        LEADERBOARD_TTL
+    )
     total = await db.course_enrollments.count_documents({"course_id": course_id, "is_active": True})
     
     return LeaderboardResponse(
@@ -285,7 +294,11 @@ async def global_leaderboard(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get global leaderboard (OFFICIAL courses only)"""
-    entries = await get_global_leaderboard(db, skip, limit)
+    entries = await leaderboard_cache.get_or_set(
+        f"global:{skip}:{limit}",
+        lambda: get_global_leaderboard(db, skip, limit),
+        LEADERBOARD_TTL
+    )
     
     return {
         "scope": "global",
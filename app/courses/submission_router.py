@@ -10,6 +10,8 @@ from app.courses.database import (
     get_question, get_enrollment, mark_question_solved, update_league_points
 )
 from app.courses.dependencies import get_db,get_current_user_id
+from app.system.rate_limit import rate_limit
+from app.system.health_router import get_breaker
 
 router = APIRouter( tags=["Submissions"])
 
@@ -98,6 +100,14 @@ def calculate_score_with_efficiency(result: dict, question: dict) -> dict:
 
 async def judge_software(submission_id: str, code: str, language: str, test_cases: list, db: AsyncIOMotorDatabase):
     """Submit to SOFTWARE judge service (Python, C, C++)"""
+    breaker = get_breaker("softjudge")
+    if not breaker.allow_request():
+        await update_submission_result(db, submission_id, {
+            "verdict": "System Error",
+            "error": "Judge service unavailable"
+        })
+        return
+
     try:
         async with httpx.AsyncClient() as client:
             # Submit to software judge
@@ -120,12 +130,14 @@ async def judge_software(submission_id: str, code: str, language: str, test_case
             )
             
             if response.status_code != 200:
+                breaker.record_failure()
                 await update_submission_result(db, submission_id, {
                     "verdict": "System Error",
                     "error": "Judge service unavailable"
                 })
                 return
             
+            breaker.record_success()
             judge_response = response.json()
             task_id = judge_response.get("task_id")
             
@@ -162,6 +174,12 @@ async def judge_software(submission_id: str, code: str, language: str, test_case
                 "error": "Evaluation timed out"
             })
             
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        await update_submission_result(db, submission_id, {
+            "verdict": "System Error",
+            "error": str(e)
+        })
     except Exception as e:
         await update_submission_result(db, submission_id, {
             "verdict": "System Error",
@@ -172,6 +190,14 @@ async def judge_software(submission_id: str, code: str, language: str, test_case
 
 async def judge_hardware(submission_id: str, code: str, language: str, problem_id: str, db: AsyncIOMotorDatabase):
     """Submit to HARDWARE judge service (Verilog, VHDL, SystemVerilog)"""
+    breaker = get_breaker("hardjudge")
+    if not breaker.allow_request():
+        await update_submission_result(db, submission_id, {
+            "verdict": "System Error",
+            "error": "HDL Judge service unavailable"
+        })
+        return
+
     try:
         async with httpx.AsyncClient() as client:
             # Hardware judge uses synchronous evaluation
@@ -187,12 +213,14 @@ async def judge_hardware(submission_id: str, code: str, language: str, problem_i
             )
             
             if response.status_code != 200:
+                breaker.record_failure()
                 await update_submission_result(db, submission_id, {
                     "verdict": "System Error",
                     "error": "HDL Judge service unavailable"
                 })
                 return
             
+            breaker.record_success()
             hdl_result = response.json()
             
             # Convert HDL judge response to standard format
@@ -219,6 +247,12 @@ async def judge_hardware(submission_id: str, code: str, language: str, problem_i
             
             await process_result(db, submission_id, result)
             
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        await update_submission_result(db, submission_id, {
+            "verdict": "System Error",
+            "error": str(e)
+        })
     except Exception as e:
         await update_submission_result(db, submission_id, {
             "verdict": "System Error",
@@ -455,7 +489,7 @@ async def judge_code(submission_id: str, code: str, language: str, question: dic
 
 # ==================== ENDPOINTS ====================
 
-@router.post("/run")
+@router.post("/run", dependencies=[Depends(rate_limit("judge:run", 20, 60, identity=get_current_user_id))])
 async def run_code(
     payload: dict,
     db: AsyncIOMotorDatabase = Depends(get_db),
@@ -591,7 +625,7 @@ async def run_code(
         return {"verdict": "System Error", "stdout": "", "stderr": str(e)}
 
 
-@router.post("/submit")
+@router.post("/submit", dependencies=[Depends(rate_limit("judge:submit", 10, 60, identity=get_current_user_id))])
 async def submit_solution(
     submission: SubmissionCreate,
     background_tasks: BackgroundTasks,
@@ -0,0 +1,503 @@
+"""
+Streaming ingestion for /sync/push
+
+The request body ({"sidhilynx_id", "college_roll", "files": {path: content}})
+is parsed as it arrives. Each file's content is decoded chunk by chunk
+straight into a temporary file while it is hashed, so no push is ever
+held in memory whole. Size and extension limits are enforced the moment
+they are crossed, not after the body has been read.
+
+Finished files land in a content-addressed staging store
+(<VAULT_STAGING_DIR>/<pid>/objects/ab/abcdef...). Identical content is
+stored once, and an object is removed when the last queued push that
+references it has been applied.
+
+Accepted pushes wait in a bounded PushQueue that holds only
+{path: (sha256, size)}. A student with a push already waiting has it
+replaced by the newer one (the vault mirrors the latest push anyway).
+Once VAULT_PUSH_QUEUE_SIZE students are waiting, new pushes get 429
+with Retry-After.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+MAX_PUSH_BYTES = 2 * 1024 * 1024                 # decoded file content per push
+MAX_BODY_BYTES = 4 * MAX_PUSH_BYTES              # raw JSON, escapes included
+MAX_FIELD_LENGTH = 4096                          # keys, ids, file paths
+MAX_DEPTH = 16
+PUSH_QUEUE_SIZE = int(os.getenv("VAULT_PUSH_QUEUE_SIZE", "64"))   # students waiting
+RETRY_AFTER_SECONDS = 5
+
+
+# ============================================================================
+# Incremental JSON
+# ============================================================================
+
+class JsonEventParser:
+    """
+    Push parser: feed() bytes as they arrive and get back events
+
+        ("map_start",) ("map_end",) ("array_start",) ("array_end",)
+        ("key", text) ("string", chunk, done) ("scalar", value)
+
+    Keys arrive whole (capped at MAX_FIELD_LENGTH); string values arrive
+    in chunks, the last one with done=True. Raises ValueError on
+    malformed input.
+    """
+
+    _STRING_RUN = re.compile(r'[^"\\\x00-\x1f]*')
+    _SCALAR = re.compile(r'[^\s,\]}]+')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._stack: List[str] = []
+        self._expect = "value"      # value | first_value | key | first_key | colon | comma_or_end | done
+        self._string: Optional[str] = None  # "key" / "value" while inside a string
+        self._key_parts: List[str] = []
+
+    def feed(self, data: bytes, final: bool = False) -> list:
+        self._buf += self._decoder.decode(data, final)
+        events = []
+        self._buf = self._buf[self._parse(events, final):]
+        if final and (self._expect != "done" or self._buf.strip()):
+            raise ValueError("Truncated JSON body")
+        return events
+
+    def _after_value(self):
+        self._expect = "comma_or_end" if self._stack else "done"
+
+    def _parse(self, events: list, final: bool) -> int:
+        buf, pos, n = self._buf, 0, len(self._buf)
+        while pos < n:
+            if self._string:
+                pos, complete = self._parse_string(buf, pos, events)
+                if not complete:
+                    return pos
+                continue
+
+            c = buf[pos]
+            if c in " \t\r\n":
+                pos += 1
+                continue
+
+            expect = self._expect
+            if expect == "done":
+                raise ValueError("Unexpected data after JSON body")
+
+            if expect == "colon":
+                if c != ":":
+                    raise ValueError("Expected ':'")
+                self._expect = "value"
+                pos += 1
+                continue
+
+            if expect == "comma_or_end":
+                top = self._stack[-1]
+                if c == ",":
+                    self._expect = "key" if top == "map" else "value"
+                elif (c == "}" and top == "map") or (c == "]" and top == "array"):
+                    self._stack.pop()
+                    events.append(("map_end",) if c == "}" else ("array_end",))
+                    self._after_value()
+                else:
+                    raise ValueError(f"Unexpected {c!r}")
+                pos += 1
+                continue
+
+            if expect in ("key", "first_key"):
+                if c == '"':
+                    self._string = "key"
+                elif c == "}" and expect == "first_key":
+                    self._stack.pop()
+                    events.append(("map_end",))
+                    self._after_value()
+                else:
+                    raise ValueError("Expected object key")
+                pos += 1
+                continue
+
+            # value / first_value
+            if c == "]" and expect == "first_value":
+                self._stack.pop()
+                events.append(("array_end",))
+                self._after_value()
+                pos += 1
+            elif c in "{[":
+                if len(self._stack) >= MAX_DEPTH:
+                    raise ValueError("JSON nested too deeply")
+                self._stack.append("map" if c == "{" else "array")
+                events.append(("map_start",) if c == "{" else ("array_start",))
+                self._expect = "first_key" if c == "{" else "first_value"
+                pos += 1
+            elif c == '"':
+                self._string = "value"
+                pos += 1
+            else:
+                match = self._SCALAR.match(buf, pos)
+                if match.end() == n and not final:
+                    return pos          # number may continue in the next chunk
+                events.append(("scalar", json.loads(match.group())))
+                self._after_value()
+                pos = match.end()
+        return pos
+
+    def _parse_string(self, buf: str, pos: int, events: list) -> Tuple[int, bool]:
+        """Consume string content from pos; (new pos, string finished)"""
+        n = len(buf)
+        parts = []
+        complete = False
+        while pos < n:
+            run = self._STRING_RUN.match(buf, pos)
+            if run.end() > pos:
+                parts.append(run.group())
+                pos = run.end()
+                continue
+
+            c = buf[pos]
+            if c == '"':
+                pos += 1
+                complete = True
+                break
+            if c != "\\":
+                raise ValueError("Control character in string")
+            if pos + 1 >= n:
+                break
+            escape = buf[pos + 1]
+            if escape in self._ESCAPES:
+                parts.append(self._ESCAPES[escape])
+                pos += 2
+                continue
+            if escape != "u":
+                raise ValueError(f"Invalid escape \\{escape}")
+            if pos + 6 > n:
+                break
+            code = int(buf[pos + 2:pos + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if pos + 12 > n:
+                    break
+                if buf[pos + 6:pos + 8] != "\\u":
+                    raise ValueError("Unpaired surrogate")
+                low = int(buf[pos + 8:pos + 12], 16)
+                if not 0xDC00 <= low < 0xE000:
+                    raise ValueError("Unpaired surrogate")
+                parts.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                pos += 12
+            elif 0xDC00 <= code < 0xE000:
+                raise ValueError("Unpaired surrogate")
+            else:
+                parts.append(chr(code))
+                pos += 6
+
+        text = "".join(parts)
+        if self._string == "key":
+            self._key_parts.append(text)
+            if sum(map(len, self._key_parts)) > MAX_FIELD_LENGTH:
+                raise ValueError("Object key too long")
+            if complete:
+                events.append(("key", "".join(self._key_parts)))
+                self._key_parts = []
+                self._expect = "colon"
+        elif text or complete:
+            events.append(("string", text, complete))
+            if complete:
+                self._after_value()
+        if complete:
+            self._string = None
+        return pos, complete
+
+
+# ============================================================================
+# Content-addressed staging
+# ============================================================================
+
+class StagedWriter:
+    """One file being spooled into staging while it is hashed"""
+
+    def __init__(self, tmp_dir: str):
+        fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def finish(self) -> str:
+        self._file.close()
+        return self._hash.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class StagingArea:
+    """
+    Objects keyed by sha256 with in-process reference counts. Each
+    worker process gets its own directory so counts never need sharing;
+    directories left by dead processes are removed on first use.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dir = os.path.join(root, str(os.getpid()))
+        self._refs: Dict[str, int] = {}
+        self._ready = False
+
+    def _ensure(self):
+        if self._ready:
+            return
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name.isdigit() and not _pid_alive(int(name)):
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        shutil.rmtree(self.dir, ignore_errors=True)   # pid reuse
+        os.makedirs(os.path.join(self.dir, "tmp"), exist_ok=True)
+        os.makedirs(os.path.join(self.dir, "objects"), exist_ok=True)
+        self._ready = True
+
+    def object_path(self, sha: str) -> str:
+        return os.path.join(self.dir, "objects", sha[:2], sha)
+
+    def open(self) -> StagedWriter:
+        self._ensure()
+        return StagedWriter(os.path.join(self.dir, "tmp"))
+
+    def store(self, writer: StagedWriter) -> str:
+        """Move a finished writer into the object store; returns its sha256"""
+        sha = writer.finish()
+        path = self.object_path(sha)
+        if sha in self._refs or os.path.exists(path):
+            os.remove(writer.tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(writer.tmp_path, path)
+        self._refs[sha] = self._refs.get(sha, 0) + 1
+        return sha
+
+    def release(self, shas):
+        for sha in shas:
+            count = self._refs.get(sha, 0) - 1
+            if count > 0:
+                self._refs[sha] = count
+                continue
+            self._refs.pop(sha, None)
+            try:
+                os.remove(self.object_path(sha))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {"objects": len(self._refs), "references": sum(self._refs.values())}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# ============================================================================
+# Ingestion
+# ============================================================================
+
+class StagedPush:
+    def __init__(self, staging: StagingArea):
+        self.staging = staging
+        self.sid_id = ""
+        self.college_roll = ""
+        self.files: Dict[str, Tuple[str, int]] = {}   # path -> (sha256, size)
+        self.total_bytes = 0
+
+    def release(self):
+        self.staging.release(sha for sha, _ in self.files.values())
+        self.files = {}
+
+
+async def ingest_push(
+    request: Request,
+    staging: StagingArea,
+    allowed_extensions,
+    path_check
+) -> StagedPush:
+    """
+    Stream the request body into staging. Raises 413 past MAX_PUSH_BYTES
+    of content, 400 for a disallowed extension, bad path or bad JSON.
+    `path_check(path)` normalizes a file path or raises ValueError.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Payload too large. Max 2MB allowed.")
+
+    push = StagedPush(staging)
+    parser = JsonEventParser()
+    depth = 0
+    top_key = None
+    in_files = False
+    path = None
+    writer: Optional[StagedWriter] = None
+    field_parts: List[str] = []
+    received = 0
+
+    def handle(event):
+        nonlocal depth, top_key, in_files, path, writer
+        kind = event[0]
+        if kind in ("map_start", "array_start"):
+            depth += 1
+            if in_files:
+                raise HTTPException(status_code=400, detail="files must map paths to text content")
+            if depth == 2 and top_key == "files":
+                if kind != "map_start":
+                    raise HTTPException(status_code=400, detail="files must map paths to text content")
+                in_files = True
+        elif kind in ("map_end", "array_end"):
+            depth -= 1
+            if depth == 1:
+                in_files = False
+        elif kind == "key":
+            if depth == 1:
+                top_key = event[1]
+                field_parts.clear()
+            elif in_files:
+                _, ext = os.path.splitext(event[1])
+                if ext.lower() not in allowed_extensions:
+                    raise HTTPException(status_code=400, detail=f"File type {ext} not allowed.")
+                try:
+                    path = path_check(event[1])
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                writer = staging.open()
+        elif kind == "string":
+            _, chunk, done = event
+            if in_files:
+                data = chunk.encode("utf-8")
+                push.total_bytes += len(data)
+                if push.total_bytes > MAX_PUSH_BYTES:
+                    raise HTTPException(status_code=413, detail="Payload too large. Max 2MB allowed.")
+                writer.write(data)
+                if done:
+                    sha = staging.store(writer)
+                    size = writer.size
+                    writer = None
+                    previous = push.files.get(path)
+                    if previous:
+                        staging.release([previous[0]])
+                    push.files[path] = (sha, size)
+            elif depth == 1 and top_key in ("sidhilynx_id", "college_roll"):
+                field_parts.append(chunk)
+                if sum(map(len, field_parts)) > MAX_FIELD_LENGTH:
+                    raise HTTPException(status_code=400, detail=f"{top_key} too long")
+                if done:
+                    setattr(push, "sid_id" if top_key == "sidhilynx_id" else "college_roll", "".join(field_parts).strip())
+        elif kind == "scalar" and in_files:
+            raise HTTPException(status_code=400, detail="files must map paths to text content")
+
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_BODY_BYTES:
+                raise HTTPException(status_code=413, detail="Payload too large. Max 2MB allowed.")
+            for event in parser.feed(chunk):
+                handle(event)
+        for event in parser.feed(b"", final=True):
+            handle(event)
+    except ValueError as e:
+        if writer:
+            writer.discard()
+        push.release()
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    except BaseException:
+        if writer:
+            writer.discard()
+        push.release()
+        raise
+    return push
+
+
+# ============================================================================
+# Bounded queue
+# ============================================================================
+
+class PushQueue:
+    """At most `maxsize` students waiting; a newer push replaces a waiting one"""
+
+    def __init__(self, vault_sync, staging: StagingArea, maxsize: int = PUSH_QUEUE_SIZE):
+        self.vault_sync = vault_sync
+        self.staging = staging
+        self.maxsize = maxsize
+        self._pending: Dict[str, StagedPush] = {}
+        self._order: asyncio.Queue = asyncio.Queue()
+        self.stats = {"accepted": 0, "replaced": 0, "rejected": 0, "applied": 0, "failed": 0}
+
+    def full(self) -> bool:
+        return len(self._pending) >= self.maxsize
+
+    def reject(self) -> HTTPException:
+        self.stats["rejected"] += 1
+        return HTTPException(
+            status_code=429,
+            detail="Cloud sync is busy, retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    def submit(self, push: StagedPush):
+        """Queue a push; raises 429 when full (the caller still owns `push` then)"""
+        waiting = self._pending.get(push.sid_id)
+        if waiting is not None:
+            waiting.release()
+            self._pending[push.sid_id] = push
+            self.stats["replaced"] += 1
+            return
+        if self.full():
+            raise self.reject()
+        self._pending[push.sid_id] = push
+        self._order.put_nowait(push.sid_id)
+        self.stats["accepted"] += 1
+
+    async def _apply_next(self):
+        sid_id = await self._order.get()
+        push = self._pending.pop(sid_id, None)
+        if push is None:
+            return
+        try:
+            await asyncio.to_thread(self.vault_sync.apply_staged, sid_id, push.files, self.staging.object_path)
+            self.stats["applied"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"[X] Git Critical Error: {e}")
+        finally:
+            push.release()
+
+    async def run(self):
+        """Background task: apply queued pushes in arrival order; drains on shutdown"""
+        try:
+            while True:
+                await self._apply_next()
+        except asyncio.CancelledError:
+            while not self._order.empty():
+                await self._apply_next()
+            raise
+
+    def metrics(self) -> dict:
+        return {"waiting": len(self._pending), "max": self.maxsize, **self.stats, "staging": self.staging.stats()}
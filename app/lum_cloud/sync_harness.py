@@ -0,0 +1,201 @@
+"""
+Vault sync harness against a local bare repository
+
+    python -m app.lum_cloud.sync_harness [--students 50] [--files 20] [--rounds 3]
+
+Creates a throwaway bare repo as `origin`, clones it as the server's vault
+checkout and runs VaultSync through:
+
+    1. an initial push per student (everything written)
+    2. repeat pushes where one file changes and one is dropped
+       (only those are touched; one commit per round for all students)
+    3. a commit pushed to origin from a second clone, so the next flush is
+       rejected and has to rebase before pushing
+
+and checks origin ends up with exactly the files of the last push. Then
+exercises the manifest-backed reads (listing, byte ranges, bundles) and
+the streaming /sync/push path (staging, queue coalescing, 413/429).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+
+from fastapi import HTTPException
+from git import Repo
+
+from app.lum_cloud.push_ingest import MAX_PUSH_BYTES, PushQueue, StagingArea, ingest_push
+from app.lum_cloud.vault_sync import VaultSync, manifest_etag, parse_byte_range, safe_relpath
+
+
+def _workspace(files: int, round_no: int) -> dict:
+    workspace = {f"src/task_{i}.py": f"# task {i}\nprint({i})\n" for i in range(files)}
+    workspace["src/task_0.py"] = f"# edited in round {round_no}\n"
+    if round_no:
+        workspace.pop(f"src/task_{files - 1}.py")
+    return workspace
+
+
+class FakeRequest:
+    """Just enough of starlette's Request for ingest_push"""
+
+    def __init__(self, body: bytes, chunk_size: int = 4096):
+        self.headers = {"content-length": str(len(body))}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._chunk_size):
+            yield self._body[i:i + self._chunk_size]
+
+
+async def _check_ingest(sync: VaultSync, staging_dir: str, sid: str):
+    staging = StagingArea(staging_dir)
+    queue = PushQueue(sync, staging, maxsize=1)
+    allowed = {".py"}
+
+    def body(files):
+        return json.dumps({"sidhilynx_id": sid, "college_roll": "R1", "files": files}).encode()
+
+    # Two pushes for the same student while the worker is idle: the second replaces the first
+    first = await ingest_push(FakeRequest(body({"a.py": "one\n", "same.py": "x\n"})), staging, allowed, safe_relpath)
+    queue.submit(first)
+    second = await ingest_push(FakeRequest(body({"a.py": "two\n", "b.py": "x\n"})), staging, allowed, safe_relpath)
+    queue.submit(second)
+    assert queue.stats["replaced"] == 1 and staging.stats() == {"objects": 2, "references": 2}, staging.stats()
+
+    other = await ingest_push(FakeRequest(body({"c.py": "c\n"})), staging, allowed, safe_relpath)
+    other.sid_id = "someone-else"
+    try:
+        queue.submit(other)
+        raise AssertionError("queue accepted past maxsize")
+    except HTTPException as e:
+        assert e.status_code == 429
+    other.release()
+
+    for files, status in (({"x.exe": "x"}, 400), ({"../up.py": "x"}, 400), ({"big.py": "x" * (MAX_PUSH_BYTES + 1)}, 413)):
+        try:
+            await ingest_push(FakeRequest(body(files)), staging, allowed, safe_relpath)
+            raise AssertionError(f"accepted {list(files)}")
+        except HTTPException as e:
+            assert e.status_code == status, (files, e.status_code)
+
+    await queue._apply_next()
+    folder = sync.student_dir(sid)
+    assert sorted(os.listdir(folder)) == ["a.py", "b.py"]
+    with open(os.path.join(folder, "a.py")) as f:
+        assert f.read() == "two\n"
+    assert staging.stats() == {"objects": 0, "references": 0}, staging.stats()
+    assert os.listdir(os.path.join(staging.dir, "tmp")) == []
+
+
+def _clone(origin: str, path: str) -> Repo:
+    repo = Repo.clone_from(origin, path)
+    with repo.config_writer() as cw:
+        cw.set_value("user", "name", "Lumetrics Engine")
+        cw.set_value("user", "email", "engine@lumetrics.ai")
+    return repo
+
+
+def run(students: int, files: int, rounds: int):
+    root = tempfile.mkdtemp(prefix="vault-harness-")
+    try:
+        origin = os.path.join(root, "origin.git")
+        Repo.init(origin, bare=True, initial_branch="main")
+
+        seed = _clone(origin, os.path.join(root, "seed"))
+        with open(os.path.join(seed.working_dir, "README.md"), "w") as f:
+            f.write("vault\n")
+        seed.index.add(["README.md"])
+        seed.index.commit("init")
+        seed.git.push("origin", "HEAD:main")
+
+        checkout = os.path.join(root, "vault_storage")
+        _clone(origin, checkout)
+        sync = VaultSync(checkout, branch="main")
+        ids = [f"S{n:04d}" for n in range(students)]
+
+        for round_no in range(rounds):
+            started = time.perf_counter()
+            totals = {"written": 0, "deleted": 0, "unchanged": 0}
+            for sid in ids:
+                for key, value in sync.apply_push(sid, _workspace(files, round_no)).items():
+                    totals[key] += value
+            applied = time.perf_counter() - started
+            sync.flush()
+            print(f"round {round_no}: {totals} applied in {applied * 1e3:.1f} ms, "
+                  f"flush {(time.perf_counter() - started - applied) * 1e3:.1f} ms")
+
+            expected_written = students * files if round_no == 0 else students
+            assert totals["written"] == expected_written, totals
+            assert totals["deleted"] == (students if round_no == 1 else 0), totals
+
+        # Identical push: nothing written, nothing to commit
+        before = sync.stats["commits"]
+        assert sync.apply_push(ids[0], _workspace(files, rounds - 1))["written"] == 0
+        sync.flush()
+        assert sync.stats["commits"] == before
+
+        # Concurrent writer on origin forces a rejected push + rebase
+        other = _clone(origin, os.path.join(root, "other"))
+        with open(os.path.join(other.working_dir, "NOTES.md"), "w") as f:
+            f.write("pushed elsewhere\n")
+        other.index.add(["NOTES.md"])
+        other.index.commit("external change")
+        other.git.push("origin", "HEAD:main")
+
+        sync.apply_push(ids[0], {"src/late.py": "print('late')\n"})
+        sync.flush()
+        assert sync.stats["rejected_pushes"] == 1, sync.stats
+        assert not sync.pending()
+
+        verify = _clone(origin, os.path.join(root, "verify"))
+        assert os.path.exists(os.path.join(verify.working_dir, "NOTES.md"))
+        first = os.path.join(verify.working_dir, "vault", f"user_{ids[0]}")
+        assert sorted(os.listdir(os.path.join(first, "src"))) == ["late.py"]
+        last = os.path.join(verify.working_dir, "vault", f"user_{ids[-1]}", "src")
+        assert sorted(os.listdir(last)) == sorted(os.path.basename(p) for p in _workspace(files, rounds - 1))
+
+        # Reads
+        manifest = sync.get_manifest(ids[-1])
+        etag = manifest_etag(manifest)
+        entry = manifest["files"]["src/task_1.py"]
+        assert sync.read_file(ids[-1], "src/task_1.py", parse_byte_range("bytes=2-5", entry["size"])) == b"task"
+        assert sync.read_file(ids[-1], "src/task_1.py", parse_byte_range("bytes=-2", entry["size"])) == b")\n"
+        sync.apply_push(ids[-1], {**_workspace(files, rounds - 1), "src/extra.py": "pass\n"})
+        changed = sync.get_manifest(ids[-1])
+        assert manifest_etag(changed) != etag
+        since = manifest["updated_at"]
+        fresh = [p for p, e in changed["files"].items() if e["updated_at"] > since]
+        with tarfile.open(fileobj=sync.build_bundle(ids[-1], fresh), mode="r:gz") as tar:
+            assert tar.getnames() == ["src/extra.py"], tar.getnames()
+        sync.flush()
+
+        # Streaming push ingestion
+        asyncio.run(_check_ingest(sync, os.path.join(root, "staging"), "STREAMED"))
+        sync.flush()
+
+        commits = int(verify.git.rev_list("--count", "HEAD"))
+        print(f"origin: {commits} commits for {students} students x {rounds + 1} pushes")
+        print(f"stats: {sync.stats}")
+        print("OK")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    run(args.students, args.files, max(2, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Incremental cloud vault sync
+
+Every terminal push carries a student's full workspace. Instead of wiping
+and rewriting the student's folder, each push is diffed against a
+per-student manifest of content hashes:
+
+    manifests/user_{sid}.json   {"files": {path: {sha256, size, updated_at}}, "updated_at"}
+
+Only new or changed files are written (atomically) and files missing from
+the push are deleted. The student is then marked dirty; a single
+committer task turns all dirty students into one commit every
+VAULT_COMMIT_INTERVAL seconds and pushes it. The remote is only pulled
+(rebase, local side wins) when a push is rejected; other push failures
+leave the commit in place for the next round.
+
+A repo directory is owned by one VaultSync per process; an flock on the
+.git directory keeps several workers sharing the same checkout apart.
+
+Reads are served from the manifest as well: listings page through it,
+single files carry their sha256 as ETag (with byte ranges), and bundles
+pack only the files updated since a given time.
+
+    python -m app.lum_cloud.sync_harness    # end-to-end run against a local bare repo
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from git import GitCommandError, Repo
+
+try:
+    import fcntl
+except ImportError:  # not on Windows dev machines
+    fcntl = None
+
+COMMIT_INTERVAL = float(os.getenv("VAULT_COMMIT_INTERVAL", "5"))  # seconds
+PUSH_ATTEMPTS = 3
+MESSAGE_MAX_IDS = 5
+
+VAULT_DIR = "vault"
+MANIFEST_DIR = "manifests"
+BUNDLE_SPOOL_BYTES = 8 * 1024 * 1024
+
+# sid_ids become folder and file names - nothing that can spell a path
+SID_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+
+def safe_sid_id(sid_id: str) -> str:
+    """sid_id usable as a vault folder name; ValueError otherwise"""
+    if not isinstance(sid_id, str) or not re.fullmatch(SID_ID_PATTERN, sid_id):
+        raise ValueError(f"Invalid sid_id: {sid_id!r}")
+    return sid_id
+
+
+def safe_relpath(file_path: str) -> str:
+    """Normalized path inside a student folder; ValueError if it escapes"""
+    path = os.path.normpath(file_path.replace("\\", "/")).lstrip("/" + os.sep)
+    if not path or path == "." or path == ".." or path.startswith(".." + os.sep):
+        raise ValueError(f"Invalid file path: {file_path}")
+    return path
+
+
+def manifest_etag(manifest: Dict) -> str:
+    """Changes whenever any file in the vault changes"""
+    listing = sorted((path, entry["sha256"]) for path, entry in manifest.get("files", {}).items())
+    return hashlib.sha256(json.dumps(listing).encode("utf-8")).hexdigest()[:32]
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single-range `bytes=` header, None when
+    there is no usable header; ValueError when the range is unsatisfiable
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+class VaultSync:
+    def __init__(self, repo_dir: str, branch: Optional[str] = None):
+        self.repo_dir = repo_dir
+        self.branch = branch
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._unpushed = False
+        self.stats = {"pushes": 0, "written": 0, "deleted": 0, "unchanged": 0,
+                      "commits": 0, "rejected_pushes": 0, "failed_pushes": 0}
+
+    # ------------------------------------------------------------------
+    # Paths and locking
+    # ------------------------------------------------------------------
+
+    def _inside(self, base: str, name: str) -> str:
+        """repo_dir/base/name, refusing anything that resolves outside base"""
+        root = os.path.realpath(os.path.join(self.repo_dir, base))
+        path = os.path.join(self.repo_dir, base, name)
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            raise ValueError(f"Path escapes {base}/: {name}")
+        return path
+
+    def student_dir(self, sid_id: str) -> str:
+        return self._inside(VAULT_DIR, f"user_{safe_sid_id(sid_id)}")
+
+    def manifest_path(self, sid_id: str) -> str:
+        return self._inside(MANIFEST_DIR, f"user_{safe_sid_id(sid_id)}.json")
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.repo_dir, ".git", "vault-sync.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Manifests
+    # ------------------------------------------------------------------
+
+    def load_manifest(self, sid_id: str) -> Dict:
+        """Stored manifest, or one built from disk for folders synced before manifests existed"""
+        try:
+            with open(self.manifest_path(sid_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+
+        files = {}
+        folder = self.student_dir(sid_id)
+        for root, _, names in os.walk(folder):
+            for name in names:
+                full_path = os.path.join(root, name)
+                with open(full_path, "rb") as f:
+                    data = f.read()
+                stat = os.stat(full_path)
+                files[os.path.relpath(full_path, folder)] = {
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                    "size": len(data),
+                    "updated_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+                }
+        return {"files": files, "updated_at": None}
+
+    def _save_manifest(self, sid_id: str, manifest: Dict):
+        path = self.manifest_path(sid_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def get_manifest(self, sid_id: str) -> Dict:
+        """Manifest for reads; a legacy folder's manifest is built once and stored"""
+        if os.path.exists(self.manifest_path(sid_id)) or not os.path.isdir(self.student_dir(sid_id)):
+            return self.load_manifest(sid_id)
+        with self._locked():
+            manifest = self.load_manifest(sid_id)
+            if not os.path.exists(self.manifest_path(sid_id)):
+                manifest["updated_at"] = datetime.utcnow().isoformat()
+                self._save_manifest(sid_id, manifest)
+                self._dirty.add(sid_id)
+        return manifest
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def read_file(self, sid_id: str, path: str, byte_range: Optional[Tuple[int, int]] = None) -> bytes:
+        full_path = os.path.join(self.student_dir(sid_id), safe_relpath(path))
+        with open(full_path, "rb") as f:
+            if byte_range is None:
+                return f.read()
+            start, end = byte_range
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def read_page(self, sid_id: str, paths: List[str]) -> Dict[str, str]:
+        """Text contents for the given manifest paths (unreadable files skipped)"""
+        contents = {}
+        for path in paths:
+            try:
+                contents[path] = self.read_file(sid_id, path).decode("utf-8")
+            except (OSError, UnicodeDecodeError, ValueError):
+                continue
+        return contents
+
+    def build_bundle(self, sid_id: str, paths: List[str]):
+        """gzip'd tar of `paths`, spooled to disk past BUNDLE_SPOOL_BYTES; rewound"""
+        folder = self.student_dir(sid_id)
+        spool = tempfile.SpooledTemporaryFile(max_size=BUNDLE_SPOOL_BYTES)
+        with tarfile.open(fileobj=spool, mode="w:gz") as tar:
+            for path in paths:
+                full_path = os.path.join(folder, safe_relpath(path))
+                if os.path.isfile(full_path):
+                    tar.add(full_path, arcname=path)
+        spool.seek(0)
+        return spool
+
+    # ------------------------------------------------------------------
+    # Apply a push to the working tree
+    # ------------------------------------------------------------------
+
+    def apply_push(self, sid_id: str, files: Dict[str, str]) -> Dict[str, int]:
+        """
+        Make the student's folder match `files`, touching only what changed.
+        Returns counts of written / deleted / unchanged files.
+        """
+        encoded = {safe_relpath(path): content.encode("utf-8") for path, content in files.items()}
+
+        def write(path: str, tmp_path: str):
+            with open(tmp_path, "wb") as f:
+                f.write(encoded[path])
+
+        incoming = {path: (hashlib.sha256(data).hexdigest(), len(data)) for path, data in encoded.items()}
+        return self._apply(sid_id, incoming, write)
+
+    def apply_staged(
+        self,
+        sid_id: str,
+        files: Dict[str, Tuple[str, int]],
+        object_path: Callable[[str], str]
+    ) -> Dict[str, int]:
+        """apply_push for content already hashed into a staging store: {path: (sha256, size)}"""
+        incoming = {safe_relpath(path): entry for path, entry in files.items()}
+
+        def write(path: str, tmp_path: str):
+            shutil.copyfile(object_path(incoming[path][0]), tmp_path)
+
+        return self._apply(sid_id, incoming, write)
+
+    def _apply(
+        self,
+        sid_id: str,
+        incoming: Dict[str, Tuple[str, int]],
+        write: Callable[[str, str], None]
+    ) -> Dict[str, int]:
+        folder = self.student_dir(sid_id)
+        now = datetime.utcnow().isoformat()
+
+        with self._locked():
+            manifest = self.load_manifest(sid_id)
+            known = manifest.get("files", {})
+            entries = {}
+            written = unchanged = 0
+
+            for path, (digest, size) in incoming.items():
+                previous = known.get(path)
+                full_path = os.path.join(folder, path)
+                if previous and previous["sha256"] == digest and os.path.exists(full_path):
+                    entries[path] = previous
+                    unchanged += 1
+                    continue
+
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                tmp_path = f"{full_path}.sync-tmp"
+                write(path, tmp_path)
+                os.replace(tmp_path, full_path)
+                entries[path] = {"sha256": digest, "size": size, "updated_at": now}
+                written += 1
+
+            removed = [path for path in known if path not in incoming]
+            for path in removed:
+                self._remove(folder, path)
+
+            if written or removed or not os.path.exists(self.manifest_path(sid_id)):
+                self._save_manifest(sid_id, {"files": entries, "updated_at": now})
+                self._dirty.add(sid_id)
+
+        self.stats["pushes"] += 1
+        self.stats["written"] += written
+        self.stats["deleted"] += len(removed)
+        self.stats["unchanged"] += unchanged
+        return {"written": written, "deleted": len(removed), "unchanged": unchanged}
+
+    @staticmethod
+    def _remove(folder: str, path: str):
+        full_path = os.path.join(folder, path)
+        try:
+            os.remove(full_path)
+        except FileNotFoundError:
+            return
+        # Prune directories emptied by the delete, up to the student folder
+        parent = os.path.dirname(full_path)
+        while parent != folder and parent.startswith(folder):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+    # ------------------------------------------------------------------
+    # Batched commit + push
+    # ------------------------------------------------------------------
+
+    def pending(self) -> bool:
+        return bool(self._dirty) or self._unpushed
+
+    def flush(self) -> Optional[str]:
+        """Commit every dirty student in one commit and push; returns the commit sha"""
+        sha = None
+        repo = Repo(self.repo_dir)
+
+        with self._locked():
+            batch = sorted(self._dirty)
+            self._dirty.clear()
+            paths = [p for p in (VAULT_DIR, MANIFEST_DIR) if os.path.exists(os.path.join(self.repo_dir, p))]
+            if paths:
+                repo.git.add("--all", "--", *paths)
+            if repo.is_dirty(untracked_files=True):
+                sha = repo.index.commit(self._commit_message(batch)).hexsha
+                self.stats["commits"] += 1
+                self._unpushed = True
+
+        if self._unpushed:
+            self._push(repo)
+        return sha
+
+    @staticmethod
+    def _commit_message(batch) -> str:
+        if not batch:
+            return "Sync: vault"
+        if len(batch) <= MESSAGE_MAX_IDS:
+            return f"Sync: {', '.join(batch)}"
+        return f"Sync: {len(batch)} students ({', '.join(batch[:MESSAGE_MAX_IDS])}, ...)"
+
+    def _push(self, repo: Repo):
+        branch = self.branch or repo.active_branch.name
+        for _ in range(PUSH_ATTEMPTS):
+            try:
+                repo.git.push("origin", f"HEAD:{branch}")
+                self._unpushed = False
+                return
+            except GitCommandError as e:
+                if "rejected" not in str(e) and "fetch first" not in str(e):
+                    # Network/auth trouble: keep the commit, retry next round
+                    self.stats["failed_pushes"] += 1
+                    print(f"[X] Vault push failed: {e}")
+                    return
+                self.stats["rejected_pushes"] += 1
+
+            # Someone else pushed first: replay our commits on top, ours win on conflict
+            with self._locked():
+                try:
+                    repo.git.pull("--rebase", "--autostash", "--strategy-option=theirs", "origin", branch)
+                except GitCommandError as e:
+                    print(f"[X] Vault rebase failed: {e}")
+                    try:
+                        repo.git.rebase("--abort")
+                    except GitCommandError:
+                        pass
+                    return
+        print("[X] Vault push still rejected after retries")
+
+    async def run(self, interval: float = COMMIT_INTERVAL):
+        """Background task: flush every `interval` seconds, and once more on shutdown"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if self.pending():
+                    try:
+                        await asyncio.to_thread(self.flush)
+                    except Exception as e:
+                        print(f"[X] Git Critical Error: {e}")
+        except asyncio.CancelledError:
+            if self.pending():
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    print(f"[X] Git Critical Error: {e}")
+            raise
@@ -1,26 +1,30 @@
 from datetime import datetime
 from fastapi import FastAPI, BackgroundTasks, Request, HTTPException, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from app.ai.router import router as ai_router
 from app.chat.router import router as chat_router
 from app.stream.router import router as stream_router
 from app.api.auth_proxy import router as auth_router
 from app.courses.ai_doubt_solver import router as ai_doubt_router
-from app.lum_cloud.sync_server import commit_to_github, setup_repo 
+from app.lum_cloud.sync_server import setup_repo, run_vault_committer, run_push_worker, vault_sync, push_queue, push_staging
+from app.lum_cloud.push_ingest import ingest_push
+from app.lum_cloud.vault_sync import SID_ID_PATTERN, safe_relpath, safe_sid_id, manifest_etag, parse_byte_range
 from nacl.signing import VerifyKey
-from app.ai.payment_router import router as payment_router, create_payment_indexes
+from app.ai.payment_router import router as payment_router, create_payment_indexes, close_payment_gateway
 import binascii
-from app.lum_cloud.sync_server import LOCAL_REPO_DIR
 import os
 from app.ai.client_bound_guard import verify_client_bound_request
-from fastapi import Query
+from app.system.identity import invalidate_profile, profile_search_fields
+from fastapi import Path, Query
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 from app.ai.quota_manager import get_user_quotas, get_user_history, log_cloud_push, get_cloud_history, create_order, get_user_orders
 from app.ai.bot_services import generate_bot_response
-from app.admin.router import router as admin_router
+from app.admin.router import router as admin_router, create_admin_indexes
 from app.admin.superadmin_router import router as superadmin_router
-from app.admin.hardened_firebase_auth import init_auth
+from app.admin.hardened_firebase_auth import get_current_admin, init_auth
 from app.ai.training_router import router as training_router
 from app.ai.coding_practice import router as coding_router
 from app.plagiarism.plagiarism_router import router as plag_router
@@ -58,7 +62,11 @@ from app.courses.dashbord_router import router as dashboard_router
 from app.editor_security.app_services_session import SessionService
 from app.editor_security.app_services_integrity import IntegrityAnalyzerService
 from app.editor_security.app_routes_security import router as security_router
-from app.system.health_router import monitor_heartbeat
+from app.system.health_router import monitor_heartbeat, router as health_router
+from app.system.cache import run_invalidation_listener
+from app.system.pubsub import run_backplane_listener
+from app.admin.analytics_rollups import run_rollup_compactor, create_rollup_indexes
+from app.system import notifications as notification_inbox
 import asyncio  # Required for create_task and sleep
 import httpx    # Required for the async server pings
 from app.courses.lab_record_router import router as lab_record_router
@@ -97,6 +105,9 @@ async def lifespan(app: FastAPI):
     init_auth()
     setup_repo()
     await create_payment_indexes()
+    await create_admin_indexes()
+    await create_rollup_indexes(db)
+    await notification_inbox.create_notification_indexes(db)
     await create_teacher_indexes()
     await create_student_indexes()
     await create_claim_indexes(db)
@@ -105,6 +116,9 @@ async def lifespan(app: FastAPI):
     await db.enquiries.create_index([("type", 1), ("status", 1)])
     await db.enquiries.create_index([("submitted_at", -1)])
     await db.enquiries.create_index([("email", 1)])
+    # Superadmin overview: pending count + newest-pending preview
+    await db.enquiries.create_index([("status", 1), ("submitted_at", -1)])
+    await db.help_tickets.create_index([("status", 1)])
     # Course system must register before routes
     await startup_course_system()
     
@@ -125,7 +139,20 @@ async def lifespan(app: FastAPI):
     # Start the heartbeat pinger in the background
     # Line 105 - Pass the global 'db' object defined earlier in main.py
     monitor_task = asyncio.create_task(monitor_heartbeat(db))
-    print("💓 System Health Heartbeat Started (5m interval)")
+    print("💓 System Health Heartbeat Started")
+
+    # Drop local cache entries changed by other workers (no-op without a shared backend)
+    cache_listener_task = asyncio.create_task(run_invalidation_listener())
+
+    # Keep admin analytics rollups fresh (one worker, via a Mongo lease)
+    rollup_task = asyncio.create_task(run_rollup_compactor(db))
+
+    # Chat/stream messages from other workers (PUBSUB_BACKEND)
+    pubsub_task = asyncio.create_task(run_backplane_listener())
+
+    # /sync/push: apply queued pushes, then batched vault commits (VAULT_COMMIT_INTERVAL)
+    push_task = asyncio.create_task(run_push_worker())
+    vault_task = asyncio.create_task(run_vault_committer())
 
     yield # Server stays alive and serves requests
 
@@ -137,6 +164,15 @@ async def lifespan(app: FastAPI):
         pass
     print("🛑 Health Monitor Stopped")
 
+    for task in (cache_listener_task, rollup_task, pubsub_task, push_task, vault_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    await close_payment_gateway()
+
 # Apply the lifespan to your app
 app = FastAPI(title="Lumetrics AI Engine", lifespan=lifespan)  # ← Then initialize system
 
@@ -178,6 +214,7 @@ app.include_router(auth_router)
 app.include_router(admin_router,prefix="/admin")
 app.include_router(superadmin_router, prefix="/superadmin")
 app.include_router(stream_router)
+app.include_router(health_router)
 app.include_router(plag_router, prefix="/plagiarism")
 app.include_router(coding_router, prefix="/coding")
 app.include_router(training_router, prefix="/training")
@@ -208,7 +245,10 @@ class ApprovalRequest(BaseModel):
 
 
 @app.get("/sync/cloudaccess/{sid_id}")
-async def cloud_access(sid_id: str, user: str = Depends(verify_client_bound_request)):
+async def cloud_access(
+    sid_id: str = Path(..., pattern=SID_ID_PATTERN),
+    user: str = Depends(verify_client_bound_request)
+):
     try:
         user_record = await db.users.find_one({"sid_id": sid_id})
         
@@ -220,8 +260,8 @@ async def cloud_access(sid_id: str, user: str = Depends(verify_client_bound_requ
                 "message": "User not registered"
             }
 
-        student_folder = os.path.join(LOCAL_REPO_DIR, "vault", f"user_{sid_id}")
-        files_on_disk = os.path.exists(student_folder) and any(os.scandir(student_folder))
+        manifest = await asyncio.to_thread(vault_sync.get_manifest, sid_id)
+        files_on_disk = bool(manifest["files"])
         
         return {
             "status": "success",
@@ -243,7 +283,7 @@ async def cloud_access(sid_id: str, user: str = Depends(verify_client_bound_requ
 async def cloud_approve(data: ApprovalRequest, user: str = Depends(verify_client_bound_request)):
     try:
         # ✅ SANITIZE ALL INPUTS
-        sid_id = data.sid_id.strip()
+        sid_id = safe_sid_id(data.sid_id.strip())
         college_roll = data.college_roll.strip()
         username = data.username.strip()
         
@@ -263,6 +303,8 @@ async def cloud_approve(data: ApprovalRequest, user: str = Depends(verify_client
             "status": "success", 
             "message": f"User {college_roll} approved and linked to {sid_id}"
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -275,69 +317,97 @@ async def student_push(
     background_tasks: BackgroundTasks,
     authenticated_pk: str = Depends(verify_signature) 
 ):
+    # Backpressure before reading a byte of the body
+    if push_queue.full():
+        raise push_queue.reject()
+
+    # Streams into staging; size (413), extension and path (400) are checked on the fly
+    push = await ingest_push(request, push_staging, ALLOWED_EXTENSIONS, safe_relpath)
     try:
-        data = await request.json()
-        sid_id = data.get("sidhilynx_id", "").strip()  # ✅ ADD .strip()
-        roll_no = data.get("college_roll", "").strip()  # ✅ ADD .strip()
-        files = data.get("files", {})
-        
-        # Payload size validation
-        total_payload_size = sum(len(content.encode('utf-8')) for content in files.values())
-        if total_payload_size > 2 * 1024 * 1024:
-            raise HTTPException(status_code=413, detail="Payload too large. Max 2MB allowed.")
-
-        # Extension security check
-        for filename in files.keys():
-            _, ext = os.path.splitext(filename)
-            if ext.lower() not in ALLOWED_EXTENSIONS:
-                raise HTTPException(status_code=400, detail=f"File type {ext} not allowed.")
-            
+        sid_id = push.sid_id
+        roll_no = push.college_roll
+
         # Identity verification
         user_record = await db.users.find_one({"college_roll": roll_no})
         
         if not user_record or user_record.get("sid_id", "").strip() != sid_id:  # ✅ ADD .strip()
             raise HTTPException(status_code=403, detail="Identity Mismatch: Terminal user not linked to Sidhi ID")
 
-        if not sid_id or not files:
+        if not sid_id or not push.files:
+            push.release()
             return {"status": "error", "message": "Missing payload"}
+        try:
+            safe_sid_id(sid_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        push_queue.submit(push)   # 429 when full
 
         # Background tasks
         background_tasks.add_task(log_cloud_push, sid_id)
-        background_tasks.add_task(commit_to_github, sid_id, files)
         
         return {"status": "success", "message": "Cloud sync initiated"}
     except HTTPException:
+        push.release()
         raise 
     except Exception as e:
+        push.release()
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.get("/sync/push/metrics")
+async def push_metrics(admin: dict = Depends(get_current_admin)):
+    """Push queue depth, rejections and staging usage"""
+    return {**push_queue.metrics(), "vault": vault_sync.stats}
+
+
+VAULT_PAGE_MAX = 1000
+
+
+def _vault_page(manifest: dict, offset: int, limit: int):
+    paths = sorted(manifest["files"])
+    page = paths[offset:offset + limit]
+    next_offset = offset + len(page) if offset + len(page) < len(paths) else None
+    return paths, page, next_offset
+
+
 @app.get("/sync/cloudview")
 async def cloud_view(
-    sid_id: str = Query(...),
+    sid_id: str = Query(..., pattern=SID_ID_PATTERN),
+    offset: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=VAULT_PAGE_MAX),
     user: str = Depends(verify_client_bound_request)
 ):
+    """
+    File contents of the whole vault. Paging is opt-in: with offset and/or
+    limit (default 500) one page of the manifest is returned, with
+    next_offset None on the last page.
+    """
     try:
-        student_folder = os.path.join(LOCAL_REPO_DIR, "vault", f"user_{sid_id}")
-
-        if not os.path.exists(student_folder):
+        manifest = await asyncio.to_thread(vault_sync.get_manifest, sid_id)
+        if not manifest["files"]:
             return {"status": "success", "files": {}, "message": "Vault is currently empty"}
 
-        vault_contents = {}
-        for root, _, files in os.walk(student_folder):
-            for filename in files:
-                full_path = os.path.join(root, filename)
-                relative_path = os.path.relpath(full_path, student_folder)
-                
-                try:
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        vault_contents[relative_path] = f.read()
-                except Exception:
-                    continue
+        if offset is None and limit is None:
+            vault_contents = await asyncio.to_thread(vault_sync.read_page, sid_id, sorted(manifest["files"]))
+            return {
+                "status": "success",
+                "sidhilynx_id": sid_id,
+                "files": vault_contents
+            }
+
+        offset, limit = offset or 0, limit or 500
+        paths, page, next_offset = _vault_page(manifest, offset, limit)
+        vault_contents = await asyncio.to_thread(vault_sync.read_page, sid_id, page)
 
         return {
             "status": "success",
             "sidhilynx_id": sid_id,
-            "files": vault_contents
+            "files": vault_contents,
+            "total": len(paths),
+            "offset": offset,
+            "next_offset": next_offset,
+            "manifest_etag": manifest_etag(manifest)
         }
 
     except HTTPException:
@@ -346,6 +416,113 @@ async def cloud_view(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/sync/cloudview/manifest")
+async def cloud_view_manifest(
+    request: Request,
+    sid_id: str = Query(..., pattern=SID_ID_PATTERN),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(VAULT_PAGE_MAX, ge=1, le=VAULT_PAGE_MAX),
+    user: str = Depends(verify_client_bound_request)
+):
+    """Path, size, sha256 and updated_at per file; compare hashes to fetch only what changed"""
+    manifest = await asyncio.to_thread(vault_sync.get_manifest, sid_id)
+    etag = f'"{manifest_etag(manifest)}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    paths, page, next_offset = _vault_page(manifest, offset, limit)
+    body = {
+        "status": "success",
+        "sidhilynx_id": sid_id,
+        "files": [{"path": path, **manifest["files"][path]} for path in page],
+        "total": len(paths),
+        "offset": offset,
+        "next_offset": next_offset,
+        "updated_at": manifest.get("updated_at")
+    }
+    return JSONResponse(content=body, headers={"ETag": etag})
+
+
+@app.get("/sync/cloudview/file")
+async def cloud_view_file(
+    request: Request,
+    sid_id: str = Query(..., pattern=SID_ID_PATTERN),
+    path: str = Query(...),
+    user: str = Depends(verify_client_bound_request)
+):
+    """One file; ETag is its sha256, single byte ranges are honoured"""
+    try:
+        path = safe_relpath(path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    manifest = await asyncio.to_thread(vault_sync.get_manifest, sid_id)
+    entry = manifest["files"].get(path)
+    if not entry:
+        raise HTTPException(status_code=404, detail="File not found in vault")
+
+    etag = f'"{entry["sha256"]}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    size = entry["size"]
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    try:
+        content = await asyncio.to_thread(vault_sync.read_file, sid_id, path, byte_range)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found in vault")
+
+    if byte_range is None:
+        return Response(content=content, media_type="text/plain; charset=utf-8", headers=headers)
+    start, end = byte_range
+    return Response(
+        content=content,
+        status_code=206,
+        media_type="text/plain; charset=utf-8",
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+    )
+
+
+@app.get("/sync/cloudview/bundle")
+async def cloud_view_bundle(
+    sid_id: str = Query(..., pattern=SID_ID_PATTERN),
+    since: str = Query(None, description="ISO timestamp; only files updated after it"),
+    user: str = Depends(verify_client_bound_request)
+):
+    """Whole vault (or what changed since `since`) as a .tar.gz"""
+    manifest = await asyncio.to_thread(vault_sync.get_manifest, sid_id)
+    paths = sorted(
+        path for path, entry in manifest["files"].items()
+        if not since or entry.get("updated_at", "") > since
+    )
+    bundle = await asyncio.to_thread(vault_sync.build_bundle, sid_id, paths)
+
+    def iter_bundle():
+        try:
+            while chunk := bundle.read(64 * 1024):
+                yield chunk
+        finally:
+            bundle.close()
+
+    return StreamingResponse(
+        iter_bundle(),
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="vault_{sid_id}.tar.gz"',
+            "X-Vault-Files": str(len(paths)),
+            "X-Manifest-ETag": manifest_etag(manifest)
+        }
+    )
+
+
 @app.get("/version")
 def get_version():
     return {"version": VERSION or "unknown", "status": "stable"}
@@ -444,6 +621,7 @@ async def accept_terms_and_conditions(
                 }
             }
         )
+        await invalidate_profile(user_id)
 
         return {
             "status": "success",
@@ -463,6 +641,7 @@ async def register_user_details(data: UserDetailCreate, user: str = Depends(veri
             )
 
         user_data = data.model_dump()
+        user_data.update(profile_search_fields(user_data))
         
         if user_data.get("is_teacher"):
             user_data["role"] = "teacher"
@@ -470,6 +649,7 @@ async def register_user_details(data: UserDetailCreate, user: str = Depends(veri
             user_data["role"] = "student"
 
         await db.users_profile.insert_one(user_data)
+        await invalidate_profile(data.user_id)
 
         return {
             "status": "success",
@@ -623,48 +803,37 @@ async def get_notifications(
 ):
     try:
         sidhi_id = user.get("sub")
+        inbox = await notification_inbox.get_inbox(db, sidhi_id, unread_only)
         
-        # Build query: global notifications OR user-specific notifications
-        query = {
-            "$or": [
-                {"target_type": "all"},  # Global notifications
-                {"target_type": "specific", "target_users": sidhi_id}  # User-specific
-            ]
+        return {
+            "status": "success",
+            **inbox
         }
-        
-        # Add unread filter if requested
-        if unread_only:
-            query["read_by"] = {"$ne": sidhi_id}
-        
-        notifications_cursor = db.notifications.find(query).sort("created_at", -1)
-        notifications = await notifications_cursor.to_list(length=None)
-        
-        # Format response: add read status for each notification
-        formatted_notifications = []
-        for notif in notifications:
-            formatted_notifications.append({
-                "notification_id": str(notif.get("_id")),
-                "title": notif.get("title"),
-                "message": notif.get("message"),
-                "type": notif.get("type"),  # info, warning, success, error, announcement
-                "priority": notif.get("priority"),  # low, medium, high, urgent
-                "target_type": notif.get("target_type"),
-                "created_at": notif.get("created_at"),
-                "is_read": sidhi_id in notif.get("read_by", []),
-                "action_url": notif.get("action_url"),  # Optional link for CTA
-                "expires_at": notif.get("expires_at")  # Optional expiry
-            })
-        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/notifications/unread-count")
+async def get_unread_notification_count(user: dict = Depends(verify_client_bound_request)):
+    try:
         return {
             "status": "success",
-            "notifications": formatted_notifications,
-            "count": len(formatted_notifications),
-            "unread_count": sum(1 for n in formatted_notifications if not n["is_read"])
+            "unread_count": await notification_inbox.unread_count(db, user.get("sub"))
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/notifications/stream")
+async def stream_notifications(user: dict = Depends(verify_client_bound_request)):
+    """Server-sent events: new notifications and unread count as they arrive"""
+    return StreamingResponse(
+        notification_inbox.stream_notifications(db, user.get("sub")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/notifications/{notification_id}/mark-read")
 async def mark_notification_read(
     notification_id: str,
@@ -672,15 +841,8 @@ async def mark_notification_read(
 ):
     try:
         sidhi_id = user.get("sub")
-        from bson import ObjectId
-        
-        # Add user to read_by array
-        result = await db.notifications.update_one(
-            {"_id": ObjectId(notification_id)},
-            {"$addToSet": {"read_by": sidhi_id}}
-        )
         
-        if result.matched_count == 0:
+        if not await notification_inbox.mark_read(db, sidhi_id, notification_id):
             raise HTTPException(status_code=404, detail="Notification not found")
         
         return {
@@ -698,21 +860,12 @@ async def mark_all_notifications_read(user: dict = Depends(verify_client_bound_r
     try:
         sidhi_id = user.get("sub")
         
-        # Mark all accessible notifications as read
-        result = await db.notifications.update_many(
-            {
-                "$or": [
-                    {"target_type": "all"},
-                    {"target_type": "specific", "target_users": sidhi_id}
-                ],
-                "read_by": {"$ne": sidhi_id}
-            },
-            {"$addToSet": {"read_by": sidhi_id}}
-        )
+        # Advance the user's read watermark past every current notification
+        marked = await notification_inbox.mark_all_read(db, sidhi_id)
         
         return {
             "status": "success",
-            "message": f"Marked {result.modified_count} notifications as read"
+            "message": f"Marked {marked} notifications as read"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
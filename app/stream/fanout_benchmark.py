@@ -0,0 +1,97 @@
+"""
+Code-stream fan-out load test
+
+    python -m app.stream.fanout_benchmark [--spectators 1000] [--frames 500]
+                                          [--fps 30] [--slow 0.01] [--stalled 2]
+
+Attaches N fake spectator sockets to one stream and pushes frames at a
+fixed rate through StreamManager.broadcast_code. A fraction of the
+spectators are slow (each send takes longer than the frame interval) and a
+few never complete a send at all. Reports producer time per frame, frames
+coalesced for slow viewers, and slow-consumer disconnects.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.stream.manager import StreamManager
+
+
+class FakeSocket:
+    def __init__(self, send_delay: float):
+        self.send_delay = send_delay
+        self.received = 0
+        self.closed_with = None
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.send_delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+async def run(spectators: int, frames: int, fps: float, slow_fraction: float, stalled: int, send_timeout: float):
+    import app.system.fanout as fanout
+    fanout.SEND_TIMEOUT = send_timeout
+
+    manager = StreamManager()
+    interval = 1.0 / fps
+    slow_count = int(spectators * slow_fraction)
+
+    sockets = []
+    for i in range(spectators):
+        if i < stalled:
+            delay = 3600.0                 # never finishes a send
+        elif i < stalled + slow_count:
+            delay = interval * 5           # far behind the frame rate
+        else:
+            delay = 0
+        sock = FakeSocket(delay)
+        sockets.append(sock)
+        await manager.add_spectator("bench", sock)
+
+    await manager.start_broadcast("bench")
+    producer_time = 0.0
+    started = time.perf_counter()
+    for n in range(frames):
+        t0 = time.perf_counter()
+        await manager.broadcast_code("bench", {"type": "code", "seq": n, "code": "x" * 2048})
+        producer_time += time.perf_counter() - t0
+        await asyncio.sleep(interval)
+
+    await asyncio.sleep(max(1.0, send_timeout + 0.5))   # let writers drain
+    elapsed = time.perf_counter() - started
+
+    fast = [s for s in sockets[stalled + slow_count:]]
+    slow = sockets[stalled:stalled + slow_count]
+    stats = manager.metrics()
+
+    print(f"{spectators} spectators ({slow_count} slow, {stalled} stalled), {frames} frames @ {fps:g} fps, {elapsed:.1f}s")
+    print(f"  producer     {producer_time / frames * 1e3:8.3f} ms/frame")
+    print(f"  fast viewers {min(s.received for s in fast)}-{max(s.received for s in fast)} frames received")
+    if slow:
+        print(f"  slow viewers {min(s.received for s in slow)}-{max(s.received for s in slow)} frames received")
+    print(f"  coalesced    {stats['coalesced']}")
+    print(f"  disconnects  {stats['slow_consumer_disconnects']}")
+    print(f"  connections  {stats['connections']} still subscribed")
+
+    for sock in sockets:
+        await manager.remove_spectator("bench", sock)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--slow", type=float, default=0.01, help="fraction of slow spectators")
+    parser.add_argument("--stalled", type=int, default=2, help="spectators that never finish a send")
+    parser.add_argument("--send-timeout", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.spectators, args.frames, args.fps, args.slow, args.stalled, args.send_timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,36 @@
 from fastapi import WebSocket
-from typing import Dict, List
-import asyncio
+from typing import Dict, Optional
+
+from app.system.fanout import Fanout
+from app.system.pubsub import Backplane, BroadcastHub
 
 class StreamManager:
-    def __init__(self):
-        self.active_streams: Dict[str, List[WebSocket]] = {}
-        self.stream_cache: Dict[str, dict] = {}
-        self.lock = asyncio.Lock()
+    def __init__(self, backplane: Optional[Backplane] = None):
+        # Streamers whose source socket is connected to this worker
+        self.active_streams: Dict[str, bool] = {}
+        # Code frames are full snapshots: a spectator only needs the newest one.
+        # The latest frame is retained on the backplane and replayed to late joiners.
+        self.hub = BroadcastHub("stream", Fanout(coalesce=True), backplane)
 
     async def start_broadcast(self, streamer_name: str):
-        async with self.lock:
-            if streamer_name not in self.active_streams:
-                self.active_streams[streamer_name] = []
+        self.active_streams[streamer_name] = True
 
     async def stop_stream(self, streamer_name: str):
-        async with self.lock:
-            if streamer_name in self.active_streams:
-                del self.active_streams[streamer_name]
-            if streamer_name in self.stream_cache:
-                del self.stream_cache[streamer_name]
+        self.active_streams.pop(streamer_name, None)
+        await self.hub.forget(streamer_name)
 
     async def add_spectator(self, streamer_name: str, websocket: WebSocket):
-        async with self.lock:
-            if streamer_name not in self.active_streams:
-                self.active_streams[streamer_name] = []
-            self.active_streams[streamer_name].append(websocket)
-        
-        if streamer_name in self.stream_cache:
-            await websocket.send_json(self.stream_cache[streamer_name])
+        latest = await self.hub.latest(streamer_name)
+        await self.hub.join(streamer_name, websocket, replay=latest)
 
     async def remove_spectator(self, streamer_name: str, websocket: WebSocket):
-        async with self.lock:
-            if streamer_name in self.active_streams:
-                if websocket in self.active_streams[streamer_name]:
-                    self.active_streams[streamer_name].remove(websocket)
+        await self.hub.leave(streamer_name, websocket)
 
     async def broadcast_code(self, streamer_name: str, payload: dict):
-        self.stream_cache[streamer_name] = payload
-        if streamer_name in self.active_streams:
-            for connection in list(self.active_streams[streamer_name]):
-                try:
-                    await connection.send_json(payload)
-                except:
-                    await self.remove_spectator(streamer_name, connection)
-
-manager = StreamManager()
\ No newline at end of file
+        # Serialized once for the retained frame, local spectators and other workers
+        await self.hub.publish(streamer_name, payload, retain=True)
+
+    def metrics(self) -> dict:
+        return {"active_streams": len(self.active_streams), **self.hub.fanout.stats()}
+
+manager = StreamManager()
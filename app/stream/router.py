@@ -1,9 +1,15 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
 from .manager import manager
 from app.ai.auth_utils import verify_lum_token_ws
+from app.admin.hardened_firebase_auth import get_current_admin
 
 router = APIRouter(prefix="/stream")
 
+@router.get("/metrics")
+async def stream_metrics(admin: dict = Depends(get_current_admin)):
+    """Fan-out counters, including coalesced frames and slow-consumer disconnects"""
+    return manager.metrics()
+
 @router.websocket("/source/{username}")
 async def stream_source(websocket: WebSocket, username: str):
     token = websocket.headers.get("authorization")
@@ -1,5 +1,6 @@
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
 from app.ai.client_bound_guard import verify_client_bound_request
+from app.system.identity import get_profile
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from typing import Optional
@@ -27,6 +28,7 @@ class StudentContext:
         self.profile = profile
 
 async def get_current_student(
+    request: Request,
     user: dict = Depends(verify_client_bound_request)
 ) -> StudentContext:
     """
@@ -43,8 +45,8 @@ async def get_current_student(
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token: missing user_id")
         
-        # Fetch profile from users_profile collection
-        profile = await db.users_profile.find_one({"user_id": user_id})
+        # Fetch profile from users_profile collection (request/TTL cached)
+        profile = await get_profile(db, user_id, request)
         
         if not profile:
             raise HTTPException(
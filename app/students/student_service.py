@@ -222,7 +222,10 @@ async def join_classroom(classroom_id: str, student: StudentContext, password: O
         is_active=True
     )
     
+    from app.teachers.teacher_service import adjust_classroom_counter
     await db.classroom_memberships.insert_one(membership.dict())
+    # Keep the denormalized counter in sync (legacy classrooms are backfilled on read)
+    await adjust_classroom_counter(classroom_id, "student_count", 1)
     await log_student_audit(student, "join_classroom", classroom_id, True)
     
     return {
@@ -496,6 +499,9 @@ async def submit_assignment(
     
     await db.submissions.insert_one(submission)
     
+    from app.teachers.teacher_service import invalidate_submission_analytics
+    await invalidate_submission_analytics(assignment_id, submission["classroom_id"])
+    
     # ✅ FIX: Run tests asynchronously
     from app.students.test_runner import run_assignment_tests
     asyncio.create_task(run_assignment_tests(
@@ -662,6 +668,9 @@ async def resubmit_assignment(
     
     await db.submissions.insert_one(submission)
     
+    from app.teachers.teacher_service import invalidate_submission_analytics
+    await invalidate_submission_analytics(assignment_id, submission["classroom_id"])
+    
     # ✅ FIX: Run tests asynchronously
     from app.students.test_runner import run_assignment_tests
     asyncio.create_task(run_assignment_tests(
@@ -296,6 +296,9 @@ async def run_assignment_tests(
             {"$set": {"test_result": test_result}}
         )
         
+        from app.teachers.teacher_service import invalidate_submission_analytics
+        await invalidate_submission_analytics(assignment_id)
+        
         print(f"[SUCCESS] Tests completed for {submission_id}")
         print(f"[RESULT] Score: {final_score:.2f}% | Passed: {total_passed}/{total_passed + total_failed}")
         
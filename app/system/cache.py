@@ -0,0 +1,597 @@
+"""
+Two-tier cache shared by analytics, profiles and leaderboards
+
+Tier 1: in-process LRU + TTL, sharded, no locks on the read path
+Tier 2: optional shared backend so every uvicorn worker sees the same data
+        CACHE_BACKEND = local (default, tier 1 only) | memory | redis | mongo
+
+Writes and deletes are broadcast to the other workers so their tier 1
+copies are dropped. get_or_set() collapses concurrent misses for a key
+into one loader call (single-flight), across workers when a shared
+backend is configured.
+
+Values and messages cross the shared tier as JSON, never pickle, so write
+access to Redis/Mongo does not become code execution on the workers.
+Besides JSON types, datetimes, dates, sets, bytes and ObjectIds round-trip;
+a value with any other type is kept in tier 1 only.
+
+The shared tier is an accelerator, not a dependency: if it errors, the
+cache logs and carries on with tier 1 alone.
+"""
+
+import asyncio
+import base64
+from abc import ABC, abstractmethod
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "10000"))
+CACHE_SHARDS = 16
+
+INVALIDATION_CHANNEL = "lumetrics:cache:invalidate"
+LOCK_TTL_SECONDS = 30       # Upper bound on a loader holding the shared lock
+LOCK_POLL_SECONDS = 0.05    # How often waiters re-check the shared tier
+
+# Identifies this worker so it can ignore its own invalidation broadcasts
+WORKER_ID = uuid.uuid4().hex
+
+
+# ============================================================================
+# Shared-tier encoding
+# ============================================================================
+
+def _encode_default(obj):
+    if isinstance(obj, datetime):
+        return {"$datetime": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"$date": obj.isoformat()}
+    if isinstance(obj, (set, frozenset)):
+        return {"$set": list(obj)}
+    if isinstance(obj, bytes):
+        return {"$bytes": base64.b64encode(obj).decode("ascii")}
+    if type(obj).__name__ == "ObjectId":
+        return {"$oid": str(obj)}
+    raise TypeError(f"{type(obj).__name__} is not cacheable in the shared tier")
+
+
+def _decode_hook(obj: dict):
+    if len(obj) != 1:
+        return obj
+    tag, value = next(iter(obj.items()))
+    if tag == "$datetime":
+        return datetime.fromisoformat(value)
+    if tag == "$date":
+        return date.fromisoformat(value)
+    if tag == "$set":
+        return set(value)
+    if tag == "$bytes":
+        return base64.b64decode(value)
+    if tag == "$oid":
+        from bson import ObjectId
+        return ObjectId(value)
+    return obj
+
+
+def encode(value: Any) -> str:
+    return json.dumps(value, default=_encode_default, separators=(",", ":"))
+
+
+def decode(raw) -> Any:
+    return json.loads(raw, object_hook=_decode_hook)
+
+
+# ============================================================================
+# Tier 1 - in-process LRU + TTL
+# ============================================================================
+
+class LocalCache:
+    """
+    Sharded LRU with per-entry expiry.
+    Nothing here awaits, so reads and writes are atomic on the event loop
+    and need no lock.
+    """
+
+    def __init__(self, max_entries: int = CACHE_LOCAL_MAX_ENTRIES, shards: int = CACHE_SHARDS):
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(shards)]
+        self._max_per_shard = max(1, max_entries // shards)
+
+    def _shard(self, key: str) -> OrderedDict:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: str) -> Optional[Any]:
+        shard = self._shard(key)
+        entry = shard.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            shard.pop(key, None)
+            return None
+
+        shard.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        shard = self._shard(key)
+        shard[key] = (value, time.monotonic() + ttl_seconds)
+        shard.move_to_end(key)
+        while len(shard) > self._max_per_shard:
+            shard.popitem(last=False)
+
+    def delete(self, key: str):
+        self._shard(key).pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        for shard in self._shards:
+            for key in [k for k in shard if k.startswith(prefix)]:
+                shard.pop(key, None)
+
+
+# ============================================================================
+# Tier 2 - shared backends
+# ============================================================================
+
+class SharedBackend(ABC):
+    """Interface for the shared tier. Values are encoded JSON strings."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, keys: List[str]):
+        ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str):
+        ...
+
+    @abstractmethod
+    async def acquire_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        """Set-if-absent with expiry; the owner token when this caller got the lock"""
+
+    @abstractmethod
+    async def release_lock(self, key: str, token: str):
+        """Delete the lock only if it still holds `token` - it may have expired and been re-taken"""
+
+    @abstractmethod
+    async def publish(self, message: dict):
+        ...
+
+    @abstractmethod
+    async def listen(self):
+        """Async iterator of invalidation messages from all workers"""
+        yield
+
+
+class MemoryBackend(SharedBackend):
+    """
+    In-process stand-in for Redis with the same semantics.
+    Used for tests and single-worker development.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._subscribers: List[asyncio.Queue] = []
+
+    def _live(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._live(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        self._data[key] = (value, time.monotonic() + ttl_seconds)
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            self._data.pop(key, None)
+
+    async def acquire_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        if self._live(key) is not None:
+            return None
+        token = uuid.uuid4().hex
+        self._data[key] = (token, time.monotonic() + ttl_seconds)
+        return token
+
+    async def release_lock(self, key: str, token: str):
+        if self._live(key) == token:
+            self._data.pop(key, None)
+
+    async def publish(self, message: dict):
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+
+    async def listen(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(queue)
+
+
+class RedisBackend(SharedBackend):
+    """Any Redis-protocol server (Redis, KeyDB, Dragonfly, Valkey)"""
+
+    # Compare-and-delete in one round trip
+    RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[str]:
+        raw = await self._redis.get(key)
+        return raw.decode("utf-8") if raw is not None else None
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        await self._redis.set(key, value, px=max(1, int(ttl_seconds * 1000)))
+
+    async def delete(self, keys: List[str]):
+        if keys:
+            await self._redis.delete(*keys)
+
+    async def delete_prefix(self, prefix: str):
+        batch = []
+        async for key in self._redis.scan_iter(match=f"{prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._redis.delete(*batch)
+                batch = []
+        if batch:
+            await self._redis.delete(*batch)
+
+    async def acquire_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if await self._redis.set(key, token, nx=True, px=int(ttl_seconds * 1000)):
+            return token
+        return None
+
+    async def release_lock(self, key: str, token: str):
+        await self._redis.eval(self.RELEASE_SCRIPT, 1, key, token)
+
+    async def publish(self, message: dict):
+        await self._redis.publish(INVALIDATION_CHANNEL, json.dumps(message))
+
+    async def listen(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        try:
+            async for raw in pubsub.listen():
+                if raw.get("type") == "message":
+                    yield json.loads(raw["data"])
+        finally:
+            await pubsub.unsubscribe(INVALIDATION_CHANNEL)
+
+
+class MongoBackend(SharedBackend):
+    """
+    Shared tier on the existing MongoDB deployment.
+    Entries expire through a TTL index; invalidations are a short-lived
+    collection every worker reads (see app.system.mongo_events).
+    """
+
+    POLL_INTERVAL = 1.0
+
+    def __init__(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self._db = AsyncIOMotorClient(os.getenv("MONGO_URL")).lumetrics_db
+        self._entries = self._db.shared_cache
+        self._events = self._db.cache_invalidations
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self._entries.create_index("expires_at", expireAfterSeconds=0)
+            await self._events.create_index("created_at", expireAfterSeconds=3600)
+            self._indexes_ready = True
+
+    async def get(self, key: str) -> Optional[str]:
+        doc = await self._entries.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return doc["value"] if doc else None
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        await self._ensure_indexes()
+        await self._entries.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+
+    async def delete(self, keys: List[str]):
+        if keys:
+            await self._entries.delete_many({"_id": {"$in": keys}})
+
+    async def delete_prefix(self, prefix: str):
+        import re
+        await self._entries.delete_many({"_id": {"$regex": f"^{re.escape(prefix)}"}})
+
+    async def acquire_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        from pymongo.errors import DuplicateKeyError
+
+        await self._ensure_indexes()
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        # Expired locks may linger until the TTL monitor runs - clear them first
+        await self._entries.delete_one({"_id": key, "expires_at": {"$lte": now}})
+        try:
+            await self._entries.insert_one({
+                "_id": key,
+                "value": token,
+                "expires_at": now + timedelta(seconds=ttl_seconds)
+            })
+            return token
+        except DuplicateKeyError:
+            return None
+
+    async def release_lock(self, key: str, token: str):
+        await self._entries.delete_one({"_id": key, "value": token})
+
+    async def publish(self, message: dict):
+        from app.system.mongo_events import publish_event
+
+        await self._ensure_indexes()
+        await publish_event(self._events, message)
+
+    async def listen(self):
+        from app.system.mongo_events import tail_events
+
+        await self._ensure_indexes()
+        async for event in tail_events(self._events, self.POLL_INTERVAL):
+            yield event
+
+
+def _create_backend() -> Optional[SharedBackend]:
+    if CACHE_BACKEND == "redis":
+        return RedisBackend()
+    if CACHE_BACKEND == "mongo":
+        return MongoBackend()
+    if CACHE_BACKEND == "memory":
+        return MemoryBackend()
+    return None
+
+
+# ============================================================================
+# Tiered cache
+# ============================================================================
+
+class TieredCache:
+    """
+    Namespaced cache over the local tier and the optional shared tier.
+    Drop-in for the old CacheManager (get / set / delete / clear).
+    """
+
+    def __init__(self, namespace: str, local: LocalCache, backend: Optional[SharedBackend]):
+        self.namespace = namespace
+        self._local = local
+        self._backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get_local(self, key: str) -> Optional[Any]:
+        """Synchronous tier 1 lookup"""
+        return self._local.get(self._key(key))
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get cached value if not expired"""
+        full_key = self._key(key)
+        value = self._local.get(full_key)
+        if value is not None or self._backend is None:
+            return value
+
+        try:
+            raw = await self._backend.get(full_key)
+        except Exception as e:
+            print(f"⚠️ Shared cache read failed for {full_key}: {e}")
+            return None
+        if raw is None:
+            return None
+
+        try:
+            value, expires_at = decode(raw)
+        except (ValueError, TypeError):
+            # Entry from an older encoding - treat as a miss
+            return None
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        self._local.set(full_key, value, remaining)
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: float):
+        """Set cached value with TTL in both tiers"""
+        full_key = self._key(key)
+        self._local.set(full_key, value, ttl_seconds)
+        if self._backend is not None:
+            try:
+                raw = encode([value, time.time() + ttl_seconds])
+            except (TypeError, ValueError) as e:
+                print(f"⚠️ Cache value for {full_key} kept local only: {e}")
+                raw = None
+            try:
+                if raw is None:
+                    await self._backend.delete([full_key])
+                else:
+                    await self._backend.set(full_key, raw, ttl_seconds)
+            except Exception as e:
+                print(f"⚠️ Shared cache write failed for {full_key}: {e}")
+            await self._broadcast(keys=[full_key])
+
+    async def delete(self, key: str):
+        """Delete cached value everywhere"""
+        full_key = self._key(key)
+        self._local.delete(full_key)
+        if self._backend is not None:
+            try:
+                await self._backend.delete([full_key])
+            except Exception as e:
+                print(f"⚠️ Shared cache delete failed for {full_key}: {e}")
+            await self._broadcast(keys=[full_key])
+
+    async def clear(self):
+        """Clear every key in this namespace"""
+        prefix = self._key("")
+        self._local.delete_prefix(prefix)
+        if self._backend is not None:
+            try:
+                await self._backend.delete_prefix(prefix)
+            except Exception as e:
+                print(f"⚠️ Shared cache clear failed for {prefix}: {e}")
+            await self._broadcast(prefix=prefix)
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Any:
+        """
+        Return the cached value or compute it once.
+        Concurrent callers in this worker share one loader call; with a
+        shared backend a lock key keeps other workers waiting for the
+        result instead of recomputing it.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        full_key = self._key(key)
+        inflight = self._inflight.get(full_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await self._load(key, loader, ttl_seconds)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception with no other waiters is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(full_key, None)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Any:
+        if self._backend is None:
+            value = await loader()
+            await self.set(key, value, ttl_seconds)
+            return value
+
+        lock_key = f"lock:{self._key(key)}"
+        deadline = time.monotonic() + LOCK_TTL_SECONDS
+        token = None
+        try:
+            while True:
+                token = await self._backend.acquire_lock(lock_key, LOCK_TTL_SECONDS)
+                if token is not None:
+                    break
+                # Another worker is loading - wait for its result
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+                value = await self.get(key)
+                if value is not None:
+                    return value
+                if time.monotonic() >= deadline:
+                    break
+        except Exception as e:
+            # No shared lock - load without cross-worker single-flight
+            print(f"⚠️ Shared cache lock failed for {lock_key}: {e}")
+
+        try:
+            value = await loader()
+            await self.set(key, value, ttl_seconds)
+            return value
+        finally:
+            if token is not None:
+                try:
+                    await self._backend.release_lock(lock_key, token)
+                except Exception as e:
+                    # The lock expires on its own after LOCK_TTL_SECONDS
+                    print(f"⚠️ Shared cache unlock failed for {lock_key}: {e}")
+
+    async def _broadcast(self, keys: List[str] = None, prefix: str = None):
+        try:
+            await self._backend.publish({"origin": WORKER_ID, "keys": keys or [], "prefix": prefix})
+        except Exception as e:
+            # Peers fall back to local TTL expiry
+            print(f"⚠️ Cache invalidation broadcast failed: {e}")
+
+
+# ============================================================================
+# Registry and cross-worker invalidation listener
+# ============================================================================
+
+_local = LocalCache()
+_backend = _create_backend()
+_caches: Dict[str, TieredCache] = {}
+
+
+def get_cache(namespace: str) -> TieredCache:
+    """Get (or create) the cache for a namespace, e.g. 'admin_analytics'"""
+    if namespace not in _caches:
+        _caches[namespace] = TieredCache(namespace, _local, _backend)
+    return _caches[namespace]
+
+
+def _apply_invalidation(message: dict):
+    if message.get("origin") == WORKER_ID:
+        return
+    for key in message.get("keys") or []:
+        _local.delete(key)
+    if message.get("prefix"):
+        _local.delete_prefix(message["prefix"])
+
+
+async def run_invalidation_listener():
+    """
+    Background task: drop local copies of keys changed by other workers.
+    Reconnects with a short backoff if the backend goes away.
+    """
+    if _backend is None:
+        return
+
+    while True:
+        try:
+            async for message in _backend.listen():
+                _apply_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Cache invalidation listener error: {e}")
+            await asyncio.sleep(1)
@@ -0,0 +1,199 @@
+"""
+WebSocket fan-out with per-connection send queues
+
+Producers never await a socket: publish() serializes the message once and
+drops the text into every subscriber's Outbox, and each Outbox drains into
+its socket from its own writer task. One slow viewer therefore only
+delays itself.
+
+Queue policies:
+    queue     - bounded FIFO (chat). A full queue means the consumer can't
+                keep up; it is disconnected rather than silently skipping
+                messages.
+    coalesce  - at most one pending frame, latest wins (code streams).
+                A newer frame replaces the unsent one.
+
+Either way a single send that takes longer than FANOUT_SEND_TIMEOUT is a
+slow consumer and gets disconnected (code 1013, try again later).
+"""
+
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from fastapi import WebSocket, status
+
+OUTBOX_MAX_QUEUE = int(os.getenv("FANOUT_MAX_QUEUE", "256"))       # messages per connection
+SEND_TIMEOUT = float(os.getenv("FANOUT_SEND_TIMEOUT", "10"))        # seconds per send
+
+
+def serialize(message: dict) -> str:
+    # Same encoding as WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class FanoutMetrics:
+    def __init__(self):
+        self.published = 0          # messages handed to publish()
+        self.delivered = 0          # socket sends completed
+        self.coalesced = 0          # frames replaced before they were sent
+        self.peak_queue_depth = 0
+        self.slow_consumer_disconnects: Dict[str, int] = {}
+
+    def record_disconnect(self, reason: str):
+        self.slow_consumer_disconnects[reason] = self.slow_consumer_disconnects.get(reason, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "peak_queue_depth": self.peak_queue_depth,
+            "slow_consumer_disconnects": dict(self.slow_consumer_disconnects),
+        }
+
+
+class Outbox:
+    """Outbound queue plus writer task for one WebSocket"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        metrics: FanoutMetrics,
+        coalesce: bool = False,
+        max_queue: int = OUTBOX_MAX_QUEUE,
+        on_close: Optional[Callable[["Outbox"], None]] = None
+    ):
+        self.websocket = websocket
+        self.metrics = metrics
+        self.coalesce = coalesce
+        self.max_queue = max_queue
+        self.on_close = on_close
+        self.closed = False
+        self._pending: deque = deque()
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._drain())
+
+    def offer(self, text: str) -> bool:
+        """Queue one serialized message; never blocks"""
+        if self.closed:
+            return False
+
+        if self.coalesce:
+            if self._pending:
+                self._pending.clear()
+                self.metrics.coalesced += 1
+        elif len(self._pending) >= self.max_queue:
+            self._fail("queue_full")
+            return False
+
+        self._pending.append(text)
+        if len(self._pending) > self.metrics.peak_queue_depth:
+            self.metrics.peak_queue_depth = len(self._pending)
+        self._ready.set()
+        return True
+
+    async def _drain(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._pending:
+                    text = self._pending.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(text), timeout=SEND_TIMEOUT)
+                    self.metrics.delivered += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._fail("send_timeout")
+        except Exception:
+            # Socket already gone; the receive loop will clean up too
+            self._fail("send_error")
+
+    def _fail(self, reason: str):
+        if self.closed:
+            return
+        if reason != "send_error":
+            self.metrics.record_disconnect(reason)
+        self.close()
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except Exception:
+            pass
+
+    def close(self):
+        """Stop the writer and detach; does not close the socket itself"""
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if self.on_close:
+            self.on_close(self)
+
+
+class Fanout:
+    """Channels of subscribed sockets, each with its own Outbox"""
+
+    def __init__(self, coalesce: bool = False, max_queue: int = OUTBOX_MAX_QUEUE):
+        self.coalesce = coalesce
+        self.max_queue = max_queue
+        self.metrics = FanoutMetrics()
+        self.channels: Dict[str, Dict[WebSocket, Outbox]] = {}
+
+    def subscribe(self, channel: str, websocket: WebSocket) -> Outbox:
+        subscribers = self.channels.setdefault(channel, {})
+        outbox = Outbox(
+            websocket,
+            self.metrics,
+            coalesce=self.coalesce,
+            max_queue=self.max_queue,
+            on_close=lambda box: self._detach(channel, box)
+        )
+        subscribers[websocket] = outbox
+        return outbox
+
+    def unsubscribe(self, channel: str, websocket: WebSocket):
+        outbox = self.channels.get(channel, {}).get(websocket)
+        if outbox:
+            outbox.close()
+
+    def _detach(self, channel: str, outbox: Outbox):
+        subscribers = self.channels.get(channel)
+        if subscribers is None:
+            return
+        if subscribers.get(outbox.websocket) is outbox:
+            del subscribers[outbox.websocket]
+        if not subscribers:
+            del self.channels[channel]
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self.channels.get(channel, {}))
+
+    def publish(self, channel: str, message: dict) -> int:
+        """Serialize once and queue for every subscriber; returns recipients"""
+        subscribers = self.channels.get(channel)
+        if not subscribers:
+            return 0
+        return self.publish_text(channel, serialize(message))
+
+    def publish_text(self, channel: str, text: str) -> int:
+        self.metrics.published += 1
+        sent = 0
+        for outbox in list(self.channels.get(channel, {}).values()):
+            if outbox.offer(text):
+                sent += 1
+        return sent
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self.channels),
+            "connections": sum(len(s) for s in self.channels.values()),
+            **self.metrics.to_dict(),
+        }
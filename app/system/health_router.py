@@ -1,8 +1,17 @@
 import httpx
 import asyncio
-from datetime import datetime, timedelta
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+router = APIRouter()
+
 # Configuration for the target servers
 SERVERS = {
     "auth": "https://auth.sidhi.xyz/health",
@@ -10,42 +19,245 @@ SERVERS = {
     "hardjudge": "https://hdl-engine.onrender.com/health"
 }
 
-async def monitor_heartbeat(db: AsyncIOMotorDatabase):
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "60"))       # seconds between probe rounds
+PROBE_JITTER = float(os.getenv("HEALTH_PROBE_JITTER", "0.1"))          # +/- fraction of the interval
+PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+PERSIST_INTERVAL = float(os.getenv("HEALTH_PERSIST_INTERVAL", "300"))  # one stored record per window
+HISTOGRAM_WINDOW = int(os.getenv("HEALTH_HISTOGRAM_WINDOW", "120"))    # samples kept per dependency
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))          # seconds open before a trial call
+READY_PING_TIMEOUT = float(os.getenv("HEALTH_READY_PING_TIMEOUT", "2"))
+
+
+# ============================================================================
+# In-memory state
+# ============================================================================
+
+class LatencyHistogram:
+    """Rolling window of the last N probe latencies"""
+
+    def __init__(self, size: int = HISTOGRAM_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, latency_ms: float):
+        self.samples.append(latency_ms)
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        if not self.samples:
+            return {"p50": None, "p95": None, "p99": None}
+        ordered = sorted(self.samples)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+class CircuitBreaker:
     """
-    Background worker that pings dependencies every 5 minutes.
+    closed    - calls flow normally
+    open      - BREAKER_FAILURE_THRESHOLD consecutive failures; calls are
+                refused until BREAKER_COOLDOWN has passed
+    half_open - cooldown over; one trial call decides closed vs open
+    Fed by the health probes and by the judge clients themselves.
     """
-    while True:
-        record = {
-            "timestamp": datetime.utcnow(),
-            "status": {},
-            "latency_ms": {}
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class DependencyHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.breaker = CircuitBreaker()
+        self.status = "UNKNOWN"
+        self.last_latency_ms: Optional[float] = None
+        self.last_checked: Optional[datetime] = None
+        self.probes = 0
+        self.failures = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "last_latency_ms": self.last_latency_ms,
+            "last_checked": self.last_checked.isoformat() if self.last_checked else None,
+            "latency_ms": self.histogram.percentiles(),
+            "samples": len(self.histogram.samples),
+            "probes": self.probes,
+            "failures": self.failures,
+            "circuit": self.breaker.to_dict()
         }
-        
-        async with httpx.AsyncClient() as client:
-            # 1. Ping External Servers
-            for name, url in SERVERS.items():
+
+
+DEPENDENCIES: Dict[str, DependencyHealth] = {name: DependencyHealth(name) for name in SERVERS}
+
+# The app database, handed over by monitor_heartbeat(); None until startup runs it
+_ready_db: Optional[AsyncIOMotorDatabase] = None
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Circuit breaker for a dependency ("auth", "softjudge", "hardjudge")"""
+    return DEPENDENCIES[name].breaker
+
+
+# ============================================================================
+# Probing
+# ============================================================================
+
+async def _probe(client: httpx.AsyncClient, name: str, url: str):
+    dep = DEPENDENCIES[name]
+    start = time.perf_counter()
+    try:
+        resp = await client.get(url, timeout=PROBE_TIMEOUT)
+        is_up = resp.status_code == 200
+    except Exception:
+        is_up = False
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    dep.probes += 1
+    dep.last_checked = datetime.utcnow()
+    dep.status = "UP" if is_up else "DOWN"
+    if is_up:
+        dep.last_latency_ms = round(latency_ms, 1)
+        dep.histogram.add(latency_ms)
+        dep.breaker.record_success()
+    else:
+        dep.failures += 1
+        dep.breaker.record_failure()
+
+
+def _snapshot_record() -> dict:
+    """Downsampled record in the shape the health report already reads"""
+    record = {
+        "timestamp": datetime.utcnow(),
+        "status": {},
+        "latency_ms": {},
+        "latency_percentiles_ms": {},
+        "circuit": {}
+    }
+    for name, dep in DEPENDENCIES.items():
+        key = f"{name}_server"
+        record["status"][key] = dep.status
+        percentiles = dep.histogram.percentiles()
+        if percentiles["p50"] is not None:
+            record["latency_ms"][key] = percentiles["p50"]
+        record["latency_percentiles_ms"][key] = percentiles
+        record["circuit"][key] = dep.breaker.state
+
+    # If this logic is executing, the Main Server is alive
+    internal_status = "UP"
+    record["status"]["internal_services"] = {
+        "courses": internal_status,
+        "classrooms": internal_status,
+        "plagiarism": internal_status,
+        "cli_server": internal_status,
+        "cert_server": internal_status
+    }
+    return record
+
+
+async def monitor_heartbeat(db: AsyncIOMotorDatabase):
+    """
+    Background worker: probes every dependency concurrently each
+    PROBE_INTERVAL (with jitter) and stores one downsampled record per
+    PERSIST_INTERVAL. Also hands `db` to the readiness check.
+    """
+    global _ready_db
+    _ready_db = db
+
+    last_persist = time.monotonic() - PERSIST_INTERVAL  # Store the first round right away
+
+    async with httpx.AsyncClient() as client:
+        while True:
+            await asyncio.gather(*(_probe(client, name, url) for name, url in SERVERS.items()))
+
+            if time.monotonic() - last_persist >= PERSIST_INTERVAL:
                 try:
-                    start = datetime.utcnow()
-                    resp = await client.get(url, timeout=5.0)
-                    is_up = resp.status_code == 200
-                    record["status"][f"{name}_server"] = "UP" if is_up else "DOWN"
-                    record["latency_ms"][f"{name}_server"] = (datetime.utcnow() - start).total_seconds() * 1000
-                except Exception:
-                    record["status"][f"{name}_server"] = "DOWN"
-
-            # 2. Log Internal Service Status
-            # If this logic is executing, the Main Server is alive
-            internal_status = "UP" 
-            record["status"]["internal_services"] = {
-                "courses": internal_status,
-                "classrooms": internal_status,
-                "plagiarism": internal_status,
-                "cli_server": internal_status,
-                "cert_server": internal_status
-            }
-
-        # Store the snap in MongoDB
-        await db.system_health_records.insert_one(record)
-        
-        # Wait 5 minutes before next pulse
-        await asyncio.sleep(300)
\ No newline at end of file
+                    await db.system_health_records.insert_one(_snapshot_record())
+                    last_persist = time.monotonic()
+                except Exception as e:
+                    print(f"⚠️ Health record write failed: {e}")
+
+            jitter = random.uniform(-PROBE_JITTER, PROBE_JITTER) * PROBE_INTERVAL
+            await asyncio.sleep(max(1.0, PROBE_INTERVAL + jitter))
+
+
+# ============================================================================
+# Endpoints (served from memory)
+# ============================================================================
+
+async def _mongo_ready() -> Dict:
+    """Ping the app's MongoDB - the one hard dependency"""
+    if _ready_db is None:
+        return {"ok": False, "error": "starting"}
+
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_ready_db.command("ping"), READY_PING_TIMEOUT)
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": str(e) or type(e).__name__}
+
+
+@router.get("/system/ready")
+async def readiness():
+    """
+    Readiness: 503 only when MongoDB is unreachable. External services
+    (auth, judges) may sleep on free hosts; their circuits are reported
+    in the body but never take this instance out of rotation.
+    """
+    mongo = await _mongo_ready()
+    open_circuits = [name for name, dep in DEPENDENCIES.items() if dep.breaker.state == "open"]
+
+    return JSONResponse(
+        status_code=200 if mongo["ok"] else 503,
+        content={
+            "ready": mongo["ok"],
+            "mongo": mongo,
+            "open_circuits": open_circuits,
+            "dependencies": {name: dep.to_dict() for name, dep in DEPENDENCIES.items()}
+        }
+    )
+
+
+@router.get("/system/dependencies")
+async def dependency_health():
+    """Latency percentiles and circuit state per dependency"""
+    return {
+        "probe_interval_seconds": PROBE_INTERVAL,
+        "dependencies": {name: dep.to_dict() for name, dep in DEPENDENCIES.items()}
+    }
@@ -0,0 +1,118 @@
+"""
+Identity resolution for authentication dependencies
+
+Three layers, cheapest first:
+
+1. Request scope - profiles resolved during a request are memoized on
+   request.state, so stacked dependencies (user id, sidhi id, student or
+   teacher context) never resolve the same user twice.
+2. Profile cache - `users_profile` documents keyed by user_id in the
+   `user_profiles` namespace with a short TTL. Every write to a profile
+   calls invalidate_profile() / invalidate_profile_by_sidhi().
+   Writes that set username or email_id also set profile_search_fields(),
+   the lowercased copies the admin user search runs on.
+3. Client keys - decoded Ed25519 VerifyKeys and their derived client ids
+   in a bounded LRU, so a device's public key is parsed and hashed once.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from nacl.signing import VerifyKey
+
+from app.system.cache import get_cache
+
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "30"))  # seconds
+VERIFY_KEY_CACHE_SIZE = int(os.getenv("VERIFY_KEY_CACHE_SIZE", "4096"))
+
+profile_cache = get_cache("user_profiles")
+
+
+# ============================================================================
+# Client keys
+# ============================================================================
+
+@lru_cache(maxsize=VERIFY_KEY_CACHE_SIZE)
+def load_client_key(public_key_hex: str) -> Tuple[VerifyKey, str]:
+    """
+    (VerifyKey, client_id) for a hex public key; client_id is derived
+    server-side as sha256(public key bytes). Raises on malformed keys
+    (failures are not cached).
+    """
+    public_key_bytes = bytes.fromhex(public_key_hex)
+    return VerifyKey(public_key_bytes), hashlib.sha256(public_key_bytes).hexdigest()
+
+
+# ============================================================================
+# Profiles
+# ============================================================================
+
+async def get_profile(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    request: Optional[Request] = None
+) -> Optional[Dict]:
+    """users_profile document for user_id (None if not registered)"""
+    if not user_id:
+        return None
+
+    scoped = None
+    if request is not None:
+        scoped = getattr(request.state, "identity_profiles", None)
+        if scoped is None:
+            scoped = request.state.identity_profiles = {}
+        if user_id in scoped:
+            return scoped[user_id]
+
+    profile = await profile_cache.get_or_set(
+        user_id,
+        lambda: db.users_profile.find_one({"user_id": user_id}),
+        PROFILE_CACHE_TTL
+    )
+    # Callers may mutate what they get; keep the cached copy pristine
+    profile = dict(profile) if profile else None
+
+    if scoped is not None:
+        scoped[user_id] = profile
+    return profile
+
+
+async def invalidate_profile(user_id: str):
+    """Call after any write to a users_profile document"""
+    if user_id:
+        await profile_cache.delete(user_id)
+
+
+async def invalidate_profile_by_sidhi(db: AsyncIOMotorDatabase, sidhi_id: str):
+    """invalidate_profile for writes keyed by sidhi_id (call before deletes)"""
+    profile = await db.users_profile.find_one({"sidhi_id": sidhi_id}, {"user_id": 1})
+    if profile:
+        await invalidate_profile(profile.get("user_id"))
+
+
+async def invalidate_all_profiles():
+    """For bulk writes across many users"""
+    await profile_cache.clear()
+
+
+def profile_search_fields(fields: Dict) -> Dict:
+    """Lowercased username/email to $set alongside a profile write"""
+    search = {}
+    if isinstance(fields.get("username"), str):
+        search["username_lower"] = fields["username"].lower()
+    if isinstance(fields.get("email_id"), str):
+        search["email_lower"] = fields["email_id"].lower()
+    return search
+
+
+async def backfill_profile_search_fields(db: AsyncIOMotorDatabase):
+    """Fill the search fields on profiles written before they existed"""
+    for source, target in (("username", "username_lower"), ("email_id", "email_lower")):
+        await db.users_profile.update_many(
+            {target: None, source: {"$type": "string"}},
+            [{"$set": {target: {"$toLower": f"${source}"}}}]
+        )
@@ -0,0 +1,69 @@
+"""
+Short-lived event collections on MongoDB, read by every worker
+
+Used by the cache invalidation listener and the pub/sub backplane.
+
+Events are written with a server-assigned `created_at` ($currentDate), so
+clocks on the app hosts do not matter. Readers use a change stream when
+the deployment has one (replica set / Atlas). On a standalone server they
+poll instead. ObjectIds from different processes are not monotonic, and
+a write can commit after a later one, so tailing by `_id > last` can skip
+events. Instead each poll re-reads the last LOOKBACK_SECONDS by
+created_at and drops events it has already yielded.
+"""
+
+import asyncio
+from datetime import timedelta
+from typing import Dict
+
+from bson import ObjectId
+
+LOOKBACK_SECONDS = 10  # Upper bound on how late an event may commit
+
+
+async def publish_event(collection, fields: dict):
+    """Insert an event stamped with the server's clock"""
+    await collection.update_one(
+        {"_id": ObjectId()},
+        {"$set": fields, "$currentDate": {"created_at": True}},
+        upsert=True
+    )
+
+
+async def tail_events(collection, poll_interval: float):
+    """Async iterator of event documents inserted after the call"""
+    from pymongo.errors import OperationFailure
+
+    try:
+        async with collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            async for change in stream:
+                yield change["fullDocument"]
+        return
+    except OperationFailure:
+        pass  # Standalone server: no change streams
+
+    lookback = timedelta(seconds=LOOKBACK_SECONDS)
+    seen: Dict[ObjectId, object] = {}
+
+    # Everything already there counts as seen
+    last = await collection.find_one(sort=[("created_at", -1)])
+    since = last["created_at"] if last else None
+    if since is not None:
+        async for doc in collection.find({"created_at": {"$gte": since - lookback}}, {"created_at": 1}):
+            seen[doc["_id"]] = doc["created_at"]
+
+    while True:
+        query = {"created_at": {"$gte": since - lookback}} if since is not None else {}
+        async for doc in collection.find(query).sort("created_at", 1):
+            if doc["_id"] in seen:
+                continue
+            seen[doc["_id"]] = doc["created_at"]
+            if since is None or doc["created_at"] > since:
+                since = doc["created_at"]
+            yield doc
+
+        if since is not None:
+            horizon = since - lookback
+            for event_id in [i for i, at in seen.items() if at < horizon]:
+                del seen[event_id]
+        await asyncio.sleep(poll_interval)
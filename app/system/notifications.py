@@ -0,0 +1,276 @@
+"""
+Notification inbox (fan-out on read)
+
+Notifications are stored once in `notifications` with an `audience` array:
+["all"] for broadcasts, or the target sidhi_ids. Nothing is copied per user.
+
+Read state lives in `notification_reads`, one small document per user:
+    {sidhi_id, watermark, read_ids}
+Everything created at or before `watermark` is read ("mark all read" just
+moves it forward); `read_ids` holds notifications individually read after
+the watermark and is cleared each time the watermark advances.
+
+Unread count = notifications for the user's audience created after the
+watermark, minus read_ids - one indexed range on (audience, created_at).
+
+`expires_at` carries a TTL index, so expired notifications are deleted by
+MongoDB; reads also filter them out until the TTL monitor runs.
+
+Older documents written with a `read_by` array are migrated to `audience`
+at startup and their `read_by` is still honoured.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+AUDIENCE_ALL = "all"
+STREAM_POLL_SECONDS = float(os.getenv("NOTIFICATION_STREAM_POLL_SECONDS", "5"))
+STREAM_HEARTBEAT_SECONDS = 25
+INBOX_LIMIT = 100
+
+# Set whenever this worker creates a notification so open streams wake up
+# immediately; other workers' notifications are picked up by polling.
+_new_notification = asyncio.Event()
+
+
+# ============================================================================
+# Setup
+# ============================================================================
+
+async def create_notification_indexes(db: AsyncIOMotorDatabase):
+    # Backfill audience on documents written before the inbox existed
+    await db.notifications.update_many(
+        {"audience": {"$exists": False}},
+        [{"$set": {"audience": {"$cond": [
+            {"$eq": ["$target_type", "specific"]},
+            {"$ifNull": ["$target_users", []]},
+            [AUDIENCE_ALL]
+        ]}}}]
+    )
+
+    await db.notifications.create_index([("audience", 1), ("created_at", -1)])
+    await db.notifications.create_index("created_at")
+    # Documents without a date in expires_at are never expired
+    await db.notifications.create_index("expires_at", expireAfterSeconds=0)
+    await db.notification_reads.create_index("sidhi_id", unique=True)
+    await db.notification_reads.create_index("watermark")
+
+
+# ============================================================================
+# Writes
+# ============================================================================
+
+async def create_notification(
+    db: AsyncIOMotorDatabase,
+    *,
+    title: str,
+    message: str,
+    type: str,
+    priority: str,
+    target_type: str,
+    target_users: Optional[List[str]],
+    created_by: Optional[str],
+    expires_hours: Optional[int] = None,
+    action_url: Optional[str] = None
+) -> str:
+    """Store a notification once; returns its id"""
+    now = datetime.utcnow()
+    target_users = target_users or []
+
+    doc = {
+        "title": title,
+        "message": message,
+        "type": type,
+        "priority": priority,
+        "target_type": target_type,
+        "target_users": target_users,
+        "audience": target_users if target_type == "specific" else [AUDIENCE_ALL],
+        "action_url": action_url,
+        "expires_at": now + timedelta(hours=expires_hours) if expires_hours else None,
+        "created_at": now,
+        "created_by": created_by
+    }
+    result = await db.notifications.insert_one(doc)
+
+    # Wake every open stream on this worker, then re-arm
+    _new_notification.set()
+    _new_notification.clear()
+
+    return str(result.inserted_id)
+
+
+async def mark_read(db: AsyncIOMotorDatabase, sidhi_id: str, notification_id: str) -> bool:
+    """Mark one notification read; False if it doesn't exist for this user"""
+    oid = ObjectId(notification_id)
+    notif = await db.notifications.find_one(
+        {"_id": oid, "audience": {"$in": [AUDIENCE_ALL, sidhi_id]}},
+        {"created_at": 1}
+    )
+    if not notif:
+        return False
+
+    state = await _read_state(db, sidhi_id)
+    if state["watermark"] and notif["created_at"] <= state["watermark"]:
+        return True  # Already covered by the watermark
+
+    await db.notification_reads.update_one(
+        {"sidhi_id": sidhi_id},
+        {"$addToSet": {"read_ids": oid}, "$setOnInsert": {"watermark": None}},
+        upsert=True
+    )
+    return True
+
+
+async def mark_all_read(db: AsyncIOMotorDatabase, sidhi_id: str) -> int:
+    """Advance the watermark to now; returns how many were unread"""
+    unread = await unread_count(db, sidhi_id)
+    await db.notification_reads.update_one(
+        {"sidhi_id": sidhi_id},
+        {"$set": {"watermark": datetime.utcnow(), "read_ids": []}},
+        upsert=True
+    )
+    return unread
+
+
+# ============================================================================
+# Reads
+# ============================================================================
+
+async def _read_state(db: AsyncIOMotorDatabase, sidhi_id: str) -> Dict:
+    state = await db.notification_reads.find_one(
+        {"sidhi_id": sidhi_id},
+        {"_id": 0, "watermark": 1, "read_ids": 1}
+    )
+    return {
+        "watermark": (state or {}).get("watermark"),
+        "read_ids": (state or {}).get("read_ids") or []
+    }
+
+
+def _inbox_query(sidhi_id: str, after: Optional[datetime] = None) -> Dict:
+    query = {
+        "audience": {"$in": [AUDIENCE_ALL, sidhi_id]},
+        # Not yet removed by the TTL monitor
+        "expires_at": {"$not": {"$lte": datetime.utcnow()}}
+    }
+    if after:
+        query["created_at"] = {"$gt": after}
+    return query
+
+
+def _unread_query(sidhi_id: str, state: Dict) -> Dict:
+    query = _inbox_query(sidhi_id, state["watermark"])
+    if state["read_ids"]:
+        query["_id"] = {"$nin": state["read_ids"]}
+    query["read_by"] = {"$ne": sidhi_id}  # Legacy per-document read state
+    return query
+
+
+def _is_read(notif: Dict, sidhi_id: str, state: Dict) -> bool:
+    if state["watermark"] and notif["created_at"] <= state["watermark"]:
+        return True
+    return notif["_id"] in state["read_ids"] or sidhi_id in notif.get("read_by", [])
+
+
+def _format(notif: Dict, is_read: bool) -> Dict:
+    return {
+        "notification_id": str(notif.get("_id")),
+        "title": notif.get("title"),
+        "message": notif.get("message"),
+        "type": notif.get("type"),  # info, warning, success, error, announcement
+        "priority": notif.get("priority"),  # low, medium, high, urgent
+        "target_type": notif.get("target_type"),
+        "created_at": notif.get("created_at"),
+        "is_read": is_read,
+        "action_url": notif.get("action_url"),  # Optional link for CTA
+        "expires_at": notif.get("expires_at")  # Optional expiry
+    }
+
+
+async def unread_count(db: AsyncIOMotorDatabase, sidhi_id: str) -> int:
+    state = await _read_state(db, sidhi_id)
+    return await db.notifications.count_documents(_unread_query(sidhi_id, state))
+
+
+async def get_inbox(
+    db: AsyncIOMotorDatabase,
+    sidhi_id: str,
+    unread_only: bool = False,
+    limit: int = INBOX_LIMIT
+) -> Dict:
+    """Newest-first inbox with read flags and the unread count"""
+    state = await _read_state(db, sidhi_id)
+    query = _unread_query(sidhi_id, state) if unread_only else _inbox_query(sidhi_id)
+
+    notifications, unread = await asyncio.gather(
+        db.notifications.find(query, {"target_users": 0, "audience": 0})
+            .sort("created_at", -1)
+            .limit(limit)
+            .to_list(length=limit),
+        db.notifications.count_documents(_unread_query(sidhi_id, state))
+    )
+
+    formatted = [_format(n, _is_read(n, sidhi_id, state)) for n in notifications]
+    return {
+        "notifications": formatted,
+        "count": len(formatted),
+        "unread_count": unread
+    }
+
+
+async def read_counts(db: AsyncIOMotorDatabase, notifications: List[Dict]) -> Dict[str, int]:
+    """Per-notification read counts for the admin history page"""
+    async def count(notif: Dict) -> int:
+        query = {"$or": [
+            {"watermark": {"$gte": notif["created_at"]}},
+            {"read_ids": notif["_id"]}
+        ]}
+        if notif.get("target_type") == "specific":
+            query["sidhi_id"] = {"$in": notif.get("target_users", [])}
+        return await db.notification_reads.count_documents(query) + len(notif.get("read_by", []))
+
+    counts = await asyncio.gather(*(count(n) for n in notifications))
+    return {str(n["_id"]): c for n, c in zip(notifications, counts)}
+
+
+# ============================================================================
+# Streaming delivery (SSE)
+# ============================================================================
+
+async def stream_notifications(db: AsyncIOMotorDatabase, sidhi_id: str) -> AsyncGenerator[str, None]:
+    """
+    Server-sent events: one `notification` event per new notification and
+    an `unread` event with the current count. Wakes immediately for
+    notifications created on this worker and polls for the rest.
+    """
+    cursor_time = datetime.utcnow()
+    yield f"event: unread\ndata: {json.dumps({'unread_count': await unread_count(db, sidhi_id)})}\n\n"
+
+    last_sent = asyncio.get_running_loop().time()
+    while True:
+        try:
+            await asyncio.wait_for(_new_notification.wait(), timeout=STREAM_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+        fresh = await db.notifications.find(
+            _inbox_query(sidhi_id, cursor_time),
+            {"target_users": 0, "audience": 0}
+        ).sort("created_at", 1).to_list(length=INBOX_LIMIT)
+
+        now = asyncio.get_running_loop().time()
+        if fresh:
+            cursor_time = fresh[-1]["created_at"]
+            for notif in fresh:
+                yield f"event: notification\ndata: {json.dumps(_format(notif, False), default=str)}\n\n"
+            yield f"event: unread\ndata: {json.dumps({'unread_count': await unread_count(db, sidhi_id)})}\n\n"
+            last_sent = now
+        elif now - last_sent >= STREAM_HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = now
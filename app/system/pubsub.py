@@ -0,0 +1,374 @@
+"""
+Cross-worker pub/sub backplane for WebSocket fan-out (chat rooms, code streams)
+
+Each worker delivers to its own sockets through a Fanout; the backplane
+carries messages between workers so a spectator on worker B sees a
+streamer on worker A.
+
+    PUBSUB_BACKEND = memory (default, single process) | redis | mongo
+
+    memory - in-process bus; also what tests use (several hubs on one
+             MemoryBackplane behave like several workers)
+    redis  - any Redis-protocol server; one PUBLISH channel per room or
+             streamer, subscribed only while a local socket needs it
+    mongo  - inserts into a short-lived collection read through a change
+             stream (polling when the deployment has no change streams,
+             see app.system.mongo_events)
+
+Besides messages, a channel can retain one value - the latest code frame
+for late joiners, or a chat room's password HMAC - with an expiry.
+retain_if_absent() claims a channel's value atomically across workers.
+
+A hub publishes to its local sockets directly and to the backplane for
+everyone else; it ignores its own messages when they come back.
+"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from fastapi import WebSocket
+
+from app.system.fanout import Fanout, Outbox, serialize
+from app.system.mongo_events import publish_event, tail_events
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory").lower()
+PUBSUB_REDIS_URL = os.getenv("PUBSUB_REDIS_URL", os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+RETAIN_TTL = int(os.getenv("PUBSUB_RETAIN_TTL", "3600"))  # seconds
+
+CHANNEL_PREFIX = "lumetrics:pubsub:"
+
+
+# ============================================================================
+# Backends
+# ============================================================================
+
+class Backplane(ABC):
+    """
+    Transport between workers. Subclasses implement the abstract methods;
+    run() is the worker's single listener task and dispatches each message
+    to the handler registered for its channel.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+
+    async def subscribe(self, channel: str, handler: Callable[[dict], None]):
+        first = channel not in self._handlers
+        self._handlers[channel] = handler
+        if first:
+            await self._on_subscribe(channel)
+
+    async def unsubscribe(self, channel: str):
+        if self._handlers.pop(channel, None) is not None:
+            await self._on_unsubscribe(channel)
+
+    async def publish(self, channel: str, message: dict):
+        await self._publish(channel, message)
+
+    @abstractmethod
+    async def retain(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL):
+        ...
+
+    @abstractmethod
+    async def retain_if_absent(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL) -> str:
+        """Retain `value` unless the channel holds one; returns whichever is retained now"""
+
+    @abstractmethod
+    async def latest(self, channel: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def forget(self, channel: str):
+        ...
+
+    async def run(self):
+        """Background task: dispatch incoming messages, reconnecting on errors"""
+        while True:
+            try:
+                async for channel, message in self._listen():
+                    handler = self._handlers.get(channel)
+                    if handler:
+                        handler(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Pub/sub listener error: {e}")
+                await asyncio.sleep(1)
+
+    async def _on_subscribe(self, channel: str):
+        pass
+
+    async def _on_unsubscribe(self, channel: str):
+        pass
+
+    @abstractmethod
+    async def _publish(self, channel: str, message: dict):
+        ...
+
+    @abstractmethod
+    async def _listen(self):
+        """Async iterator of (channel, message)"""
+        yield
+
+
+class MemoryBackplane(Backplane):
+    """In-process bus with the same semantics as the shared backends"""
+
+    def __init__(self):
+        super().__init__()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._retained: Dict[str, tuple] = {}
+
+    async def _publish(self, channel: str, message: dict):
+        self._queue.put_nowait((channel, message))
+
+    async def retain(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL):
+        self._retained[channel] = (value, time.monotonic() + ttl_seconds)
+
+    async def retain_if_absent(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL) -> str:
+        current = await self.latest(channel)
+        if current is not None:
+            return current
+        await self.retain(channel, value, ttl_seconds)
+        return value
+
+    async def latest(self, channel: str) -> Optional[str]:
+        entry = self._retained.get(channel)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._retained.pop(channel, None)
+            return None
+        return value
+
+    async def forget(self, channel: str):
+        self._retained.pop(channel, None)
+
+    async def _listen(self):
+        while True:
+            yield await self._queue.get()
+
+
+class RedisBackplane(Backplane):
+    """Any Redis-protocol server (Redis, KeyDB, Dragonfly, Valkey)"""
+
+    def __init__(self, url: str = PUBSUB_REDIS_URL):
+        super().__init__()
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("PUBSUB_BACKEND=redis requires the 'redis' package")
+        self._redis = aioredis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        # Keeps the connection subscribed while no room/stream is open here
+        self._control = f"{CHANNEL_PREFIX}__worker:{uuid.uuid4().hex}"
+
+    async def _on_subscribe(self, channel: str):
+        await self._pubsub.subscribe(CHANNEL_PREFIX + channel)
+
+    async def _on_unsubscribe(self, channel: str):
+        await self._pubsub.unsubscribe(CHANNEL_PREFIX + channel)
+
+    async def _publish(self, channel: str, message: dict):
+        await self._redis.publish(CHANNEL_PREFIX + channel, json.dumps(message))
+
+    async def retain(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL):
+        await self._redis.set(f"{CHANNEL_PREFIX}latest:{channel}", value, px=max(1, int(ttl_seconds * 1000)))
+
+    async def retain_if_absent(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL) -> str:
+        key = f"{CHANNEL_PREFIX}latest:{channel}"
+        while True:
+            if await self._redis.set(key, value, nx=True, px=max(1, int(ttl_seconds * 1000))):
+                return value
+            current = await self.latest(channel)
+            if current is not None:
+                return current
+            # Expired between the two calls - try again
+
+    async def latest(self, channel: str) -> Optional[str]:
+        raw = await self._redis.get(f"{CHANNEL_PREFIX}latest:{channel}")
+        return raw.decode("utf-8") if raw is not None else None
+
+    async def forget(self, channel: str):
+        await self._redis.delete(f"{CHANNEL_PREFIX}latest:{channel}")
+
+    async def _listen(self):
+        await self._pubsub.subscribe(self._control)
+        async for raw in self._pubsub.listen():
+            if raw.get("type") != "message":
+                continue
+            name = raw["channel"].decode("utf-8")
+            if name.startswith(CHANNEL_PREFIX):
+                yield name[len(CHANNEL_PREFIX):], json.loads(raw["data"])
+
+
+class MongoBackplane(Backplane):
+    """
+    Messages are inserts into `pubsub_events` (kept for a minute) read
+    through a change stream; retained values live in `pubsub_retained`.
+    Both expire through TTL indexes.
+    """
+
+    EVENT_TTL_SECONDS = 60
+    POLL_INTERVAL = 0.25
+
+    def __init__(self):
+        super().__init__()
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self._db = AsyncIOMotorClient(os.getenv("MONGO_URL")).lumetrics_db
+        self._events = self._db.pubsub_events
+        self._retained = self._db.pubsub_retained
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self._events.create_index("created_at", expireAfterSeconds=self.EVENT_TTL_SECONDS)
+            await self._retained.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+
+    async def _publish(self, channel: str, message: dict):
+        await publish_event(self._events, {"channel": channel, **message})
+
+    async def retain(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL):
+        await self._retained.update_one(
+            {"_id": channel},
+            {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+
+    async def retain_if_absent(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL) -> str:
+        from pymongo.errors import DuplicateKeyError
+
+        await self._ensure_indexes()
+        while True:
+            now = datetime.utcnow()
+            # Expired values may linger until the TTL monitor runs - clear them first
+            await self._retained.delete_one({"_id": channel, "expires_at": {"$lte": now}})
+            try:
+                await self._retained.insert_one({
+                    "_id": channel,
+                    "value": value,
+                    "expires_at": now + timedelta(seconds=ttl_seconds)
+                })
+                return value
+            except DuplicateKeyError:
+                current = await self.latest(channel)
+                if current is not None:
+                    return current
+
+    async def latest(self, channel: str) -> Optional[str]:
+        doc = await self._retained.find_one({"_id": channel, "expires_at": {"$gt": datetime.utcnow()}})
+        return doc["value"] if doc else None
+
+    async def forget(self, channel: str):
+        await self._retained.delete_one({"_id": channel})
+
+    @staticmethod
+    def _message(doc: dict) -> tuple:
+        return doc["channel"], {k: v for k, v in doc.items() if k not in ("_id", "channel", "created_at")}
+
+    async def _listen(self):
+        await self._ensure_indexes()
+        async for doc in tail_events(self._events, self.POLL_INTERVAL):
+            yield self._message(doc)
+
+
+def _create_backplane() -> Backplane:
+    if PUBSUB_BACKEND == "redis":
+        return RedisBackplane()
+    if PUBSUB_BACKEND == "mongo":
+        return MongoBackplane()
+    return MemoryBackplane()
+
+
+_backplane: Optional[Backplane] = None
+
+
+def get_backplane() -> Backplane:
+    global _backplane
+    if _backplane is None:
+        _backplane = _create_backplane()
+    return _backplane
+
+
+async def run_backplane_listener():
+    """Lifespan task: feed messages from other workers to local sockets"""
+    await get_backplane().run()
+
+
+# ============================================================================
+# Hub: local fan-out + backplane for one namespace
+# ============================================================================
+
+class BroadcastHub:
+    """
+    Channels of one kind ("chat", "stream") on this worker. join/leave
+    manage local sockets and the backplane subscription; publish reaches
+    local sockets immediately and other workers through the backplane.
+    """
+
+    def __init__(self, namespace: str, fanout: Fanout, backplane: Optional[Backplane] = None):
+        self.namespace = namespace
+        self.fanout = fanout
+        self._backplane = backplane
+        self.origin = uuid.uuid4().hex
+
+    @property
+    def backplane(self) -> Backplane:
+        return self._backplane or get_backplane()
+
+    def _channel(self, channel: str) -> str:
+        return f"{self.namespace}:{channel}"
+
+    def _deliver(self, channel: str, message: dict):
+        if message.get("origin") != self.origin:
+            self.fanout.publish_text(channel, message["text"])
+
+    async def join(self, channel: str, websocket: WebSocket, replay: Optional[str] = None) -> Outbox:
+        """
+        Subscribe a socket; `replay` (e.g. the retained frame) is queued
+        before anything published after the subscription
+        """
+        outbox = self.fanout.subscribe(channel, websocket)
+        if replay is not None:
+            outbox.offer(replay)
+        if self.fanout.subscriber_count(channel) == 1:
+            await self.backplane.subscribe(
+                self._channel(channel),
+                lambda message: self._deliver(channel, message)
+            )
+        return outbox
+
+    async def leave(self, channel: str, websocket: WebSocket):
+        self.fanout.unsubscribe(channel, websocket)
+        if not self.fanout.subscriber_count(channel):
+            await self.backplane.unsubscribe(self._channel(channel))
+
+    async def publish(self, channel: str, message: dict, retain: bool = False) -> str:
+        """Deliver everywhere; returns the serialized text"""
+        text = serialize(message)
+        self.fanout.publish_text(channel, text)
+        await self.backplane.publish(self._channel(channel), {"origin": self.origin, "text": text})
+        if retain:
+            await self.backplane.retain(self._channel(channel), text)
+        return text
+
+    async def retain(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL):
+        await self.backplane.retain(self._channel(channel), value, ttl_seconds)
+
+    async def retain_if_absent(self, channel: str, value: str, ttl_seconds: float = RETAIN_TTL) -> str:
+        return await self.backplane.retain_if_absent(self._channel(channel), value, ttl_seconds)
+
+    async def latest(self, channel: str) -> Optional[str]:
+        return await self.backplane.latest(self._channel(channel))
+
+    async def forget(self, channel: str):
+        await self.backplane.forget(self._channel(channel))
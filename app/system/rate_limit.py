@@ -0,0 +1,214 @@
+"""
+Request rate limiting (GCRA) usable as a FastAPI dependency
+
+    limiter = rate_limit("payment:initiate", 5, 60, identity=verify_client_bound_request)
+
+    @router.post("/tier/initiate", dependencies=[Depends(limiter)])
+
+"N requests per window, bursts up to N" is enforced with the generic cell
+rate algorithm: each key stores one number, its theoretical arrival time
+(TAT). A request at `now` is allowed when TAT - now <= window - window/N,
+and then moves TAT forward by window/N. This behaves like a sliding window
+with O(1) state and O(1) work per request.
+
+Keys are "<name>:<client ip>:<user>" (user omitted without `identity`).
+Rejections are 429 with Retry-After.
+
+    RATE_LIMIT_BACKEND = local (default, per worker) | redis | mongo
+
+    local  - bounded LRU (RATE_LIMIT_MAX_KEYS); a key whose TAT has passed
+             holds no information and is evicted as soon as it reaches the
+             idle end
+    redis  - one key per client, updated by a Lua script, expiring when idle
+    mongo  - one document per client, updated by an atomic pipeline
+             update, removed by a TTL index
+
+If the shared backend errors, the worker falls back to its local state
+for that request rather than failing the endpoint.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, Request
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+EVICT_PER_CALL = 8
+
+KEY_PREFIX = "lumetrics:ratelimit:"
+
+
+# ============================================================================
+# Stores - each returns 0 when the request is allowed, else seconds to wait
+# ============================================================================
+
+class LocalLimiterStore:
+    """Per-worker TATs in an LRU; no awaits, so atomic on the event loop"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    def check(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        self._evict_idle(now)
+        tat = max(self._tats.get(key, now), now)
+        if tat - now > tolerance:
+            self._tats.move_to_end(key)
+            return tat - now - tolerance
+
+        self._tats[key] = tat + interval
+        self._tats.move_to_end(key)
+        if len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        return 0.0
+
+    def _evict_idle(self, now: float):
+        for _ in range(EVICT_PER_CALL):
+            if not self._tats:
+                return
+            key, tat = next(iter(self._tats.items()))
+            if tat > now:
+                return
+            del self._tats[key]
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class RedisLimiterStore:
+    """Any Redis-protocol server; the GCRA step runs server-side in Lua"""
+
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local tolerance = tonumber(ARGV[3])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+    if tat < now then tat = now end
+    if tat - now > tolerance then
+        return tostring(tat - now - tolerance)
+    end
+    tat = tat + interval
+    redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+    return '0'
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def check(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        result = await self._script(keys=[KEY_PREFIX + key], args=[now, interval, tolerance])
+        return float(result)
+
+
+class MongoLimiterStore:
+    """`rate_limits` collection: {_id: key, tat, expires_at}"""
+
+    def __init__(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self._collection = AsyncIOMotorClient(os.getenv("MONGO_URL")).lumetrics_db.rate_limits
+        self._indexes_ready = False
+
+    async def check(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        from pymongo import ReturnDocument
+
+        if not self._indexes_ready:
+            await self._collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+
+        # Same step as the local store, in one atomic pipeline update
+        doc = await self._collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"_tat": {"$max": [{"$ifNull": ["$tat", now]}, now]}}},
+                {"$set": {"_allowed": {"$lte": [{"$subtract": ["$_tat", now]}, tolerance]}}},
+                {"$set": {
+                    "tat": {"$cond": ["$_allowed", {"$add": ["$_tat", interval]}, "$_tat"]},
+                    "retry_after": {"$cond": ["$_allowed", 0, {"$subtract": [{"$subtract": ["$_tat", now]}, tolerance]}]},
+                    "expires_at": datetime.utcnow() + timedelta(seconds=tolerance + interval),
+                }},
+                {"$unset": ["_tat", "_allowed"]},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return float(doc.get("retry_after", 0))
+
+
+def _create_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisLimiterStore()
+    if RATE_LIMIT_BACKEND == "mongo":
+        return MongoLimiterStore()
+    return None
+
+
+_local_store = LocalLimiterStore()
+_shared_store = _create_store()
+
+
+async def check_rate_limit(key: str, max_requests: int, window_seconds: float) -> float:
+    """0 when allowed (and counted), otherwise seconds until the next request fits"""
+    interval = window_seconds / max_requests
+    tolerance = window_seconds - interval
+    now = time.time()
+    if _shared_store is not None:
+        try:
+            return await _shared_store.check(key, interval, tolerance, now)
+        except Exception as e:
+            print(f"⚠️ Rate limit backend error, using local state: {e}")
+    return _local_store.check(key, interval, tolerance, now)
+
+
+# ============================================================================
+# FastAPI dependency
+# ============================================================================
+
+def _subject(identity) -> str:
+    if isinstance(identity, dict):
+        return str(identity.get("sub") or "anonymous")
+    return str(identity or "anonymous")
+
+
+def rate_limit(
+    name: str,
+    max_requests: int,
+    window_seconds: float = 60,
+    identity: Optional[Callable] = None
+) -> Callable:
+    """
+    Dependency allowing `max_requests` per `window_seconds` per client.
+    `identity` is the route's auth dependency (resolved once per request,
+    so it is not run twice); its result - a token payload or a user id -
+    becomes part of the key.
+    """
+    async def enforce(request: Request, subject: str):
+        client_ip = request.client.host if request.client else "unknown"
+        retry_after = await check_rate_limit(f"{name}:{client_ip}:{subject}", max_requests, window_seconds)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded. Max {max_requests} requests per {window_seconds:g} seconds.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+    if identity is None:
+        async def limiter(request: Request):
+            await enforce(request, "-")
+    else:
+        async def limiter(request: Request, user=Depends(identity)):
+            await enforce(request, _subject(user))
+
+    return limiter
+
@@ -55,6 +55,10 @@ async def create_teacher_indexes():
     await db.plagiarism_results.create_index([("assignment_id", 1), ("flag", 1)])
     await db.plagiarism_results.create_index([("assignment_id", 1), ("reviewed_by_teacher", 1)])
     
+    # AI generation jobs
+    await db.ai_generation_jobs.create_index("job_id", unique=True)
+    await db.ai_generation_jobs.create_index([("teacher_user_id", 1), ("created_at", -1)])
+    
     # Audit logs
     await db.audit_logs.create_index("actor_user_id")
     await db.audit_logs.create_index([("target_type", 1), ("target_id", 1)])
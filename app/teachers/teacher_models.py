@@ -26,6 +26,13 @@ class SourceType(str, Enum):
     DOCUMENT = "document"
     AI = "ai"
 
+class AIJobStatus(str, Enum):
+    GENERATING_QUESTIONS = "generating_questions"
+    GENERATING_TESTCASES = "generating_testcases"
+    COMPLETED = "completed"
+    COMPLETED_WITH_ERRORS = "completed_with_errors"  # Some questions failed - retryable
+    FAILED = "failed"
+
 class PlagiarismFlag(str, Enum):
     GREEN = "green"
     YELLOW = "yellow"
@@ -63,6 +70,8 @@ class Classroom(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     join_password_hash: Optional[str] = None
     max_students: Optional[int] = None
+    student_count: int = 0  # Denormalized, $inc on join/leave
+    assignment_count: int = 0  # Denormalized, $inc on assignment create
 
 
 class Assignment(BaseModel):
@@ -169,3 +178,21 @@ class AssignmentQuestion(BaseModel):
     prompt: str
     language: str
     marks: Optional[int] = None
+
+class AIGenerationJob(BaseModel):
+    """
+    Background AI assignment generation job
+    Per-question progress is persisted so completed work survives failures
+    """
+    job_id: str  # AIJOB_XXXXXX
+    classroom_id: str
+    teacher_user_id: str
+    topic: str
+    num_questions: int
+    assignment_data: dict  # AssignmentCreate payload used to create the assignment
+    assignment_id: Optional[str] = None  # Reserved when the job is created
+    status: AIJobStatus = AIJobStatus.GENERATING_QUESTIONS
+    questions: List[dict] = []  # {question_id, prompt, language, marks, status, testcases_created, error}
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List
 from app.teachers.teacher_permissions import (
     get_current_teacher, 
@@ -22,7 +22,6 @@ from app.teachers.teacher_schemas import (
 )
 from app.teachers import teacher_service as service
 from fastapi.responses import StreamingResponse
-import io
 from app.teachers.teacher_models import SourceType
 from datetime import datetime
 
@@ -127,6 +126,8 @@ async def remove_student_from_classroom(
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Student not found in classroom")
     
+    await service.adjust_classroom_counter(classroom_id, "student_count", -1)
+    
     await log_audit(
         teacher, 
         "remove_student", 
@@ -311,6 +312,9 @@ async def approve_all_submissions(
             }}
         )
     
+    if submissions:
+        await service.invalidate_submission_analytics(assignment_id)
+    
     return {
         "status": "success",
         "approved_count": len(submissions),
@@ -602,7 +606,6 @@ async def get_record_notes(
 
 # Add to imports
 from fastapi.responses import StreamingResponse
-import io
 
 # ADD AI generation endpoint
 @router.post("/assignments/generate-with-ai", response_model=AssignmentResponse, status_code=201)
@@ -648,7 +651,10 @@ async def generate_assignment_with_ai(
     assignment_data = data.dict(exclude={'ai_topic', 'ai_num_questions'})
     assignment_data['questions'] = ai_result['questions']
     
-    assignment = await service.create_assignment(classroom_id, teacher, assignment_data)
+    # Test cases come from ai_result - skip the per-question auto-generation pass
+    assignment = await service.create_assignment(
+        classroom_id, teacher, assignment_data, auto_generate_testcases=False
+    )
     assignment_id = assignment['assignment_id']
     
     # Create test cases
@@ -692,24 +698,101 @@ async def generate_assignment_with_ai(
     return await service.get_assignment_with_stats(assignment_id)
 
 
-# MODIFY export endpoint to actually return CSV
+@router.post("/assignments/generate-with-ai/jobs", status_code=202)
+async def start_ai_generation_job(
+    classroom_id: str,
+    data: AssignmentCreate,
+    teacher: TeacherContext = Depends(get_current_teacher)
+):
+    """
+    Start AI assignment generation in the background
+    Poll /teacher/ai-jobs/{job_id} or stream /teacher/ai-jobs/{job_id}/events
+    """
+    await verify_classroom_ownership(classroom_id, teacher)
+    
+    if not data.ai_topic or not data.ai_num_questions:
+        raise HTTPException(
+            status_code=400,
+            detail="ai_topic and ai_num_questions (1-15) are required for AI generation"
+        )
+    
+    data.source_type = SourceType.AI
+    return await service.start_ai_generation_job(classroom_id, teacher, data.dict())
+
+@router.get("/ai-jobs/{job_id}")
+async def get_ai_generation_job(
+    job_id: str,
+    teacher: TeacherContext = Depends(get_current_teacher)
+):
+    """
+    Get AI generation job status with per-question progress
+    """
+    return await service.get_ai_generation_job(job_id, teacher)
+
+@router.get("/ai-jobs/{job_id}/events")
+async def stream_ai_generation_job(
+    job_id: str,
+    teacher: TeacherContext = Depends(get_current_teacher)
+):
+    """
+    Server-Sent Events stream of job progress, ends with [DONE]
+    """
+    events = await service.stream_ai_generation_job(job_id, teacher)
+    
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@router.post("/ai-jobs/{job_id}/retry")
+async def retry_ai_generation_job(
+    job_id: str,
+    teacher: TeacherContext = Depends(get_current_teacher)
+):
+    """
+    Retry a failed or stalled job - only unfinished questions are regenerated
+    """
+    return await service.retry_ai_generation_job(job_id, teacher)
+
+
+# Streaming submission export (csv / csv.gz / parquet / arrow)
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
 @router.get("/assignments/{assignment_id}/export-csv")
 async def export_assignment_csv(
     assignment_id: str,
+    format: str = Query("csv", regex="^(csv|parquet|arrow)$", description="csv, parquet or arrow"),
+    gzip: bool = Query(False, description="Gzip-compress CSV output"),
     teacher: TeacherContext = Depends(get_current_teacher)
 ):
     """
-    Export all submissions as CSV file
+    Export all submissions as a downloadable file, streamed in batches
     """
     await verify_assignment_ownership(assignment_id, teacher)
     
-    csv_content = await service.export_assignment_submissions_csv(assignment_id)
+    filename = f"assignment_{assignment_id}_submissions.{format}"
+    media_type = EXPORT_MEDIA_TYPES[format]
+    
+    if format == "csv":
+        body = await service.stream_assignment_submissions_csv(assignment_id, compress=gzip)
+        if gzip:
+            filename += ".gz"
+            media_type = "application/gzip"
+    else:
+        body = await service.stream_assignment_submissions_arrow(assignment_id, file_format=format)
     
-    # Return as downloadable file
     return StreamingResponse(
-        io.StringIO(csv_content),
-        media_type="text/csv",
+        body,
+        media_type=media_type,
         headers={
-            "Content-Disposition": f"attachment; filename=assignment_{assignment_id}_submissions.csv"
+            "Content-Disposition": f"attachment; filename={filename}"
         }
-    )
\ No newline at end of file
+    )
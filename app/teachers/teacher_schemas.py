@@ -196,6 +196,8 @@ class ClassroomAnalytics(BaseModel):
     avg_submission_rate: float
     avg_score: float
     active_students: int
+    score_percentiles: dict = {}  # {"p25": .., "p50": .., "p75": .., "p90": ..}
+    score_histogram: List[dict] = []  # [{"range": "0-10", "count": 3}, ...]
 
 class AssignmentScorecard(BaseModel):
     assignment_id: str
@@ -207,6 +209,8 @@ class AssignmentScorecard(BaseModel):
     avg_attempts: float
     on_time_submissions: int
     late_submissions: int
+    score_percentiles: dict = {}
+    score_histogram: List[dict] = []
 # ClassroomCreate — password is MANDATORY (min 6 chars)
 class ClassroomCreate(BaseModel):
     name: str = Field(..., min_length=3, max_length=100)
@@ -1,18 +1,28 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 import secrets
 from app.teachers.teacher_permissions import TeacherContext, db
 from app.teachers.teacher_models import (
     Classroom, Assignment, TestCase, Submission,
-    ClassroomVisibility, AssignmentStatus
+    ClassroomVisibility, AssignmentStatus,
+    AIGenerationJob, AIJobStatus
 )
 from app.teachers.common_audit import log_audit
+from app.system.cache import get_cache
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 import hashlib
 import csv
 import io
+import zlib
 from app.ai.gemini_core import run_gemini
 import json
+import asyncio
+import os
+import re
+
+AI_GENERATION_CONCURRENCY = int(os.getenv("AI_GENERATION_CONCURRENCY", "4"))
+_ai_generation_semaphore = asyncio.Semaphore(AI_GENERATION_CONCURRENCY)
 
 def generate_id(prefix: str) -> str:
     """Generate unique ID with prefix"""
@@ -95,11 +105,63 @@ async def get_teacher_classrooms(teacher: TeacherContext) -> List[dict]:
     
     classrooms = await cursor.to_list(length=None)
     
-    results = []
+    # Legacy classrooms predate the denormalized counters - backfill them in one pass
+    missing = [
+        cls for cls in classrooms
+        if "student_count" not in cls or "assignment_count" not in cls
+    ]
+    if missing:
+        await backfill_classroom_counters(missing)
+    
     for cls in classrooms:
-        results.append(await get_classroom_with_stats(cls["classroom_id"]))
+        cls.pop("_id", None)
     
-    return results
+    return classrooms
+
+async def _count_by_classroom(collection, classroom_ids: List[str], extra_match: dict = None) -> dict:
+    """Grouped count per classroom_id in a single aggregation"""
+    match = {"classroom_id": {"$in": classroom_ids}, **(extra_match or {})}
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$classroom_id", "count": {"$sum": 1}}}
+    ]
+    rows = await collection.aggregate(pipeline).to_list(length=None)
+    return {row["_id"]: row["count"] for row in rows}
+
+async def backfill_classroom_counters(classrooms: List[dict]):
+    """
+    Compute student/assignment counts for classrooms missing the
+    denormalized counters and persist them on the classroom documents.
+    Mutates the passed classroom dicts in place.
+    """
+    classroom_ids = [cls["classroom_id"] for cls in classrooms]
+    
+    student_counts = await _count_by_classroom(
+        db.classroom_memberships, classroom_ids, {"is_active": True}
+    )
+    assignment_counts = await _count_by_classroom(db.assignments, classroom_ids)
+    
+    for cls in classrooms:
+        counters = {
+            "student_count": student_counts.get(cls["classroom_id"], 0),
+            "assignment_count": assignment_counts.get(cls["classroom_id"], 0)
+        }
+        cls.update(counters)
+        await db.classrooms.update_one(
+            {"classroom_id": cls["classroom_id"]},
+            {"$set": counters}
+        )
+
+async def adjust_classroom_counter(classroom_id: str, field: str, delta: int):
+    """
+    Increment a denormalized classroom counter.
+    Only touches classrooms whose counter is already initialised; legacy
+    documents get an exact value from backfill_classroom_counters instead.
+    """
+    await db.classrooms.update_one(
+        {"classroom_id": classroom_id, field: {"$exists": True}},
+        {"$inc": {field: delta}}
+    )
 
 async def get_classroom_with_stats(classroom_id: str) -> dict:
     """Get classroom with student and assignment counts"""
@@ -108,17 +170,9 @@ async def get_classroom_with_stats(classroom_id: str) -> dict:
     if not classroom:
         raise HTTPException(status_code=404, detail="Classroom not found")
     
-    student_count = await db.classroom_memberships.count_documents({
-        "classroom_id": classroom_id,
-        "is_active": True
-    })
-    
-    assignment_count = await db.assignments.count_documents({
-        "classroom_id": classroom_id
-    })
+    if "student_count" not in classroom or "assignment_count" not in classroom:
+        await backfill_classroom_counters([classroom])
     
-    classroom["student_count"] = student_count
-    classroom["assignment_count"] = assignment_count
     classroom.pop("_id", None)
     
     return classroom
@@ -176,9 +230,16 @@ async def get_classroom_students(classroom_id: str) -> List[dict]:
     
     memberships = await cursor.to_list(length=None)
     
+    # One $in lookup instead of a find_one per membership
+    profiles = await db.users_profile.find(
+        {"user_id": {"$in": [mem["student_user_id"] for mem in memberships]}},
+        {"_id": 0, "user_id": 1, "username": 1, "email_id": 1, "department": 1}
+    ).to_list(length=None)
+    profiles_by_id = {p["user_id"]: p for p in profiles}
+    
     students = []
     for mem in memberships:
-        profile = await db.users_profile.find_one({"user_id": mem["student_user_id"]})
+        profile = profiles_by_id.get(mem["student_user_id"])
         if profile:
             students.append({
                 "user_id": mem["student_user_id"],
@@ -238,7 +299,7 @@ Requirements:
 Generate {num_testcases} test cases now."""
 
     try:
-        tc_response = run_gemini(tc_prompt)
+        tc_response = await run_gemini_async(tc_prompt)
         
         # Clean response (remove markdown code blocks)
         clean_tc = tc_response.strip()
@@ -279,12 +340,19 @@ async def create_assignment(
     classroom_id: str, 
     teacher: TeacherContext, 
     data: dict,
-    auto_generate_testcases: bool = True
+    auto_generate_testcases: bool = True,
+    assignment_id: Optional[str] = None
 ) -> dict:
     """
     Create a new assignment in classroom
+    A caller-reserved assignment_id makes the call idempotent: if that
+    assignment already exists it is returned unchanged.
     """
-    assignment_id = generate_id("ASG")
+    if assignment_id:
+        if await db.assignments.find_one({"assignment_id": assignment_id}, {"_id": 1}):
+            return await get_assignment_with_stats(assignment_id)
+    else:
+        assignment_id = generate_id("ASG")
     
     assignment = Assignment(
         assignment_id=assignment_id,
@@ -295,7 +363,12 @@ async def create_assignment(
     )
     
     # Save assignment to database
-    await db.assignments.insert_one(assignment.dict())
+    try:
+        await db.assignments.insert_one(assignment.dict())
+    except DuplicateKeyError:
+        # Lost a race on a reserved id - the other insert counted it
+        return await get_assignment_with_stats(assignment_id)
+    await adjust_classroom_counter(classroom_id, "assignment_count", 1)
     await log_audit(teacher, "create_assignment", "assignment", assignment_id)
     
     # Auto-generate test cases for all questions
@@ -382,16 +455,23 @@ async def get_assignment_with_stats(assignment_id: str) -> dict:
     assignment.pop("_id", None)
     
     return assignment
-async def generate_assignment_with_ai(
-    classroom_id: str,
-    teacher: TeacherContext,
-    topic: str,
-    num_questions: int,
-    allowed_languages: List[str]
-) -> dict:
+def _parse_ai_json(response: str) -> dict:
+    """Parse a JSON reply from the model, tolerating markdown code fences"""
+    clean = response.strip()
+    if clean.startswith('```'):
+        clean = '\n'.join(clean.split('\n')[1:-1])
+    return json.loads(clean)
+
+async def run_gemini_async(prompt: str) -> str:
     """
-    Generate assignment questions and test cases using AI
+    Run the blocking Gemini call in a worker thread.
+    A shared semaphore caps in-flight calls across all generation jobs.
     """
+    async with _ai_generation_semaphore:
+        return await asyncio.to_thread(run_gemini, prompt)
+
+async def generate_ai_questions(topic: str, num_questions: int, allowed_languages: List[str]) -> List[dict]:
+    """Generate the question set for an AI assignment (question_id attached)"""
     # Build prompt for question generation
     prompt = f"""You are an expert programming instructor. Generate {num_questions} coding questions on the topic: "{topic}".
 
@@ -414,47 +494,36 @@ Return ONLY valid JSON in this exact format:
 
 Generate {num_questions} questions now."""
 
-    # Call Gemini
-    response = run_gemini(prompt)
+    response = await run_gemini_async(prompt)
     
-    # Parse response
     try:
-        # Remove markdown code blocks if present
-        clean_response = response.strip()
-        if clean_response.startswith('```'):
-            clean_response = '\n'.join(clean_response.split('\n')[1:-1])
-        
-        questions_data = json.loads(clean_response)
-        questions = questions_data.get('questions', [])
-        
-        if not questions:
-            raise ValueError("No questions generated")
-        
-        # Limit to requested number
-        questions = questions[:num_questions]
-        
+        questions = _parse_ai_json(response).get('questions', [])
     except json.JSONDecodeError:
         raise HTTPException(
             status_code=500,
             detail="AI generated invalid response. Please try again."
         )
     
-    # Generate question IDs
+    if not questions:
+        raise HTTPException(
+            status_code=500,
+            detail="AI generated no questions. Please try again."
+        )
+    
+    # Limit to requested number
+    questions = questions[:num_questions]
+    
     for q in questions:
         q['question_id'] = generate_id("Q")
     
-    # Now generate test cases for each question
-    testcases_generated = 0
-    all_testcases = []
-    
-    for question in questions:
-        question_id = question.get('question_id')  # ✅ CRITICAL ADDITION
-        
-        if not question_id:
-            print("[WARNING] Question missing question_id, skipping test case generation")
-            continue
+    return questions
 
-        tc_prompt = f"""Generate 3 test cases for this coding problem:
+async def generate_ai_question_testcases(question: dict) -> List[dict]:
+    """
+    Generate 3 test cases (2 visible, 1 hidden) for one AI question.
+    Raises on invalid model output so callers can record the failure.
+    """
+    tc_prompt = f"""Generate 3 test cases for this coding problem:
 
 Problem: {question['prompt']}
 Language: {question['language']}
@@ -473,111 +542,505 @@ Return ONLY valid JSON:
 
 Generate 3 test cases (2 visible, 1 hidden)."""
 
-        try:
-            tc_response = run_gemini(tc_prompt)
-            clean_tc = tc_response.strip()
-            if clean_tc.startswith('```'):
-                clean_tc = '\n'.join(clean_tc.split('\n')[1:-1])
-            
-            tc_data = json.loads(clean_tc)
-            testcases = tc_data.get('testcases', [])
-            
-            # Mark last one as hidden
-            if len(testcases) >= 3:
-                testcases[2]['is_hidden'] = True
-            
-            # ✅ CRITICAL FIX: attach question_id to every testcase
-            for tc in testcases:
-                tc['question_id'] = question_id
-            
-            all_testcases.extend(testcases)
-            testcases_generated += len(testcases)
-            
-        except Exception as e:
-            print(f"[WARNING] Testcase generation failed for question {question_id}: {e}")
+    tc_response = await run_gemini_async(tc_prompt)
+    testcases = _parse_ai_json(tc_response).get('testcases', [])
+    
+    # Mark last one as hidden
+    if len(testcases) >= 3:
+        testcases[2]['is_hidden'] = True
+    
+    # ✅ CRITICAL FIX: attach question_id to every testcase
+    for tc in testcases:
+        tc['question_id'] = question['question_id']
+    
+    return testcases
+
+async def generate_assignment_with_ai(
+    classroom_id: str,
+    teacher: TeacherContext,
+    topic: str,
+    num_questions: int,
+    allowed_languages: List[str]
+) -> dict:
+    """
+    Generate assignment questions and test cases using AI
+    Test cases for all questions are generated concurrently
+    """
+    questions = await generate_ai_questions(topic, num_questions, allowed_languages)
+    
+    results = await asyncio.gather(
+        *(generate_ai_question_testcases(q) for q in questions),
+        return_exceptions=True
+    )
+    
+    all_testcases = []
+    for question, result in zip(questions, results):
+        if isinstance(result, Exception):
+            print(f"[WARNING] Testcase generation failed for question {question['question_id']}: {result}")
             continue
+        all_testcases.extend(result)
     
     return {
         "questions": questions,
         "testcases": all_testcases,
         "questions_generated": len(questions),
-        "testcases_generated": testcases_generated
+        "testcases_generated": len(all_testcases)
     }
 
+# ==================== AI GENERATION JOBS ====================
+
+AI_JOB_TERMINAL_STATUSES = {
+    AIJobStatus.COMPLETED.value,
+    AIJobStatus.COMPLETED_WITH_ERRORS.value,
+    AIJobStatus.FAILED.value
+}
+
+# A generating job not updated for this long lost its worker (restart/crash)
+# and can be claimed again by retry
+AI_JOB_STALE_SECONDS = 600
+
+# Strong references to running job tasks - the event loop only keeps weak ones
+_ai_job_tasks: Dict[str, asyncio.Task] = {}
 
+def _spawn_ai_generation_job(job_id: str, teacher: TeacherContext):
+    task = asyncio.create_task(_run_ai_generation_job(job_id, teacher))
+    _ai_job_tasks[job_id] = task
+    task.add_done_callback(lambda _: _ai_job_tasks.pop(job_id, None))
 
-# ADD CSV export function
-async def export_assignment_submissions_csv(assignment_id: str) -> str:
+def _clean_job(job: dict) -> dict:
+    job.pop("_id", None)
+    job.pop("assignment_data", None)
+    return job
+
+async def start_ai_generation_job(classroom_id: str, teacher: TeacherContext, data: dict) -> dict:
     """
-    Export all submissions for an assignment as CSV
-    Returns CSV content as string
+    Create an AI generation job and run it in the background.
+    Returns immediately; progress is read from the job document.
     """
-    assignment = await db.assignments.find_one({"assignment_id": assignment_id})
+    job = AIGenerationJob(
+        job_id=generate_id("AIJOB"),
+        classroom_id=classroom_id,
+        teacher_user_id=teacher.user_id,
+        topic=data["ai_topic"],
+        num_questions=data["ai_num_questions"],
+        assignment_id=generate_id("ASG"),
+        assignment_data={k: v for k, v in data.items() if k not in ("ai_topic", "ai_num_questions")}
+    )
+    await db.ai_generation_jobs.insert_one(job.dict())
+    
+    _spawn_ai_generation_job(job.job_id, teacher)
+    
+    return _clean_job(job.dict())
+
+async def get_ai_generation_job(job_id: str, teacher: TeacherContext) -> dict:
+    """Fetch a job owned by this teacher"""
+    job = await db.ai_generation_jobs.find_one({
+        "job_id": job_id,
+        "teacher_user_id": teacher.user_id
+    })
+    if not job:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return _clean_job(job)
+
+async def retry_ai_generation_job(job_id: str, teacher: TeacherContext) -> dict:
+    """
+    Re-run only the questions that have not completed.
+    Also recovers a job left generating by a worker that went away.
+    """
+    if job_id in _ai_job_tasks:
+        raise HTTPException(status_code=409, detail="Job is still running")
+    
+    stale_before = datetime.utcnow() - timedelta(seconds=AI_JOB_STALE_SECONDS)
+    
+    # Claim the job atomically so concurrent retries cannot double-run it
+    result = await db.ai_generation_jobs.update_one(
+        {
+            "job_id": job_id,
+            "teacher_user_id": teacher.user_id,
+            "$or": [
+                {"status": {"$in": [AIJobStatus.COMPLETED_WITH_ERRORS.value, AIJobStatus.FAILED.value]}},
+                {
+                    "status": {"$in": [
+                        AIJobStatus.GENERATING_QUESTIONS.value,
+                        AIJobStatus.GENERATING_TESTCASES.value
+                    ]},
+                    "updated_at": {"$lt": stale_before}
+                }
+            ]
+        },
+        {"$set": {
+            "status": AIJobStatus.GENERATING_TESTCASES.value,
+            "updated_at": datetime.utcnow()
+        }}
+    )
+    
+    if result.modified_count == 0:
+        job = await get_ai_generation_job(job_id, teacher)
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job is {job['status']} - only failed or stalled jobs can be retried"
+        )
+    
+    _spawn_ai_generation_job(job_id, teacher)
+    return await get_ai_generation_job(job_id, teacher)
+
+async def _update_ai_job(job_id: str, fields: dict, question_id: Optional[str] = None):
+    query = {"job_id": job_id}
+    if question_id:
+        query["questions.question_id"] = question_id
+        fields = {f"questions.$.{k}": v for k, v in fields.items()}
+    fields["updated_at"] = datetime.utcnow()
+    await db.ai_generation_jobs.update_one(query, {"$set": fields})
+
+async def _run_ai_generation_job(job_id: str, teacher: TeacherContext):
+    """
+    Job body: questions -> assignment -> concurrent test case fan-out.
+    Each question's test cases are inserted as soon as they are ready,
+    so a crash or retry only redoes unfinished questions.
+    The assignment id is reserved on the job before the assignment is
+    created, so a crash in between cannot create it twice.
+    """
+    job = await db.ai_generation_jobs.find_one({"job_id": job_id})
+    
+    try:
+        if not job.get("assignment_id"):
+            # Jobs created before the id was reserved at start
+            job["assignment_id"] = generate_id("ASG")
+            await _update_ai_job(job_id, {"assignment_id": job["assignment_id"]})
+        
+        if not job.get("questions"):
+            assignment = await db.assignments.find_one(
+                {"assignment_id": job["assignment_id"]}, {"questions": 1}
+            )
+            
+            if assignment:
+                # Created by a run that died before recording its questions
+                questions = assignment["questions"]
+            else:
+                await _update_ai_job(job_id, {
+                    "status": AIJobStatus.GENERATING_QUESTIONS.value,
+                    "error": None
+                })
+                
+                questions = await generate_ai_questions(
+                    job["topic"],
+                    job["num_questions"],
+                    job["assignment_data"].get("allowed_languages", ["python"])
+                )
+                
+                assignment_data = {**job["assignment_data"], "questions": questions}
+                await create_assignment(
+                    job["classroom_id"], teacher, assignment_data,
+                    auto_generate_testcases=False,
+                    assignment_id=job["assignment_id"]
+                )
+            
+            job["questions"] = [
+                {**q, "status": "pending", "testcases_created": 0, "error": None}
+                for q in questions
+            ]
+            await _update_ai_job(job_id, {"questions": job["questions"]})
+        
+        await _update_ai_job(job_id, {
+            "status": AIJobStatus.GENERATING_TESTCASES.value,
+            "error": None
+        })
+        
+        pending = [q for q in job["questions"] if q.get("status") != "done"]
+        outcomes = await asyncio.gather(*(
+            _generate_job_question(job_id, job["assignment_id"], q, teacher)
+            for q in pending
+        ))
+        
+        final_status = AIJobStatus.COMPLETED if all(outcomes) else AIJobStatus.COMPLETED_WITH_ERRORS
+        await _update_ai_job(job_id, {"status": final_status.value})
+        
+        await log_audit(
+            teacher,
+            "generate_assignment_ai",
+            "assignment",
+            job["assignment_id"],
+            {"topic": job["topic"], "job_id": job_id, "questions": len(job["questions"])}
+        )
+        
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        print(f"[ERROR] AI generation job {job_id} failed: {detail}")
+        await _update_ai_job(job_id, {
+            "status": AIJobStatus.FAILED.value,
+            "error": str(detail)[:500]
+        })
+
+async def _generate_job_question(job_id: str, assignment_id: str, question: dict, teacher: TeacherContext) -> bool:
+    """Generate and persist test cases for one question; returns success"""
+    question_id = question["question_id"]
+    await _update_ai_job(job_id, {"status": "running", "error": None}, question_id)
+    
+    try:
+        testcases = await generate_ai_question_testcases(question)
+        
+        # Ids keyed by job, question and position: a rerun of this question
+        # overwrites its earlier test cases instead of adding more
+        prefix = f"TC_{job_id}_{question_id}_"
+        created_ids = []
+        for index, tc_data in enumerate(testcases):
+            if await create_testcase(assignment_id, teacher, tc_data, testcase_id=f"{prefix}{index}"):
+                created_ids.append(f"{prefix}{index}")
+        
+        # Drop leftovers from an earlier run that produced more test cases
+        await db.testcases.delete_many({
+            "assignment_id": assignment_id,
+            "question_id": question_id,
+            "testcase_id": {"$regex": f"^{re.escape(prefix)}", "$nin": created_ids}
+        })
+        
+        created = len(created_ids)
+        if created == 0:
+            raise ValueError("No valid test cases generated")
+        
+        await _update_ai_job(job_id, {"status": "done", "testcases_created": created}, question_id)
+        return True
+        
+    except Exception as e:
+        print(f"[WARNING] Testcase generation failed for question {question_id}: {e}")
+        await _update_ai_job(job_id, {"status": "failed", "error": str(e)[:300]}, question_id)
+        return False
+
+async def stream_ai_generation_job(job_id: str, teacher: TeacherContext, poll_interval: float = 1.0):
+    """
+    Server-Sent Events of job progress.
+    Progress lives in Mongo, so any worker can serve the stream.
+    """
+    await get_ai_generation_job(job_id, teacher)
+    
+    async def generate():
+        last_update = None
+        while True:
+            job = await db.ai_generation_jobs.find_one({"job_id": job_id})
+            if not job:
+                break
+            
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                yield f"data: {json.dumps(_clean_job(job), default=str)}\n\n"
+            
+            if job["status"] in AI_JOB_TERMINAL_STATUSES:
+                break
+            
+            await asyncio.sleep(poll_interval)
+        
+        yield "data: [DONE]\n\n"
+    
+    return generate()
+
+
+# ==================== SUBMISSION EXPORT ====================
+
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_HEADERS = [
+    'Student ID',
+    'Student SIDHI ID',
+    'Student Name',
+    'Attempt Number',
+    'Score',
+    'Passed Tests',
+    'Failed Tests',
+    'Approved',
+    'Submission Time',
+    'Reviewed Time',
+    'Notes'
+]
+
+# Everything the export needs - keeps student code (answers) off the wire
+EXPORT_PROJECTION = {
+    "_id": 0,
+    "student_user_id": 1,
+    "student_sidhi_id": 1,
+    "attempt_number": 1,
+    "test_result": 1,
+    "teacher_override_result": 1,
+    "approved": 1,
+    "submitted_at": 1,
+    "reviewed_at": 1,
+    "approval_notes": 1
+}
+
+def _submission_export_row(sub: dict, profile: Optional[dict]) -> list:
+    """Flatten one submission into an export row (override result wins)"""
+    test_result = sub.get("test_result") or {}
+    override_result = sub.get("teacher_override_result")
+    
+    # Use override if exists
+    result = override_result if override_result else test_result
+    score = result.get("score", 0)
+    passed = result.get("passed", 0)
+    failed = result.get("failed", 0)
+    
+    approved_status = "Approved" if sub.get("approved") is True else \
+                     "Rejected" if sub.get("approved") is False else \
+                     "Pending"
+    
+    return [
+        sub["student_user_id"],
+        sub["student_sidhi_id"],
+        profile.get("username", "Unknown") if profile else "Unknown",
+        sub.get("attempt_number", 1),
+        f"{score:.2f}",
+        passed,
+        failed,
+        approved_status,
+        sub["submitted_at"].strftime("%Y-%m-%d %H:%M:%S"),
+        sub["reviewed_at"].strftime("%Y-%m-%d %H:%M:%S") if sub.get("reviewed_at") else "",
+        sub.get("approval_notes") or ""
+    ]
+
+async def iter_submission_export_rows(assignment_id: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Yield export rows in batches of `batch_size`.
+    Submissions are read from a cursor and student profiles are joined
+    with one $in lookup per batch, so memory stays bounded by the batch.
+    """
+    cursor = db.submissions.find(
+        {"assignment_id": assignment_id},
+        EXPORT_PROJECTION
+    ).sort("student_user_id", 1).batch_size(batch_size)
+    
+    batch = []
+    async for sub in cursor:
+        batch.append(sub)
+        if len(batch) >= batch_size:
+            yield await _join_export_profiles(batch)
+            batch = []
+    
+    if batch:
+        yield await _join_export_profiles(batch)
+
+async def _join_export_profiles(submissions: List[dict]) -> List[list]:
+    """Resolve usernames for a batch of submissions in one query"""
+    user_ids = list({sub["student_user_id"] for sub in submissions})
+    profiles = await db.users_profile.find(
+        {"user_id": {"$in": user_ids}},
+        {"_id": 0, "user_id": 1, "username": 1}
+    ).to_list(length=None)
+    profiles_by_id = {p["user_id"]: p for p in profiles}
+    
+    return [
+        _submission_export_row(sub, profiles_by_id.get(sub["student_user_id"]))
+        for sub in submissions
+    ]
+
+async def stream_assignment_submissions_csv(assignment_id: str, compress: bool = False):
+    """
+    Stream all submissions for an assignment as CSV.
+    The header row is emitted before the first query so the first byte goes
+    out immediately. With `compress`, output is a single gzip stream.
+    """
+    assignment = await db.assignments.find_one(
+        {"assignment_id": assignment_id},
+        {"_id": 0, "assignment_id": 1}
+    )
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    submissions = await db.submissions.find({
-        "assignment_id": assignment_id
-    }).sort("student_user_id", 1).to_list(length=None)
-    
-    # Build CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Headers
-    writer.writerow([
-        'Student ID',
-        'Student SIDHI ID',
-        'Student Name',
-        'Attempt Number',
-        'Score',
-        'Passed Tests',
-        'Failed Tests',
-        'Approved',
-        'Submission Time',
-        'Reviewed Time',
-        'Notes'
-    ])
-    
-    # Fetch student profiles
-    for sub in submissions:
-        profile = await db.users_profile.find_one({"user_id": sub["student_user_id"]})
+    async def generate():
+        compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = gzip container
+        
+        def encode(rows: List[list]) -> bytes:
+            output = io.StringIO()
+            csv.writer(output).writerows(rows)
+            data = output.getvalue().encode("utf-8")
+            return compressor.compress(data) if compressor else data
+        
+        yield encode([EXPORT_HEADERS])
         
-        test_result = sub.get("test_result", {})
-        override_result = sub.get("teacher_override_result")
+        async for rows in iter_submission_export_rows(assignment_id):
+            chunk = encode(rows)
+            if chunk:
+                yield chunk
         
-        # Use override if exists
-        if override_result:
-            score = override_result.get("score", 0)
-            passed = override_result.get("passed", 0)
-            failed = override_result.get("failed", 0)
+        if compressor:
+            yield compressor.flush()
+    
+    return generate()
+
+class _ArrowChunkSink:
+    """
+    Write-only file object that hands written bytes back to the caller.
+    Tracks its own position because the Parquet footer stores offsets.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+async def stream_assignment_submissions_arrow(assignment_id: str, file_format: str = "parquet"):
+    """
+    Stream submissions as Parquet (one row group per batch) or as an
+    Arrow IPC stream. Requires the optional `pyarrow` package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(
+            status_code=501,
+            detail="Parquet/Arrow export requires pyarrow on the server"
+        )
+    
+    assignment = await db.assignments.find_one(
+        {"assignment_id": assignment_id},
+        {"_id": 0, "assignment_id": 1}
+    )
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    
+    columns = [h.lower().replace(" ", "_") for h in EXPORT_HEADERS]
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    
+    async def generate():
+        sink = _ArrowChunkSink()
+        if file_format == "parquet":
+            writer = pq.ParquetWriter(sink, schema)
         else:
-            score = test_result.get("score", 0)
-            passed = test_result.get("passed", 0)
-            failed = test_result.get("failed", 0)
-        
-        approved_status = "Approved" if sub.get("approved") is True else \
-                         "Rejected" if sub.get("approved") is False else \
-                         "Pending"
-        
-        writer.writerow([
-            sub["student_user_id"],
-            sub["student_sidhi_id"],
-            profile.get("username", "Unknown") if profile else "Unknown",
-            sub.get("attempt_number", 1),
-            f"{score:.2f}",
-            passed,
-            failed,
-            approved_status,
-            sub["submitted_at"].strftime("%Y-%m-%d %H:%M:%S"),
-            sub["reviewed_at"].strftime("%Y-%m-%d %H:%M:%S") if sub.get("reviewed_at") else "",
-            sub.get("approval_notes", "")
-        ])
-    
-    csv_content = output.getvalue()
-    output.close()
-    
-    return csv_content
+            writer = pa.ipc.new_stream(sink, schema)
+        
+        try:
+            async for rows in iter_submission_export_rows(assignment_id):
+                table = pa.Table.from_pylist(
+                    [dict(zip(columns, (str(v) for v in row))) for row in rows],
+                    schema=schema
+                )
+                writer.write_table(table)
+                yield sink.drain()
+        finally:
+            writer.close()
+        
+        yield sink.drain()
+    
+    return generate()
+
 async def update_assignment(assignment_id: str, teacher: TeacherContext, data: dict) -> dict:
     """Update assignment details"""
     update_data = {k: v for k, v in data.items() if v is not None}
@@ -594,6 +1057,7 @@ async def update_assignment(assignment_id: str, teacher: TeacherContext, data: d
 
 async def delete_assignment(assignment_id: str, teacher: TeacherContext):
     """Delete assignment (soft delete by setting status to closed)"""
+    # assignment_count includes closed assignments, so the counter is left as-is
     await db.assignments.update_one(
         {"assignment_id": assignment_id},
         {"$set": {
@@ -609,9 +1073,14 @@ async def delete_assignment(assignment_id: str, teacher: TeacherContext):
 async def create_testcase(
     assignment_id: str,
     teacher: TeacherContext,
-    data: dict
+    data: dict,
+    testcase_id: Optional[str] = None
 ) -> Optional[dict]:
-    """Create a new test case safely (AI-proof)"""
+    """
+    Create a new test case safely (AI-proof)
+    With a caller-chosen testcase_id the write is an upsert, so repeating it
+    replaces the test case rather than duplicating it.
+    """
 
     if not data or not isinstance(data, dict):
         print(f"[ERROR] Invalid testcase payload type: {type(data)}, value: {data}")
@@ -646,7 +1115,7 @@ async def create_testcase(
 
     try:
         testcase = TestCase(
-            testcase_id=generate_id("TC"),
+            testcase_id=testcase_id or generate_id("TC"),
             assignment_id=assignment_id,
             question_id=question_id,
             input_data=input_data,
@@ -655,7 +1124,10 @@ async def create_testcase(
             is_hidden=bool(data.get("is_hidden", False))
         )
 
-        await db.testcases.insert_one(testcase.dict())
+        if testcase_id:
+            await db.testcases.replace_one({"testcase_id": testcase_id}, testcase.dict(), upsert=True)
+        else:
+            await db.testcases.insert_one(testcase.dict())
         await log_audit(teacher, "create_testcase", "testcase", testcase.testcase_id)
 
         result = testcase.dict()
@@ -742,6 +1214,17 @@ async def get_submission_detail(submission_id: str) -> dict:
     return submission
 
 
+async def _invalidate_for_submission(submission_id: str):
+    """Invalidate cached analytics for the submission's assignment/classroom"""
+    submission = await db.submissions.find_one(
+        {"submission_id": submission_id},
+        {"_id": 0, "assignment_id": 1, "classroom_id": 1}
+    )
+    if submission:
+        await invalidate_submission_analytics(
+            submission["assignment_id"], submission.get("classroom_id")
+        )
+
 async def approve_submission(submission_id: str, teacher: TeacherContext, notes: Optional[str]):
     """Approve a submission"""
     await db.submissions.update_one(
@@ -753,6 +1236,8 @@ async def approve_submission(submission_id: str, teacher: TeacherContext, notes:
         }}
     )
     
+    await _invalidate_for_submission(submission_id)
+    
     await log_audit(teacher, "approve_submission", "submission", submission_id, {"notes": notes})
 
 async def reject_submission(submission_id: str, teacher: TeacherContext, notes: str):
@@ -766,6 +1251,8 @@ async def reject_submission(submission_id: str, teacher: TeacherContext, notes:
         }}
     )
     
+    await _invalidate_for_submission(submission_id)
+    
     await log_audit(teacher, "reject_submission", "submission", submission_id, {"notes": notes})
 
 async def request_resubmission(submission_id: str, teacher: TeacherContext, notes: str):
@@ -781,6 +1268,8 @@ async def request_resubmission(submission_id: str, teacher: TeacherContext, note
         }}
     )
     
+    await _invalidate_for_submission(submission_id)
+    
     await log_audit(teacher, "request_resubmission", "submission", submission_id, {"notes": notes})
 
 async def override_test_result(
@@ -797,6 +1286,8 @@ async def override_test_result(
         }}
     )
     
+    await _invalidate_for_submission(submission_id)
+    
     await log_audit(teacher, "override_test_result", "submission", submission_id, override_data)
 
 # ==================== PLAGIARISM ====================
@@ -849,8 +1340,70 @@ async def mark_plagiarism_reviewed(pair_id: str, teacher: TeacherContext, notes:
 
 # ==================== ANALYTICS ====================
 
+ANALYTICS_TTL = 300  # 5 minutes - explicit invalidation covers local writes
+SCORE_HISTOGRAM_BUCKETS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+SCORE_PERCENTILES = [25, 50, 75, 90]
+
+analytics_cache = get_cache("teacher_analytics")
+
+# Score only counts when a test_result document exists (None = tests pending)
+_SCORE_EXPR = {
+    "$cond": [
+        {"$eq": [{"$type": "$test_result"}, "object"]},
+        {"$ifNull": ["$test_result.score", 0]},
+        None
+    ]
+}
+
+def _score_distribution(scores: List[float]) -> dict:
+    """Percentiles (nearest-rank) and 10-point histogram for a list of scores"""
+    scores = sorted(scores)
+    
+    percentiles = {}
+    for p in SCORE_PERCENTILES:
+        if scores:
+            rank = max(1, -(-p * len(scores) // 100))  # ceil(p/100 * n)
+            percentiles[f"p{p}"] = round(scores[rank - 1], 2)
+        else:
+            percentiles[f"p{p}"] = 0
+    
+    histogram = []
+    for i, lower in enumerate(SCORE_HISTOGRAM_BUCKETS[:-1]):
+        upper = SCORE_HISTOGRAM_BUCKETS[i + 1]
+        is_last = upper == SCORE_HISTOGRAM_BUCKETS[-1]
+        histogram.append({
+            "range": f"{lower}-{upper}",
+            "count": sum(
+                1 for sc in scores
+                if lower <= sc < upper or (is_last and sc == upper)
+            )
+        })
+    
+    return {"score_percentiles": percentiles, "score_histogram": histogram}
+
+async def invalidate_submission_analytics(assignment_id: str, classroom_id: Optional[str] = None):
+    """
+    Drop cached analytics touched by a submission write.
+    Called on new submissions, test results and approvals.
+    """
+    if classroom_id is None:
+        assignment = await db.assignments.find_one(
+            {"assignment_id": assignment_id},
+            {"_id": 0, "classroom_id": 1}
+        )
+        classroom_id = assignment.get("classroom_id") if assignment else None
+    
+    await analytics_cache.delete(f"scorecard:{assignment_id}")
+    if classroom_id:
+        await analytics_cache.delete(f"classroom_analytics:{classroom_id}")
+
 async def get_classroom_analytics(classroom_id: str) -> dict:
     """Get classroom performance analytics"""
+    cache_key = f"classroom_analytics:{classroom_id}"
+    cached = await analytics_cache.get(cache_key)
+    if cached:
+        return cached
+    
     total_students = await db.classroom_memberships.count_documents({
         "classroom_id": classroom_id,
         "is_active": True
@@ -858,65 +1411,105 @@ async def get_classroom_analytics(classroom_id: str) -> dict:
     
     total_assignments = await db.assignments.count_documents({"classroom_id": classroom_id})
     
-    submissions = await db.submissions.find({"classroom_id": classroom_id}).to_list(length=None)
+    # Single pass over the classroom's submissions; answers never leave the server
+    pipeline = [
+        {"$match": {"classroom_id": classroom_id}},
+        {"$project": {"_id": 0, "student_user_id": 1, "score": _SCORE_EXPR}},
+        {"$group": {
+            "_id": None,
+            "total_submissions": {"$sum": 1},
+            "score_sum": {"$sum": {"$ifNull": ["$score", 0]}},
+            "scores": {"$push": "$score"},
+            "students": {"$addToSet": "$student_user_id"}
+        }}
+    ]
+    rows = await db.submissions.aggregate(pipeline).to_list(length=1)
+    stats = rows[0] if rows else {}
     
-    if submissions:
-        total_submissions = len(submissions)
-        avg_score = sum(
-            s.get("test_result", {}).get("score", 0) 
-            for s in submissions if s.get("test_result")
-        ) / total_submissions if total_submissions > 0 else 0
-        
-        unique_students = len(set(s["student_user_id"] for s in submissions))
-        avg_submission_rate = (unique_students / total_students * 100) if total_students > 0 else 0
-    else:
-        avg_score = 0
-        avg_submission_rate = 0
-        unique_students = 0
+    total_submissions = stats.get("total_submissions", 0)
+    unique_students = len(stats.get("students", []))
     
-    return {
+    avg_score = stats["score_sum"] / total_submissions if total_submissions > 0 else 0
+    avg_submission_rate = (unique_students / total_students * 100) if total_students > 0 else 0
+    
+    result = {
         "classroom_id": classroom_id,
         "total_students": total_students,
         "total_assignments": total_assignments,
         "avg_submission_rate": round(avg_submission_rate, 2),
         "avg_score": round(avg_score, 2),
-        "active_students": unique_students
+        "active_students": unique_students,
+        **_score_distribution([sc for sc in stats.get("scores", []) if sc is not None])
     }
+    
+    await analytics_cache.set(cache_key, result, ANALYTICS_TTL)
+    return result
 
 async def get_assignment_scorecard(assignment_id: str) -> dict:
     """Get detailed scorecard for an assignment"""
-    assignment = await db.assignments.find_one({"assignment_id": assignment_id})
-    submissions = await db.submissions.find({"assignment_id": assignment_id}).to_list(length=None)
+    cache_key = f"scorecard:{assignment_id}"
+    cached = await analytics_cache.get(cache_key)
+    if cached:
+        return cached
     
-    approved = sum(1 for s in submissions if s.get("approved") is True)
-    pending = sum(1 for s in submissions if s.get("approved") is None)
-    rejected = sum(1 for s in submissions if s.get("approved") is False)
-    
-    scores = [s.get("test_result", {}).get("score", 0) for s in submissions if s.get("test_result")]
-    avg_score = sum(scores) / len(scores) if scores else 0
-    
-    attempts = [s.get("attempt_number", 1) for s in submissions]
-    avg_attempts = sum(attempts) / len(attempts) if attempts else 0
+    assignment = await db.assignments.find_one(
+        {"assignment_id": assignment_id},
+        {"_id": 0, "due_date": 1}
+    )
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
     
     due_date = assignment.get("due_date")
-    on_time = 0
-    late = 0
     
+    def count_if(condition):
+        return {"$sum": {"$cond": [condition, 1, 0]}}
+    
+    group = {
+        "_id": None,
+        "total_submissions": {"$sum": 1},
+        "approved_submissions": count_if({"$eq": ["$approved", True]}),
+        "pending_submissions": count_if({"$eq": [{"$ifNull": ["$approved", None]}, None]}),
+        "rejected_submissions": count_if({"$eq": ["$approved", False]}),
+        "avg_attempts": {"$avg": {"$ifNull": ["$attempt_number", 1]}},
+        "scores": {"$push": "$score"}
+    }
     if due_date:
-        on_time = sum(1 for s in submissions if s["submitted_at"] <= due_date)
-        late = sum(1 for s in submissions if s["submitted_at"] > due_date)
+        group["on_time_submissions"] = count_if({"$lte": ["$submitted_at", due_date]})
+        group["late_submissions"] = count_if({"$gt": ["$submitted_at", due_date]})
+    
+    pipeline = [
+        {"$match": {"assignment_id": assignment_id}},
+        {"$project": {
+            "_id": 0,
+            "approved": 1,
+            "attempt_number": 1,
+            "submitted_at": 1,
+            "score": _SCORE_EXPR
+        }},
+        {"$group": group}
+    ]
+    rows = await db.submissions.aggregate(pipeline).to_list(length=1)
+    stats = rows[0] if rows else {}
     
-    return {
+    scores = [sc for sc in stats.get("scores", []) if sc is not None]
+    avg_score = sum(scores) / len(scores) if scores else 0
+    
+    result = {
         "assignment_id": assignment_id,
-        "total_submissions": len(submissions),
-        "approved_submissions": approved,
-        "pending_submissions": pending,
-        "rejected_submissions": rejected,
+        "total_submissions": stats.get("total_submissions", 0),
+        "approved_submissions": stats.get("approved_submissions", 0),
+        "pending_submissions": stats.get("pending_submissions", 0),
+        "rejected_submissions": stats.get("rejected_submissions", 0),
         "avg_score": round(avg_score, 2),
-        "avg_attempts": round(avg_attempts, 2),
-        "on_time_submissions": on_time,
-        "late_submissions": late
+        "avg_attempts": round(stats.get("avg_attempts") or 0, 2),
+        "on_time_submissions": stats.get("on_time_submissions", 0),
+        "late_submissions": stats.get("late_submissions", 0),
+        **_score_distribution(scores)
     }
+    
+    await analytics_cache.set(cache_key, result, ANALYTICS_TTL)
+    return result
+
 async def get_assignment_testcases(assignment_id: str) -> List[dict]:
         """Get all test cases for an assignment"""
         cursor = db.testcases.find({"assignment_id": assignment_id}).sort("created_at", 1)
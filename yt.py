@@ -7,11 +7,21 @@ Step 2: Per video: fetch transcript, clean, smart chunk
 Step 3: Feed chunks to Groq LLM → extract topic_keys + coding challenges
 Step 4: Merge all results across chunks (and across videos for playlists)
         → deduplicate questions, time-based weightage, rank
+
+LLM calls run on a bounded thread pool that backs off together on rate
+limits. Transcripts (transcripts/) and per-chunk LLM results (chunks/) are
+cached under YT_CACHE_DIR, so a crashed or repeated run only re-fetches
+what is missing; merging is recomputed from the cached chunks each run.
 """
 
 import re
 import os
 import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
@@ -31,9 +41,39 @@ NOISE_WORDS = {
 }
 
 GROQ_MODEL = "openai/gpt-oss-120b"
+
+LLM_CONCURRENCY   = int(os.getenv("YT_LLM_CONCURRENCY", "4"))    # in-flight Groq calls, all videos
+VIDEO_CONCURRENCY = int(os.getenv("YT_VIDEO_CONCURRENCY", "3"))  # playlist videos in progress
+LLM_MAX_RETRIES   = 5
+CACHE_DIR         = os.getenv("YT_CACHE_DIR", ".yt_cache")
 # ─────────────────────────────────────────────────────────────────────────────
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+#  DISK CACHE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _cache_path(*parts: str) -> str:
+    return os.path.join(CACHE_DIR, *parts)
+
+
+def cache_read(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def cache_write(path: str, data) -> None:
+    """Atomic write — a crash mid-write never leaves a half file behind."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 #  STEP 1: TRANSCRIPT EXTRACTION
 # ══════════════════════════════════════════════════════════════════════════════
@@ -52,6 +92,15 @@ def extract_video_id(url: str) -> str:
 
 
 def fetch_transcript(video_id: str) -> list[dict]:
+    cached = cache_read(_cache_path("transcripts", f"{video_id}.json"))
+    if cached is not None:
+        return cached
+    segments = _fetch_transcript_remote(video_id)
+    cache_write(_cache_path("transcripts", f"{video_id}.json"), segments)
+    return segments
+
+
+def _fetch_transcript_remote(video_id: str) -> list[dict]:
     try:
         api = YouTubeTranscriptApi()
         transcript_list = api.list(video_id)
@@ -272,11 +321,92 @@ STRICT RULES for questions:
 """
 
 
-def extract_topics_from_chunk(client: Groq, chunk: dict, chunk_number: int, total: int) -> list[dict]:
+class RateLimitGate:
+    """Shared pause: when any call is rate limited, every worker waits it out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+_llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
+_rate_gate = RateLimitGate()
+
+
+def _is_rate_limit(e: Exception) -> bool:
+    return getattr(e, "status_code", None) == 429 or "rate limit" in str(e).lower()
+
+
+def _retry_after(e: Exception, attempt: int) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+
+def _call_llm(client: Groq, prompt: str) -> str:
+    """One streamed completion, within the concurrency bound, retried on rate limits."""
+    for attempt in range(LLM_MAX_RETRIES):
+        _rate_gate.wait()
+        with _llm_slots:
+            try:
+                completion = client.chat.completions.create(
+                    model=GROQ_MODEL,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user",   "content": prompt}
+                    ],
+                    temperature=0.2,           # very low — we want consistent key matching
+                    max_completion_tokens=8192,
+                    top_p=1,
+                    reasoning_effort="medium",
+                    stream=True,
+                    stop=None
+                )
+
+                raw = ""
+                for part in completion:
+                    raw += part.choices[0].delta.content or ""
+                return raw
+            except Exception as e:
+                if not _is_rate_limit(e) or attempt == LLM_MAX_RETRIES - 1:
+                    raise
+                delay = _retry_after(e, attempt)
+
+        print(f"    ⏳ Rate limited — all workers pausing {delay:.1f}s")
+        _rate_gate.pause(delay)
+
+
+def chunk_cache_key(chunk: dict) -> str:
+    """Changes whenever the chunk text, model or prompt changes."""
+    material = f"{GROQ_MODEL}\x00{SYSTEM_PROMPT}\x00{chunk['text']}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:24]
+
+
+def extract_topics_from_chunk(client: Groq, chunk: dict, chunk_number: int, total: int,
+                              video_id: str = "local") -> list[dict]:
     """Send one chunk to the LLM — get back normalized topic keys + questions."""
-    print(f"  🤖 Chunk {chunk_number}/{total} (~{chunk['approx_tokens']} tokens)...", end=" ", flush=True)
+    label = f"  🤖 Chunk {chunk_number}/{total} (~{chunk['approx_tokens']} tokens)"
+    cache_file = _cache_path("chunks", video_id, f"{chunk_cache_key(chunk)}.json")
 
-    prompt = f"""Analyze this Python tutorial transcript chunk.
+    items = cache_read(cache_file)
+    if items is not None:
+        source = "💾 cached"
+    else:
+        prompt = f"""Analyze this Python tutorial transcript chunk.
 Identify topics from the taxonomy and generate student questions.
 
 Transcript:
@@ -285,65 +415,132 @@ Transcript:
 \"\"\"
 """
 
-    try:
-        completion = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user",   "content": prompt}
-            ],
-            temperature=0.2,           # very low — we want consistent key matching
-            max_completion_tokens=8192,
-            top_p=1,
-            reasoning_effort="medium",
-            stream=True,
-            stop=None
+        try:
+            raw = _call_llm(client, prompt).strip()
+            raw = re.sub(r"^```json\s*", "", raw, flags=re.MULTILINE)
+            raw = re.sub(r"^```\s*",     "", raw, flags=re.MULTILINE)
+            raw = re.sub(r"\s*```$",     "", raw, flags=re.MULTILINE)
+
+            items = json.loads(raw)
+        except json.JSONDecodeError:
+            print(f"{label} ⚠️  JSON parse error — skipping chunk")
+            return []
+        except Exception as e:
+            print(f"{label} ❌ Error: {e} — skipping chunk")
+            return []
+
+        # Only successful parses are cached, so failed chunks retry on rerun
+        cache_write(cache_file, items)
+        source = "✅"
+
+    results = []
+    for item in items:
+        key = item.get("topic_key", "").strip().lower()
+
+        # Validate key is in our taxonomy — skip unknown keys
+        if key not in TOPIC_TAXONOMY:
+            print(f"    ⚠️  Unknown topic key '{key}' — skipped")
+            continue
+
+        results.append({
+            "topic_key"  : key,
+            "topic_label": TOPIC_TAXONOMY[key],
+            "questions"  : item.get("questions", []),
+            "chunk_id"   : chunk["chunk_id"],
+            "start_time" : chunk["start_time"],
+            "end_time"   : chunk["end_time"],
+            "duration"   : chunk["end_time"] - chunk["start_time"],
+        })
+
+    print(f"{label} {source} {len(results)} topics")
+    return results
+
+
+def extract_topics_from_chunks(client: Groq, chunks: list[dict], video_id: str = "local") -> list[dict]:
+    """All chunks of one video, concurrently; results stay in chunk order."""
+    total = len(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, LLM_CONCURRENCY)) as executor:
+        per_chunk = executor.map(
+            lambda pair: extract_topics_from_chunk(client, pair[1], pair[0], total, video_id),
+            enumerate(chunks, 1)
         )
+        return [topic for topics in per_chunk for topic in topics]
 
-        raw = ""
-        for part in completion:
-            raw += part.choices[0].delta.content or ""
 
-        raw = raw.strip()
-        raw = re.sub(r"^```json\s*", "", raw, flags=re.MULTILINE)
-        raw = re.sub(r"^```\s*",     "", raw, flags=re.MULTILINE)
-        raw = re.sub(r"\s*```$",     "", raw, flags=re.MULTILINE)
-
-        items = json.loads(raw)
-
-        results = []
-        for item in items:
-            key = item.get("topic_key", "").strip().lower()
-
-            # Validate key is in our taxonomy — skip unknown keys
-            if key not in TOPIC_TAXONOMY:
-                print(f"\n    ⚠️  Unknown topic key '{key}' — skipped", end="")
-                continue
-
-            results.append({
-                "topic_key"  : key,
-                "topic_label": TOPIC_TAXONOMY[key],
-                "questions"  : item.get("questions", []),
-                "chunk_id"   : chunk["chunk_id"],
-                "start_time" : chunk["start_time"],
-                "end_time"   : chunk["end_time"],
-                "duration"   : chunk["end_time"] - chunk["start_time"],
-            })
+# ══════════════════════════════════════════════════════════════════════════════
+#  STEP 3: MERGE + TIME-BASED WEIGHTAGE + RANK
+# ══════════════════════════════════════════════════════════════════════════════
 
-        print(f"✅ {len(results)} topics")
-        return results
+class TopicMerger:
+    """
+    Incremental merge_topics: feed raw topics as each chunk/video finishes,
+    read the ranked result at any point.
+    """
 
-    except json.JSONDecodeError as e:
-        print(f"⚠️  JSON parse error — skipping chunk")
-        return []
-    except Exception as e:
-        print(f"❌ Error: {e} — skipping chunk")
-        return []
+    def __init__(self):
+        self.merged: dict[str, dict] = {}
+        self.total_duration = 0.0
+
+    def add(self, topics: list[dict], duration: float = 0.0) -> None:
+        self.total_duration += duration
+
+        for t in topics:
+            key = t["topic_key"]
+
+            if key not in self.merged:
+                self.merged[key] = {
+                    "topic_key"       : key,
+                    "topic_label"     : t["topic_label"],
+                    "total_duration"  : t["duration"],
+                    "questions"       : list(t.get("questions", [])),
+                    "chunk_ids"       : [t["chunk_id"]],
+                    "first_seen_at"   : t["start_time"],
+                }
+            else:
+                entry = self.merged[key]
+                entry["total_duration"] += t["duration"]
+                entry["chunk_ids"].append(t["chunk_id"])
+
+                # Deduplicate questions and cap at 6
+                existing = set(q.lower() for q in entry["questions"])
+                for q in t.get("questions", []):
+                    if len(entry["questions"]) >= 6:
+                        break
+                    if q.lower() not in existing:
+                        entry["questions"].append(q)
+                        existing.add(q.lower())
+
+    def result(self, total_video_duration: float = None) -> list[dict]:
+        if total_video_duration is None:
+            total_video_duration = self.total_duration
+
+        result = [
+            {**r, "questions": r["questions"][:6], "chunk_ids": list(r["chunk_ids"])}
+            for r in self.merged.values()
+        ]
+
+        # Weightage: use chunk count (reliable) as proxy since end_time can be unreliable
+        total_chunks = sum(len(r["chunk_ids"]) for r in result)
+        for r in result:
+            chunk_share = len(r["chunk_ids"]) / total_chunks if total_chunks > 0 else 0
+            # Also factor in time if available and non-zero
+            time_share = (r["total_duration"] / total_video_duration) if total_video_duration > 0 else 0
+            # Blend both signals — if time is broken (all zeros), chunk_share dominates
+            if time_share > 0:
+                raw_weight = ((chunk_share + time_share) / 2) * 10
+            else:
+                raw_weight = chunk_share * 10
+            r["weightage"] = round(max(1.0, min(10.0, raw_weight)), 2)
 
+        # Sort by weightage descending
+        result.sort(key=lambda x: x["weightage"], reverse=True)
+
+        # Clean up internal field
+        for r in result:
+            del r["total_duration"]
+
+        return result
 
-# ══════════════════════════════════════════════════════════════════════════════
-#  STEP 3: MERGE + TIME-BASED WEIGHTAGE + RANK
-# ══════════════════════════════════════════════════════════════════════════════
 
 def merge_topics(all_topics: list[dict], total_video_duration: float) -> list[dict]:
     """
@@ -353,60 +550,9 @@ def merge_topics(all_topics: list[dict], total_video_duration: float) -> list[di
     - Weightage = (topic_total_duration / total_video_duration) × 10
     - Sort by weightage descending
     """
-    merged: dict[str, dict] = {}
-
-    for t in all_topics:
-        key = t["topic_key"]
-
-        if key not in merged:
-            merged[key] = {
-                "topic_key"       : key,
-                "topic_label"     : t["topic_label"],
-                "total_duration"  : t["duration"],
-                "questions"       : list(t.get("questions", [])),
-                "chunk_ids"       : [t["chunk_id"]],
-                "first_seen_at"   : t["start_time"],
-            }
-        else:
-            merged[key]["total_duration"] += t["duration"]
-            merged[key]["chunk_ids"].append(t["chunk_id"])
-
-            # Deduplicate questions and cap at 6
-            existing = set(q.lower() for q in merged[key]["questions"])
-            for q in t.get("questions", []):
-                if len(merged[key]["questions"]) >= 6:
-                    break
-                if q.lower() not in existing:
-                    merged[key]["questions"].append(q)
-                    existing.add(q.lower())
-
-    result = list(merged.values())
-
-    # Cap initial questions list to 6 too (in case first chunk already had more)
-    for r in result:
-        r["questions"] = r["questions"][:6]
-
-    # Weightage: use chunk count (reliable) as proxy since end_time can be unreliable
-    total_chunks = sum(len(r["chunk_ids"]) for r in result)
-    for r in result:
-        chunk_share = len(r["chunk_ids"]) / total_chunks if total_chunks > 0 else 0
-        # Also factor in time if available and non-zero
-        time_share = (r["total_duration"] / total_video_duration) if total_video_duration > 0 else 0
-        # Blend both signals — if time is broken (all zeros), chunk_share dominates
-        if time_share > 0:
-            raw_weight = ((chunk_share + time_share) / 2) * 10
-        else:
-            raw_weight = chunk_share * 10
-        r["weightage"] = round(max(1.0, min(10.0, raw_weight)), 2)
-
-    # Sort by weightage descending
-    result.sort(key=lambda x: x["weightage"], reverse=True)
-
-    # Clean up internal field
-    for r in result:
-        del r["total_duration"]
-
-    return result
+    merger = TopicMerger()
+    merger.add(all_topics)
+    return merger.result(total_video_duration)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -470,10 +616,7 @@ def process_single_video(video_url: str, client: Groq) -> tuple[list, float]:
     total_duration = max(c["end_time"] for c in chunks) if chunks else 1.0
     print(f"  ⏱  Duration: {int(total_duration // 60)}m {int(total_duration % 60)}s | {len(chunks)} chunks")
 
-    all_topics = []
-    for i, chunk in enumerate(chunks, 1):
-        topics = extract_topics_from_chunk(client, chunk, i, len(chunks))
-        all_topics.extend(topics)
+    all_topics = extract_topics_from_chunks(client, chunks, video_id)
 
     return all_topics, total_duration
 
@@ -490,9 +633,7 @@ def run_pipeline(source: str) -> dict:
         video_id, chunks = get_chunks_from_json(source)
         total_duration = max(c["end_time"] for c in chunks) if chunks else 1.0
         print(f"⏱  Duration: {int(total_duration//60)}m | 🧠 Extracting topics...")
-        all_topics = []
-        for i, chunk in enumerate(chunks, 1):
-            all_topics.extend(extract_topics_from_chunk(client, chunk, i, len(chunks)))
+        all_topics = extract_topics_from_chunks(client, chunks, video_id)
         final_topics = merge_topics(all_topics, total_duration)
         return {
             "type"                : "single",
@@ -508,30 +649,42 @@ def run_pipeline(source: str) -> dict:
         print(f"\n🎵 Playlist detected!")
         videos = extract_playlist_videos(source)
 
-        all_topics_combined = []
-        total_duration_combined = 0.0
+        # Videos run concurrently; finished ones are merged in playlist order
+        # (a small reorder buffer) so the result is the same on every run.
+        merger = TopicMerger()
+        finished: dict[int, tuple[list, float]] = {}
+        next_to_merge = 1
+        total_raw_topics = 0
         processed, skipped = 0, 0
 
-        for idx, video in enumerate(videos, 1):
-            print(f"\n{'─'*55}")
-            print(f"▶ Video {idx}/{len(videos)}: {video['title']}")
-            print(f"  URL: {video['url']}")
-
-            raw_topics, duration = process_single_video(video["url"], client)
-
-            if raw_topics:
-                all_topics_combined.extend(raw_topics)
-                total_duration_combined += duration
-                processed += 1
-            else:
-                skipped += 1
+        with ThreadPoolExecutor(max_workers=max(1, VIDEO_CONCURRENCY)) as executor:
+            futures = {
+                executor.submit(process_single_video, video["url"], client): idx
+                for idx, video in enumerate(videos, 1)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                finished[idx] = future.result()
+                print(f"\n{'─'*55}")
+                print(f"▶ Video {idx}/{len(videos)} done: {videos[idx - 1]['title']}")
+
+                while next_to_merge in finished:
+                    raw_topics, duration = finished.pop(next_to_merge)
+                    if raw_topics:
+                        merger.add(raw_topics, duration)
+                        total_raw_topics += len(raw_topics)
+                        processed += 1
+                    else:
+                        skipped += 1
+                    next_to_merge += 1
 
         print(f"\n{'─'*55}")
         print(f"✅ Processed: {processed} videos | ⚠️  Skipped: {skipped}")
-        print(f"📊 Total raw topics: {len(all_topics_combined)}")
+        print(f"📊 Total raw topics: {total_raw_topics}")
         print("🔀 Merging & ranking across all videos...")
 
-        final_topics = merge_topics(all_topics_combined, total_duration_combined)
+        final_topics = merger.result()
+        total_duration_combined = merger.total_duration
 
         playlist_id = parse_qs(urlparse(source).query).get("list", ["unknown"])[0]
         return {
@@ -553,9 +706,7 @@ def run_pipeline(source: str) -> dict:
     print(f"⏱  Duration: {int(total_duration//60)}m {int(total_duration%60)}s")
     print("🧠 Extracting topics...")
 
-    all_topics = []
-    for i, chunk in enumerate(chunks, 1):
-        all_topics.extend(extract_topics_from_chunk(client, chunk, i, len(chunks)))
+    all_topics = extract_topics_from_chunks(client, chunks, video_id)
 
     print(f"\n📊 Raw topics: {len(all_topics)}")
     print("🔀 Merging & ranking...")